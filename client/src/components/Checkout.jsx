@@ -119,6 +119,7 @@ const Checkout = () => {
                 subtotal: subtotal,
                 shipping_cost: shippingCost,
                 discount: discount,
+                coupon: couponApplied ? coupon : null,
                 total: total
             };
 
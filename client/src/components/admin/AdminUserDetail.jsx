@@ -49,6 +49,8 @@ const AdminUserDetail = () => {
     const navigate = useNavigate();
     const [user, setUser] = useState(null);
     const [orders, setOrders] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState('');
     const [activeTab, setActiveTab] = useState('profile');
@@ -72,6 +74,7 @@ const AdminUserDetail = () => {
 
                 setUser(userRes.data.user);
                 setOrders(ordersRes.data.orders);
+                setNextCursor(ordersRes.data.next_cursor);
             } catch (err) {
                 setError('Error al cargar datos del usuario');
                 Toast.fire({
@@ -86,6 +89,28 @@ const AdminUserDetail = () => {
         fetchData();
     }, [id]);
 
+    // La API devuelve las órdenes por páginas; next_cursor es null en la última.
+    const loadMoreOrders = async () => {
+        setLoadingMore(true);
+        try {
+            const token = localStorage.getItem('token');
+            const res = await axios.get(`/api/admin/user/${id}/orders`, {
+                headers: { Authorization: `Bearer ${token}` },
+                params: { after: nextCursor }
+            });
+            setOrders(prev => [...prev, ...res.data.orders]);
+            setNextCursor(res.data.next_cursor);
+        } catch (err) {
+            Toast.fire({
+                icon: 'error',
+                title: 'Error al cargar más órdenes',
+                text: err.response?.data?.error || 'Intente nuevamente'
+            });
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const formatDate = (dateString) => {
         return new Date(dateString).toLocaleDateString('es-ES', {
             year: 'numeric',
@@ -250,7 +275,7 @@ const AdminUserDetail = () => {
                             </Row>
                         </Tab>
 
-                        <Tab eventKey="orders" title={`Órdenes (${orders.length})`}>
+                        <Tab eventKey="orders" title={`Órdenes (${orders.length}${nextCursor ? '+' : ''})`}>
                             <div className="mt-3">
                                 {orders.length > 0 ? (
                                     <div className="table-responsive">
@@ -286,6 +311,17 @@ const AdminUserDetail = () => {
                                                 ))}
                                             </tbody>
                                         </Table>
+                                        {nextCursor && (
+                                            <div className="text-center">
+                                                <Button
+                                                    variant="outline-secondary"
+                                                    onClick={loadMoreOrders}
+                                                    disabled={loadingMore}
+                                                >
+                                                    {loadingMore ? 'Cargando...' : 'Cargar más órdenes'}
+                                                </Button>
+                                            </div>
+                                        )}
                                     </div>
                                 ) : (
                                     <Alert variant="info" className="text-center">
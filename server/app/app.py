@@ -1,36 +1,95 @@
 from datetime import datetime
 import os
-from bson import ObjectId, json_util
+from bson import ObjectId
 from dotenv import load_dotenv
-from flask import Flask, json, jsonify, request
+from flask import Blueprint, Flask, Response, current_app, json, jsonify, request, stream_with_context
 from flask_cors import CORS
 from werkzeug.exceptions import BadRequest, NotFound
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_jwt_extended import JWTManager, create_access_token, get_jwt_identity, jwt_required
-from werkzeug.security import generate_password_hash
-from werkzeug.security import check_password_hash
+import catalog
+from catalog_cache import catalog_cache, catalog_changed
+import conditional
 import database as db
-from auth.routes import auth
+import facets
+import indexes
+import inventory
+import metrics
+import passwords
+import product_io
+import product_rules
+from purchases import PURCHASED_FIELD
+from models import User
+from ratelimit import limiter
+from json_provider import MongoJSONProvider
+import search
+from database import get_pool_stats
+from principals import invalidate_principal, principal_cache_stats
+from auth.routes import auth, busy_response
 from cart.routes import cart
 from wishlist.routes import wishlist
 from orders.routes import orders
+from orders import admin as orders_admin
 from decorators import admin_required
 
 
 load_dotenv()
-db = db.dbConnect()
-
-app = Flask(__name__)
-app.secret_key = os.getenv('SECRET_KEY', 'super-secret-key')
-app.register_blueprint(auth, url_prefix='/auth')
-app.register_blueprint(cart, url_prefix='/cart')
-app.register_blueprint(wishlist , url_prefix='/wishlist')
-app.register_blueprint(orders, url_prefix='/orders')
-
-CORS(app)
+# Handle perezoso: no abre conexiones al importar y, después de un fork, cada
+# worker resuelve su propio MongoClient.
+db = db.LazyDatabase()
+
+main = Blueprint('main', __name__)
+
+jwt_manager = JWTManager()
+
+# Vistas de administración de usuarios: sin hash ni el set de productos comprados.
+USER_ADMIN_PROJECTION = {"password_hash": 0, PURCHASED_FIELD: 0}
+
+DEFAULT_CONFIG = {
+    'SECRET_KEY': os.getenv('SECRET_KEY', 'super-secret-key'),
+    'MONGO_AUTO_INDEX': os.getenv('MONGO_AUTO_INDEX', '1') == '1',
+    # Proxies propios delante de gunicorn (nginx, balanceador). Con 0 se usa
+    # la IP de la conexión; con N, la que agregó el N-ésimo proxy en
+    # X-Forwarded-For. Un valor mayor que los proxies reales deja que el
+    # cliente elija su IP (y esquive el rate limit por ip).
+    'TRUSTED_PROXY_HOPS': int(os.getenv('TRUSTED_PROXY_HOPS', 0)),
+}
+
+
+def create_app(config=None):
+    app = Flask(__name__)
+    app.config.update(DEFAULT_CONFIG)
+    if config:
+        app.config.update(config)
+
+    app.json = MongoJSONProvider(app)
+    hops = app.config['TRUSTED_PROXY_HOPS']
+    if hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops, x_host=hops)
+    app.register_blueprint(main)
+    app.register_blueprint(auth, url_prefix='/auth')
+    app.register_blueprint(cart, url_prefix='/cart')
+    app.register_blueprint(wishlist , url_prefix='/wishlist')
+    app.register_blueprint(orders, url_prefix='/orders')
+
+    CORS(app)
+
+    jwt_manager.init_app(app)
+    metrics.init_app(app)
+    # Después de metrics: los 429 también se miden.
+    limiter.init_app(app)
+
+    if app.config['MONGO_AUTO_INDEX']:
+        try:
+            indexes.bootstrap(db)
+        except indexes.MigrationError as e:
+            # La app arranca igual (con la versión anterior de índices) y el
+            # error queda en el log para corregir los datos.
+            app.logger.error("No se pudieron aplicar las migraciones: %s", e)
 
-jwt_manager = JWTManager(app)
+    return app
 
-@app.route('/dashboard')
+@main.route('/dashboard')
 @jwt_required()
 def dashboard():
     try:
@@ -41,7 +100,7 @@ def dashboard():
         
         user_data = db['users'].find_one(
             {"_id": ObjectId(current_user_id)},
-            {"password_hash": 0}  
+            {"username": 1, "email": 1, "role": 1}
         )
         
         if not user_data:
@@ -64,7 +123,27 @@ def dashboard():
             "details": str(e)
         }), 500
 
-@app.route('/admin/users', methods=['GET'])
+@main.route('/recommendations', methods=['GET'])
+@jwt_required()
+def get_recommendations():
+    try:
+        limit = min(max(request.args.get('limit', 5, type=int), 1), 50)
+        user_data = db['users'].find_one(
+            {"_id": ObjectId(get_jwt_identity())},
+            {"username": 1, "email": 1, PURCHASED_FIELD: 1}
+        )
+        if not user_data:
+            return jsonify({"success": False, "error": "Usuario no encontrado"}), 404
+
+        # Se piden de más para cubrir los que estén desactivados.
+        product_ids = User(user_data).get_recommended_products(db, limit * 2)
+        products, _ = catalog.hydrate_products(db, product_ids, catalog.PRODUCT_LISTING_FIELDS)
+        return jsonify(products[:limit]), 200
+    except Exception as e:
+        current_app.logger.exception("Error en get_recommendations")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@main.route('/admin/users', methods=['GET'])
 @admin_required 
 def get_users():
     try:
@@ -74,15 +153,12 @@ def get_users():
 
         users_list = list(users.find(
             {}, 
-            {'password_hash': 0} 
+            USER_ADMIN_PROJECTION
         ))
 
-        for user in users_list:
-            user['_id'] = str(user['_id'])
-
         response = {
             'success': True,
-            'users': json.loads(json_util.dumps(users_list)),
+            'users': users_list,
 
         }
         return jsonify(response), 200
@@ -94,7 +170,7 @@ def get_users():
     
 
 
-@app.route('/admin/user/<user_id>', methods=['GET'])
+@main.route('/admin/user/<user_id>', methods=['GET'])
 @admin_required 
 def get_user(user_id):
     collection = db['users']
@@ -104,18 +180,15 @@ def get_user(user_id):
         
         user = db['users'].find_one(
             {"_id": ObjectId(user_id)},
-            {"password_hash": 0} 
+            USER_ADMIN_PROJECTION
         )
 
         if not user:
             raise NotFound("Usuario no encontrado")
         
-        user['_id'] = str(user['_id'])
-
-        
         response = {
             'success': True,
-            'user': json.loads(json_util.dumps(user)),
+            'user': user,
             'links': {
                 'self': f"/users/{user_id}",
             }
@@ -147,7 +220,7 @@ def get_user(user_id):
         
 
 
-@app.route('/admin/user/<user_id>', methods=['PUT'])
+@main.route('/admin/user/<user_id>', methods=['PUT'])
 @admin_required 
 def update_user(user_id):
     try:
@@ -159,16 +232,23 @@ def update_user(user_id):
 
         data = request.get_json()
         
-        allowed_fields = ['username', 'email', 'password_hash', 'favorites', 'shopping_lists']
-        update_data = {k: v for k, v in data.items() if k in allowed_fields}
+        allowed_fields = ['username', 'email', 'role', 'password_hash', 'favorites', 'shopping_lists']
+        update_data = {
+            k: v.strip() if isinstance(v, str) and k != 'password_hash' else v
+            for k, v in data.items() if k in allowed_fields and v is not None
+        }
 
         if not update_data:
             raise BadRequest("No se proporcionaron campos válidos para actualizar")
+        if 'role' in update_data and update_data['role'] not in ['admin', 'user']:
+            raise BadRequest("Rol no válido")
 
         result = db['users'].update_one(
             {'_id': ObjectId(user_id)},
             {'$set': update_data}
         )
+        # Un cambio de rol tiene que valer desde el próximo request.
+        invalidate_principal(user_id)
 
         if result.matched_count == 0:
             raise NotFound("Usuario no encontrado")
@@ -176,7 +256,8 @@ def update_user(user_id):
         return jsonify({
             'success': True,
             'message': 'Usuario actualizado exitosamente',
-            'modified_count': result.modified_count
+            'modified_count': result.modified_count,
+            'user': db['users'].find_one({'_id': ObjectId(user_id)}, USER_ADMIN_PROJECTION)
         }), 200
     except BadRequest as e:
         return jsonify({
@@ -198,7 +279,7 @@ def update_user(user_id):
             'code': 500
         }), 500
 
-@app.route('/admin/user/<user_id>', methods=['DELETE'])
+@main.route('/admin/user/<user_id>', methods=['DELETE'])
 @admin_required 
 def delete_user(user_id):
     try:
@@ -206,6 +287,7 @@ def delete_user(user_id):
             raise BadRequest("ID de usuario no válido")
 
         result = db['users'].delete_one({'_id': ObjectId(user_id)})
+        invalidate_principal(user_id)
 
         if result.deleted_count == 0:
             raise NotFound("Usuario no encontrado")
@@ -235,83 +317,147 @@ def delete_user(user_id):
             'code': 500
         }), 500
 
-@app.route('/products', methods=['GET'])
+@main.route('/admin/db/pool-stats', methods=['GET'])
+@admin_required
+def db_pool_stats():
+    return jsonify({"success": True, "pool": get_pool_stats()}), 200
+
+def product_listing_response(query, cache_version=None):
+    # Sin limit/after se devuelve el catálogo completo como array, pero
+    # codificado en streaming desde el cursor; con limit/after, una página.
+    projection = catalog.parse_fields(request.args.get('fields'))
+    sort_key = catalog.parse_sort(request.args.get('sort'))
+    after = request.args.get('after')
+    after = catalog.decode_cursor(after, sort_key) if after else None
+
+    paginated = 'limit' in request.args or after is not None
+    if paginated and request.args.get('stream') != '1':
+        limit = catalog.parse_limit(request.args.get('limit'))
+
+        def load():
+            products, next_cursor = catalog.fetch_page(db, query, sort_key, projection, limit, after)
+            return {
+                "products": products,
+                "count": len(products),
+                "next_cursor": next_cursor
+            }
+
+        if cache_version is not None:
+            return jsonify(catalog_cache.listing(cache_version, request.args.to_dict(), load)), 200
+        return jsonify(load()), 200
+
+    cursor = catalog.listing_cursor(db, query, sort_key, projection, after)
+    if 'limit' in request.args:
+        cursor = cursor.limit(catalog.parse_limit(request.args.get('limit')))
+    return Response(
+        stream_with_context(catalog.stream_json_array(cursor, json.dumps)),
+        mimetype='application/json'
+    ), 200
+
+@main.route('/admin/cache-stats', methods=['GET'])
+@admin_required
+def cache_stats():
+    return jsonify({
+        "success": True,
+        "catalog": catalog_cache.stats(),
+        "principals": principal_cache_stats()
+    }), 200
+
+@main.route('/products', methods=['GET'])
 def get_products():
-    result = []
-    for prod in db['products'].find({"is_active": True}):
-        prod["_id"] = str(prod["_id"])
-        result.append(prod)
-    return jsonify(result), 200
+    try:
+        version, last_modified = conditional.listing_version(db)
+        etag = conditional.listing_etag(version, 'products')
+        if conditional.is_not_modified(etag, last_modified):
+            return conditional.not_modified_response(etag, last_modified)
+
+        response, status = product_listing_response({"is_active": True}, cache_version=version)
+        return conditional.with_validators(response, etag, last_modified), status
+    except BadRequest as e:
+        return jsonify({"success": False, "error": str(e)}), 400
 
-@app.route('/admin/products', methods=['GET'])
+@main.route('/admin/products', methods=['GET'])
 @admin_required
 def get_admin_products():
     try:
-        products = list(db['products'].find())
-        for prod in products:
-            prod['_id'] = str(prod['_id'])
-        return jsonify(products), 200
+        return product_listing_response({})
+    except BadRequest as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/products/<product_id>', methods=['GET'])
+@main.route('/products/<product_id>', methods=['GET'])
 def get_product(product_id):
-    product = db['products'].find_one({"_id": ObjectId(product_id), "is_active": True})
+    def load():
+        product = db['products'].find_one(
+            {"_id": ObjectId(product_id), "is_active": True},
+            catalog.DEFAULT_PRODUCT_PROJECTION
+        )
+        if product:
+            product["_id"] = str(product["_id"])
+        return product
+
+    version, _ = conditional.catalog_version(db)
+    product = catalog_cache.product(version, product_id, load)
     if not product:
         return jsonify({"error": "Producto no encontrado"}), 404
 
-    product["_id"] = str(product["_id"])
-    return jsonify(product), 200
+    etag, last_modified = conditional.product_validators(product)
+    if conditional.is_not_modified(etag, last_modified):
+        return conditional.not_modified_response(etag, last_modified)
+
+    return conditional.with_validators(jsonify(product), etag, last_modified), 200
 
-@app.route('/products/category/<category_name>', methods=['GET'])
+@main.route('/products/category/<category_name>', methods=['GET'])
 def get_products_by_category(category_name):
     try:
-        category_title = category_name.replace('-', ' ').title()
-        
-        products = list(db['products'].find({
-            "category": {"$regex": f"^{category_title}$", "$options": "i"},
-            "is_active": True
-        }).limit(50))  
-        
-        for prod in products:
-            prod["_id"] = str(prod["_id"])
-            
-        return jsonify({
-            "category": category_title,
-            "products": products,
-            "count": len(products)
-        }), 200
+        key = facets.category_slug(category_name)
+
+        version, last_modified = conditional.listing_version(db)
+        etag = conditional.listing_etag(version, f'category:{key}')
+        if conditional.is_not_modified(etag, last_modified):
+            return conditional.not_modified_response(etag, last_modified)
+
+        projection = catalog.parse_fields(request.args.get('fields'))
+        limit = catalog.parse_limit(request.args.get('limit'))
+        after = request.args.get('after')
+        after = catalog.decode_cursor(after, '_id') if after else None
+
+        def load():
+            # Página sobre el índice (category_key, is_active, ...) + facetas
+            # precalculadas de la categoría, leídas por _id.
+            products, next_cursor = catalog.fetch_page(
+                db, facets.browse_query(key, request.args), '_id', projection, limit, after
+            )
+            category_facets = facets.category_facets(db, key)
+            return {
+                "category": category_facets["name"] if category_facets else key,
+                "products": products,
+                "count": len(products),
+                "next_cursor": next_cursor,
+                "facets": category_facets
+            }
+
+        body = catalog_cache.category(version, key, request.args.to_dict(), load)
+        return conditional.with_validators(jsonify(body), etag, last_modified), 200
+    except BadRequest as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
-@app.route('/products/search', methods=['GET'])
+@main.route('/products/search', methods=['GET'])
 def search_products():
     query = request.args.get('q', '').strip()
     if not query:
         return jsonify([]), 200
 
     try:
-        regex_query = {'$regex': f'.*{query}.*', '$options': 'i'}
-        
-        products = list(db['products'].find({
-            '$and': [
-                {'is_active': True},
-                {'$or': [
-                    {'title': regex_query},
-                    {'description': regex_query},
-                    {'category': regex_query}
-                ]}
-            ]
-        }).limit(10))  
-
-        for prod in products:
-            prod["_id"] = str(prod["_id"])
-            
+        products = search.search_products(db, query, {'is_active': True}, limit=10)
         return jsonify(products), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
-@app.route('/admin/products', methods=['POST'])
+@main.route('/admin/products', methods=['POST'])
 @admin_required
 def create_product():
     try:
@@ -320,34 +466,12 @@ def create_product():
 
         data = request.get_json()
         
-        # Validación básica de campos requeridos
-        required_fields = ['title', 'price', 'category']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"success": False, "error": f"Campo requerido faltante: {field}"}), 400
-
-        # Establecer valores por defecto
-        product_data = {
-            "title": data['title'],
-            "description": data.get('description', ''),
-            "price": float(data['price']),
-            "original_price": float(data.get('original_price', data['price'])),
-            "category": data['category'],
-            "subcategories": data.get('subcategories', []),
-            "image_urls": data.get('image_urls', []),
-            "main_image": data.get('main_image', data.get('image_urls', [])[0] if data.get('image_urls') else ''),
-            "stock": int(data.get('stock', 0)),
-            "sku": data.get('sku', ''),
-            "brand": data.get('brand', ''),
-            "attributes": data.get('attributes', {}),
-            "is_featured": bool(data.get('is_featured', False)),
-            "is_active": bool(data.get('is_active', True)),
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        }
+        product_data = product_rules.new_product(data)
 
         # Insertar en la base de datos
         result = db['products'].insert_one(product_data)
+        product_rules.sync_derived(db, {result.inserted_id: product_data})
+        catalog_changed(db)
         
         return jsonify({
             "success": True,
@@ -355,13 +479,79 @@ def create_product():
             "product_id": str(result.inserted_id)
         }), 201
 
-    except ValueError as e:
-        return jsonify({"success": False, "error": "Datos numéricos inválidos"}), 400
+    except product_rules.ProductValidationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
-@app.route('/admin/products/<product_id>', methods=['PUT'])
+@main.route('/admin/products/import', methods=['POST'])
+@admin_required
+def import_products():
+    # El cuerpo se lee fila por fila desde el stream; la respuesta es NDJSON
+    # con errores por fila y el avance de cada chunk.
+    fmt = request.args.get('format') or ('csv' if request.mimetype == 'text/csv' else 'ndjson')
+    if fmt not in product_io.FORMATS:
+        return jsonify({"success": False, "error": "format debe ser csv o ndjson"}), 400
+
+    events = product_io.import_products(db, product_io.read_rows(request.stream, fmt))
+    return Response(
+        stream_with_context(json.dumps(event) + "\n" for event in events),
+        mimetype='application/x-ndjson'
+    ), 200
+
+
+@main.route('/admin/products/export', methods=['GET'])
+@admin_required
+def export_products():
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in product_io.FORMATS:
+        return jsonify({"success": False, "error": "format debe ser csv o ndjson"}), 400
+
+    return Response(
+        stream_with_context(product_io.export_products(db, fmt, json.dumps)),
+        mimetype='text/csv' if fmt == 'csv' else 'application/x-ndjson',
+        headers={"Content-Disposition": f"attachment; filename=productos.{fmt}"}
+    ), 200
+
+
+@main.route('/admin/products/inventory', methods=['POST'])
+@admin_required
+def update_inventory():
+    try:
+        if not request.is_json:
+            return jsonify({"success": False, "error": "Request debe ser JSON"}), 400
+
+        items = (request.get_json() or {}).get('items')
+        if not isinstance(items, list) or not items:
+            return jsonify({"success": False, "error": "Se requiere una lista items"}), 400
+        if len(items) > inventory.MAX_ITEMS:
+            return jsonify({"success": False, "error": f"Máximo {inventory.MAX_ITEMS} ítems por lote"}), 400
+
+        results, summary = inventory.apply_inventory(db, items)
+        return jsonify({"success": True, "summary": summary, "results": results}), 200
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@main.route('/admin/stock-alerts', methods=['GET'])
+@admin_required
+def get_stock_alerts():
+    try:
+        alerts = inventory.stock_alerts(db, limit=catalog.parse_limit(request.args.get('limit')))
+        return jsonify({
+            "success": True,
+            "threshold": inventory.LOW_STOCK_THRESHOLD,
+            "alerts": alerts,
+            "count": len(alerts)
+        }), 200
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@main.route('/admin/products/<product_id>', methods=['PUT'])
 @admin_required
 def update_product(product_id):
     try:
@@ -373,36 +563,10 @@ def update_product(product_id):
 
         data = request.get_json()
         
-        # Campos permitidos para actualización
-        allowed_fields = {
-            'title': str,
-            'description': str,
-            'price': float,
-            'original_price': float,
-            'category': str,
-            'subcategories': list,
-            'image_urls': list,
-            'main_image': str,
-            'stock': int,
-            'sku': str,
-            'brand': str,
-            'attributes': dict,
-            'is_featured': bool,
-            'is_active': bool
-        }
-
-        update_data = {}
-        for field, field_type in allowed_fields.items():
-            if field in data:
-                try:
-                    update_data[field] = field_type(data[field])
-                except (ValueError, TypeError):
-                    return jsonify({"success": False, "error": f"Tipo inválido para el campo {field}"}), 400
-
-        if not update_data:
-            return jsonify({"success": False, "error": "No se proporcionaron datos válidos para actualizar"}), 400
-
-        update_data['updated_at'] = datetime.utcnow()
+        try:
+            update_data = product_rules.product_update(data)
+        except product_rules.ProductValidationError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
 
         result = db['products'].update_one(
             {"_id": ObjectId(product_id)},
@@ -412,6 +576,9 @@ def update_product(product_id):
         if result.matched_count == 0:
             return jsonify({"success": False, "error": "Producto no encontrado"}), 404
 
+        product_rules.sync_derived_by_id(db, [ObjectId(product_id)])
+        catalog_changed(db, product_ids=[product_id])
+
         return jsonify({
             "success": True,
             "message": "Producto actualizado exitosamente",
@@ -422,7 +589,7 @@ def update_product(product_id):
         return jsonify({"success": False, "error": str(e)}), 500
 
 
-@app.route('/admin/products/<product_id>', methods=['DELETE'])
+@main.route('/admin/products/<product_id>', methods=['DELETE'])
 @admin_required
 def delete_product(product_id):
     try:
@@ -437,6 +604,9 @@ def delete_product(product_id):
         if result.matched_count == 0:
             return jsonify({"success": False, "error": "Producto no encontrado"}), 404
 
+        product_rules.sync_derived_by_id(db, [ObjectId(product_id)])
+        catalog_changed(db, product_ids=[product_id])
+
         return jsonify({
             "success": True,
             "message": "Producto desactivado exitosamente",
@@ -459,69 +629,64 @@ def delete_product(product_id):
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
     
-@app.route('/admin/user/<user_id>/orders', methods=['GET'])
+@main.route('/admin/user/<user_id>/orders', methods=['GET'])
 @admin_required
 def get_user_orders(user_id):
     try:
-        orders = []
-        try:
-            orders = list(db['orders'].find({"user_id": ObjectId(user_id)}))
-        except Exception:
-            pass
-        if not orders:
-            orders = list(db['orders'].find({"user_id": user_id}))
-        orders = convert_objectid(orders)
-        return jsonify({"success": True, "orders": orders}), 200
+        query = orders_admin.order_filters(request.args)
+        query["user_id"] = orders_admin.user_id_filter(user_id)
+        orders, next_cursor = orders_admin.list_orders(
+            db, query,
+            catalog.parse_limit(request.args.get('limit')),
+            orders_admin.decode_after(request.args.get('after'))
+        )
+        return jsonify({"success": True, "orders": orders, "next_cursor": next_cursor}), 200
+    except BadRequest as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
-        print("Error en get_user_orders:", e)
+        current_app.logger.exception("Error en get_user_orders")
         return jsonify({"success": False, "error": str(e)}), 500
     
 
-@app.route('/admin/user/<user_id>', methods=['PUT'])
+@main.route('/admin/orders', methods=['GET'])
 @admin_required
-def update_user_admin(user_id):
+def list_orders_admin():
     try:
-        if not request.is_json:
-            return jsonify({"success": False, "error": "Request debe ser JSON"}), 400
-
-        data = request.get_json()
-        print(" Datos recibidos:", data)
-
-        update_fields = {}
-
-        for field in ['username', 'email', 'role']:
-            if field in data and data[field] is not None:
-                value = data[field].strip() if isinstance(data[field], str) else data[field]
-                update_fields[field] = value
-
-        print(" Campos a actualizar:", update_fields)
-
-        if 'role' in update_fields and update_fields['role'] not in ['admin', 'user']:
-            return jsonify({"success": False, "error": "Rol no válido"}), 400
-
-        if not update_fields:
-            return jsonify({"success": False, "error": "No hay campos para actualizar"}), 400
-
-        result = db['users'].update_one(
-            {"_id": ObjectId(user_id)},
-            {"$set": update_fields}
+        orders, next_cursor = orders_admin.list_orders(
+            db,
+            orders_admin.order_filters(request.args),
+            catalog.parse_limit(request.args.get('limit')),
+            orders_admin.decode_after(request.args.get('after'))
         )
+        return jsonify({
+            "success": True,
+            "orders": orders,
+            "count": len(orders),
+            "next_cursor": next_cursor
+        }), 200
+    except BadRequest as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        current_app.logger.exception("Error en list_orders_admin")
+        return jsonify({"success": False, "error": str(e)}), 500
 
-        print(f" Resultado - matched: {result.matched_count}, modified: {result.modified_count}")
-
-        if result.matched_count == 0:
-            return jsonify({"success": False, "error": "Usuario no encontrado"}), 404
-
-        updated_user = db['users'].find_one({"_id": ObjectId(user_id)})
-        updated_user['_id'] = str(updated_user['_id'])
-        del updated_user['password']
-
-        return jsonify({"success": True, "user": updated_user}), 200
-
+@main.route('/admin/orders/summary', methods=['GET'])
+@admin_required
+def orders_summary_admin():
+    try:
+        summary = orders_admin.order_summary(
+            db,
+            orders_admin.order_filters(request.args),
+            orders_admin.parse_top(request.args.get('top'))
+        )
+        return jsonify({"success": True, "summary": summary}), 200
+    except BadRequest as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
+        current_app.logger.exception("Error en orders_summary_admin")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/admin/orders/<order_id>', methods=['GET'])
+@main.route('/admin/orders/<order_id>', methods=['GET'])
 @admin_required
 def get_order_by_id(order_id):
     try:
@@ -530,13 +695,12 @@ def get_order_by_id(order_id):
         if not order:
             return jsonify({"success": False, "error": "Orden no encontrada"}), 404
 
-        order = convert_objectid(order)
         return jsonify({"success": True, "order": order}), 200
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
     
     
-@app.route('/admin/user', methods=['POST'])
+@main.route('/admin/user', methods=['POST'])
 @admin_required
 def create_user_admin():
     try:
@@ -549,35 +713,25 @@ def create_user_admin():
             if field not in data or not data[field]:
                 return jsonify({"success": False, "error": f"Campo requerido faltante: {field}"}), 400
 
-        if db['users'].find_one({"email": data['email']}):
+        if db['users'].find_one({"email": data['email']}, {"_id": 1}):
             return jsonify({"success": False, "error": "El email ya está registrado"}), 400
 
-        hashed_password = generate_password_hash(data['password'])
+        hashed_password = passwords.hash_password(data['password'])
 
         user = {
             "username": data['username'],
             "email": data['email'],
-            "password": hashed_password,
+            "password_hash": hashed_password,
             "role": data['role']
         }
         result = db['users'].insert_one(user)
-        user['_id'] = str(result.inserted_id)
-        del user['password']  
+        del user['password_hash']  
 
         return jsonify({"success": True, "user": user}), 201
+    except passwords.HashingBusy as e:
+        return busy_response(e)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
     
-def convert_objectid(obj):
-    if isinstance(obj, list):
-        return [convert_objectid(item) for item in obj]
-    elif isinstance(obj, dict):
-        return {k: convert_objectid(v) for k, v in obj.items()}
-    elif isinstance(obj, ObjectId):
-        return str(obj)
-    else:
-        return obj
-    
-    
 if __name__ == '__main__':
-    app.run(debug=True, port=5005)
\ No newline at end of file
+    create_app().run(debug=True, port=5005)
\ No newline at end of file
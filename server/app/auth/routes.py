@@ -1,18 +1,29 @@
 from datetime import timedelta
 import re
 from bson import ObjectId
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from flask_login import login_required, logout_user
 from werkzeug.exceptions import BadRequest
 from flask_jwt_extended import create_access_token, create_refresh_token, decode_token, get_jwt_identity, jwt_required
-from werkzeug.security import generate_password_hash
 from models import User  
-from database import dbConnect
+from database import LazyDatabase
+import passwords
+from passwords import HashingBusy
 
-db = dbConnect()
+db = LazyDatabase()
 
 auth = Blueprint('auth', __name__)
 
+LOGIN_FIELDS = {"email": 1, "username": 1, "name": 1, "password_hash": 1}
+
+
+def busy_response(error):
+    return jsonify({
+        "success": False,
+        "error": "Servidor ocupado, reintentá en unos segundos"
+    }), 503, {"Retry-After": str(error.retry_after)}
+
+
 @auth.route('/login', methods=['POST'])
 def login():
     try:
@@ -24,13 +35,19 @@ def login():
         password = data['password']
 
         users_collection = db['users']
-        user_data = users_collection.find_one({"email": email})
+        user_data = users_collection.find_one({"email": email}, LOGIN_FIELDS)
         if not user_data:
             return jsonify({"success": False, "error": "Credenciales inválidas"}), 401
 
-        from werkzeug.security import check_password_hash
-        if not check_password_hash(user_data['password_hash'], password):
+        valid, new_hash = passwords.verify_and_update(user_data.get('password_hash'), password)
+        if not valid:
             return jsonify({"success": False, "error": "Credenciales inválidas"}), 401
+        if new_hash:
+            # Parámetros de hash cambiados: se reemplaza sólo si nadie lo tocó entre medio.
+            users_collection.update_one(
+                {"_id": user_data['_id'], "password_hash": user_data['password_hash']},
+                {"$set": {"password_hash": new_hash}}
+            )
 
         access_token = create_access_token(identity=str(user_data['_id']))
         refresh_token = create_refresh_token(identity=str(user_data['_id']))
@@ -48,8 +65,10 @@ def login():
 
     except BadRequest as e:
         return jsonify({"success": False, "error": str(e)}), 400
+    except HashingBusy as e:
+        return busy_response(e)
     except Exception as e:
-        print(f"Error en login: {str(e)}")  
+        current_app.logger.exception("Error en login")
         return jsonify({"success": False, "error": "Error interno del servidor"}), 500
 
 @auth.route('/logout', methods=['POST'])
@@ -79,10 +98,10 @@ def register():
             return jsonify({"error": "La contraseña debe tener al menos 6 caracteres"}), 400
 
         users_collection = db['users']
-        if users_collection.find_one({"$or": [{"email": email}, {"username": username}]}):
+        if users_collection.find_one({"$or": [{"email": email}, {"username": username}]}, {"_id": 1}):
             return jsonify({"error": "Usuario o email ya registrado"}), 409
 
-        hashed_pw = generate_password_hash(password)
+        hashed_pw = passwords.hash_password(password)
         user_data = {
             "username": username,
             "email": email,
@@ -102,6 +121,8 @@ def register():
             "refresh_token": refresh_token
         }), 201
 
+    except HashingBusy as e:
+        return busy_response(e)
     except Exception as e:
         return jsonify({"error": "Error interno del servidor", "details": str(e)}), 500
     
@@ -126,7 +147,7 @@ def request_reset():
     if not email:
         return jsonify({"error": "Email es requerido"}), 400
 
-    user = db['users'].find_one({"email": email})
+    user = db['users'].find_one({"email": email}, {"_id": 1})
     if not user:
         return jsonify({"error": "No se encontró una cuenta con ese email"}), 404
 
@@ -175,7 +196,7 @@ def reset_password():
                 "errorType": "invalid_user_id"
             }), 400
 
-        hashed_pw = generate_password_hash(password)
+        hashed_pw = passwords.hash_password(password)
         result = db['users'].update_one(
             {"_id": ObjectId(user_id)},
             {"$set": {"password_hash": hashed_pw}}
@@ -193,6 +214,8 @@ def reset_password():
             "message": "Contraseña actualizada correctamente"
         }), 200
 
+    except HashingBusy as e:
+        return busy_response(e)
     except Exception as e:
         return jsonify({
             "success": False,
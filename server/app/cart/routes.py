@@ -2,14 +2,19 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson import ObjectId
 from models import User
-from database import dbConnect
+from database import LazyDatabase
+from catalog import CART_PRODUCT_FIELDS, fetch_products_by_ids, unavailable_header, unavailable_reason
 
-db = dbConnect()
+db = LazyDatabase()
 
 cart = Blueprint('cart', __name__)
 
+# Sólo lo que estas rutas usan: nada de datos de compra ni password_hash.
+CURRENT_USER_FIELDS = {"username": 1, "email": 1, "role": 1, "cart": 1}
+
+
 def get_current_user():
-    user_data = db['users'].find_one({"_id": ObjectId(get_jwt_identity())})
+    user_data = db['users'].find_one({"_id": ObjectId(get_jwt_identity())}, CURRENT_USER_FIELDS)
     return User(user_data) if user_data else None
 
 
@@ -18,17 +23,88 @@ def get_current_user():
 def get_cart():
     user = get_current_user()
     items = []
+    unavailable = []
 
+    products = fetch_products_by_ids(
+        db, [item["product_id"] for item in user.cart], CART_PRODUCT_FIELDS
+    )
     for item in user.cart:
-        product = db['products'].find_one({"_id": ObjectId(item["product_id"])})
-        if product:
-            product["_id"] = str(product["_id"])
-            items.append({
-                "product": product,
-                "quantity": item["quantity"]
-            })
+        product = products.get(str(item["product_id"]))
+        reason = unavailable_reason(product)
+        if reason:
+            unavailable.append({"product_id": str(item["product_id"]), "reason": reason})
+            continue
+        items.append({
+            "product": product,
+            "quantity": item["quantity"]
+        })
+
+    response = jsonify(items)
+    if unavailable:
+        response.headers["X-Unavailable-Products"] = unavailable_header(unavailable)
+    return response, 200
+
+
+def add_cart_item(user_id, product_id, quantity):
+    """Suma `quantity` al ítem o lo agrega si no está, sin leer el carrito.
+
+    Si el producto ya está en el carrito alcanza con un $inc posicional; si
+    no, un $push condicionado a que siga sin estar. Si otro request lo agregó
+    entre medio, el $push no matchea y se reintenta el $inc.
+    """
+    user_filter = {"_id": ObjectId(user_id)}
+    for _ in range(3):
+        result = db['users'].update_one(
+            dict(user_filter, **{"cart.product_id": product_id}),
+            {"$inc": {"cart.$.quantity": quantity}}
+        )
+        if result.matched_count:
+            return True
 
-    return jsonify(items), 200
+        result = db['users'].update_one(
+            dict(user_filter, cart={"$not": {"$elemMatch": {"product_id": product_id}}}),
+            {"$push": {"cart": {"product_id": product_id, "quantity": quantity}}}
+        )
+        if result.matched_count:
+            return True
+
+        if not db['users'].count_documents(user_filter, limit=1):
+            return False
+    return False
+
+
+def change_cart_item(user_id, product_id, quantity_change):
+    """Aplica un delta a la cantidad; si queda en 0 o menos, quita el ítem.
+
+    Devuelve False si el producto no estaba en el carrito.
+    """
+    user_filter = {"_id": ObjectId(user_id)}
+    for _ in range(3):
+        result = db['users'].update_one(
+            dict(user_filter, cart={"$elemMatch": {
+                "product_id": product_id,
+                "quantity": {"$gt": -quantity_change}
+            }}),
+            {"$inc": {"cart.$.quantity": quantity_change}}
+        )
+        if result.matched_count:
+            return True
+
+        result = db['users'].update_one(
+            dict(user_filter, cart={"$elemMatch": {
+                "product_id": product_id,
+                "quantity": {"$lte": -quantity_change}
+            }}),
+            {"$pull": {"cart": {"product_id": product_id}}}
+        )
+        if result.matched_count:
+            return True
+
+        # Ninguna de las dos matcheó: o no está en el carrito o la cantidad
+        # cambió entre ambas operaciones.
+        if not db['users'].count_documents(dict(user_filter, **{"cart.product_id": product_id}), limit=1):
+            return False
+    return False
 
 
 @cart.route('/add', methods=['POST'])
@@ -36,15 +112,16 @@ def get_cart():
 def add_to_cart():
     data = request.get_json()
     product_id = data.get("product_id")
-    quantity = data.get("quantity", 1)
+    try:
+        quantity = int(data.get("quantity", 1))
+    except (TypeError, ValueError):
+        return jsonify({"message": "Cantidad inválida"}), 400
 
-    user = get_current_user()
-    user.add_to_cart(product_id, quantity)
+    if not product_id or quantity < 1:
+        return jsonify({"message": "product_id y una cantidad positiva son requeridos"}), 400
 
-    db['users'].update_one(
-        {"_id": ObjectId(user.id)},
-        {"$set": {"cart": user.cart}}
-    )
+    if not add_cart_item(get_jwt_identity(), product_id, quantity):
+        return jsonify({"message": "Usuario no encontrado"}), 404
 
     return jsonify({"message": "Producto agregado al carrito"}), 200
 
@@ -53,26 +130,12 @@ def add_to_cart():
 def update_cart_item():
     data = request.get_json()
     product_id = data.get("product_id")
-    quantity_change = data.get("quantity", 0) 
+    try:
+        quantity_change = int(data.get("quantity", 0))
+    except (TypeError, ValueError):
+        return jsonify({"message": "Cantidad inválida"}), 400
 
-    user = get_current_user()
-    
-    item_index = next((i for i, item in enumerate(user.cart) 
-                      if item["product_id"] == product_id), None)
-    
-    if item_index is not None:
-        new_quantity = user.cart[item_index]["quantity"] + quantity_change
-        
-        if new_quantity <= 0:
-            user.cart.pop(item_index)
-        else:
-            user.cart[item_index]["quantity"] = new_quantity
-        
-        db['users'].update_one(
-            {"_id": ObjectId(user.id)},
-            {"$set": {"cart": user.cart}}
-        )
-        
+    if change_cart_item(get_jwt_identity(), product_id, quantity_change):
         return jsonify({"message": "Carrito actualizado"}), 200
     
     return jsonify({"message": "Producto no encontrado en el carrito"}), 404
@@ -81,12 +144,9 @@ def update_cart_item():
 @cart.route('/remove/<product_id>', methods=['DELETE'])
 @jwt_required()
 def remove_from_cart(product_id):
-    user = get_current_user()
-    user.remove_from_cart(product_id)
-
     db['users'].update_one(
-        {"_id": ObjectId(user.id)},
-        {"$set": {"cart": user.cart}}
+        {"_id": ObjectId(get_jwt_identity())},
+        {"$pull": {"cart": {"product_id": product_id}}}
     )
 
     return jsonify({"message": "Producto eliminado del carrito"}), 200
\ No newline at end of file
@@ -0,0 +1,172 @@
+import base64
+import json
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+from werkzeug.exceptions import BadRequest
+
+# Campos que el carrito, el checkout y la wishlist realmente muestran.
+CART_PRODUCT_FIELDS = {
+    "title": 1,
+    "price": 1,
+    "original_price": 1,
+    "main_image": 1,
+    "stock": 1,
+    "is_active": 1,
+}
+
+
+def fetch_products_by_ids(db, product_ids, projection=None):
+    """Trae todos los productos en un solo $in y los devuelve indexados por id (str)."""
+    object_ids = []
+    for product_id in product_ids:
+        if ObjectId.is_valid(str(product_id)):
+            object_ids.append(ObjectId(str(product_id)))
+
+    if not object_ids:
+        return {}
+
+    found = {}
+    for product in db['products'].find({"_id": {"$in": list(set(object_ids))}}, projection):
+        product["_id"] = str(product["_id"])
+        found[product["_id"]] = product
+    return found
+
+
+def hydrate_products(db, product_ids, projection=CART_PRODUCT_FIELDS):
+    """Resuelve una lista de ids respetando su orden original.
+
+    Devuelve (productos, no_disponibles). Los ids que no existen o cuyo
+    producto está desactivado se reportan aparte con su motivo.
+    """
+    found = fetch_products_by_ids(db, product_ids, projection)
+
+    products = []
+    unavailable = []
+    for product_id in product_ids:
+        product = found.get(str(product_id))
+        reason = unavailable_reason(product)
+        if reason:
+            unavailable.append({"product_id": str(product_id), "reason": reason})
+        else:
+            products.append(product)
+    return products, unavailable
+
+
+def unavailable_reason(product):
+    if product is None:
+        return "not_found"
+    if not product.get("is_active", True):
+        return "inactive"
+    return None
+
+
+def unavailable_header(unavailable):
+    return ",".join(f"{item['product_id']}:{item['reason']}" for item in unavailable)
+
+
+# --- Listados paginados -----------------------------------------------------
+
+PRODUCT_LISTING_FIELDS = {
+    "title", "description", "price", "original_price", "category",
+    "subcategories", "image_urls", "main_image", "stock", "sku", "brand",
+    "attributes", "rating", "review_count", "tags", "is_featured",
+    "is_active", "created_at", "updated_at",
+}
+# Campos internos que nunca se devuelven al cliente.
+DEFAULT_PRODUCT_PROJECTION = {"search_index": 0}
+SORT_KEYS = ("_id", "created_at")
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+STREAM_BATCH_SIZE = 500
+
+
+def parse_fields(raw):
+    """Convierte `fields=title,price` en una proyección de Mongo (None = todo)."""
+    if not raw:
+        return None
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in PRODUCT_LISTING_FIELDS and f != "_id"]
+    if unknown:
+        raise BadRequest(f"Campos no permitidos: {', '.join(unknown)}")
+    return {f: 1 for f in fields}
+
+
+def parse_limit(raw):
+    if raw is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise BadRequest("limit debe ser un número entero")
+    if limit < 1:
+        raise BadRequest("limit debe ser mayor a 0")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def parse_sort(raw):
+    sort_key = raw or "_id"
+    if sort_key not in SORT_KEYS:
+        raise BadRequest(f"sort debe ser uno de: {', '.join(SORT_KEYS)}")
+    return sort_key
+
+
+def encode_cursor(doc, sort_key):
+    payload = {"id": str(doc["_id"])}
+    if sort_key == "created_at":
+        payload["created_at"] = doc["created_at"].isoformat()
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(token, sort_key):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+        after = {"_id": ObjectId(payload["id"])}
+        if sort_key == "created_at":
+            after["created_at"] = datetime.fromisoformat(payload["created_at"])
+        return after
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise BadRequest("Cursor inválido")
+
+
+def keyset_query(query, sort_key, after):
+    if after is None:
+        return query
+    if sort_key == "_id":
+        return {"$and": [query, {"_id": {"$gt": after["_id"]}}]}
+    return {"$and": [query, {"$or": [
+        {"created_at": {"$gt": after["created_at"]}},
+        {"created_at": after["created_at"], "_id": {"$gt": after["_id"]}},
+    ]}]}
+
+
+def listing_cursor(db, query, sort_key, projection, after=None):
+    if projection is None:
+        projection = DEFAULT_PRODUCT_PROJECTION
+    elif sort_key == "created_at":
+        # El cursor necesita created_at aunque el cliente no lo haya pedido.
+        projection = dict(projection, created_at=1)
+    sort = [("_id", 1)] if sort_key == "_id" else [("created_at", 1), ("_id", 1)]
+    return db['products'].find(keyset_query(query, sort_key, after), projection).sort(sort)
+
+
+def fetch_page(db, query, sort_key, projection, limit, after=None):
+    """Trae una página con keyset pagination; pide limit+1 para saber si hay más."""
+    docs = list(listing_cursor(db, query, sort_key, projection, after).limit(limit + 1))
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], sort_key)
+    for doc in docs:
+        doc["_id"] = str(doc["_id"])
+    return docs, next_cursor
+
+
+def stream_json_array(cursor, dumps):
+    """Codifica el cursor documento por documento como un array JSON."""
+    yield "["
+    first = True
+    for doc in cursor.batch_size(STREAM_BATCH_SIZE):
+        yield ("" if first else ",") + dumps(doc)
+        first = False
+    yield "]"
@@ -0,0 +1,82 @@
+import os
+import threading
+from cache import LRUCache, redis_cache_from_url
+from conditional import bump_catalog_version, bump_stock_version, catalog_version
+
+# Cache read-through del catálogo. Claves:
+#   product:<versión>:<id>           detalle de un producto activo
+#   category:<versión>:<slug>:<params>  página de categoría con facetas
+#   listing:<versión>:<params>       páginas de GET /products
+# Las claves llevan la misma versión que los ETags: la del catálogo en el
+# detalle y la de listados (catálogo + stock, conditional.listing_version)
+# en categorías y listados. Una escritura del admin sube la del catálogo y
+# una venta la de stock; todos los workers dejan de usar las entradas viejas,
+# que quedan huérfanas hasta que las desaloje el LRU o venza el TTL.
+# invalidate() sólo borra en el backend de este proceso cuando es el LRU:
+# tras una venta el detalle en otros workers se actualiza al vencer
+# CATALOG_PRODUCT_TTL (el ETag del detalle usa updated_at, que sí cambia).
+
+
+PRODUCT_TTL = float(os.getenv("CATALOG_PRODUCT_TTL", 30))
+
+
+def backend_from_env():
+    ttl = float(os.getenv("CATALOG_CACHE_TTL", 300))
+    url = os.getenv("CATALOG_CACHE_URL")
+    if url:
+        return redis_cache_from_url(url, prefix="tienda:catalog:", ttl=ttl)
+    return LRUCache(maxsize=int(os.getenv("CATALOG_CACHE_SIZE", 5000)), ttl=ttl)
+
+
+class CatalogCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.invalidations = 0
+
+    def get_or_load(self, key, loader, ttl=None):
+        value = self.backend.get(key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.backend.set(key, value, ttl=ttl)
+        return value
+
+    def product(self, version, product_id, loader):
+        return self.get_or_load(f"product:{version}:{product_id}", loader, ttl=PRODUCT_TTL)
+
+    def category(self, version, category, params, loader):
+        return self.get_or_load(f"category:{version}:{category}:{canonical_params(params)}", loader)
+
+    def listing(self, version, params, loader):
+        return self.get_or_load(f"listing:{version}:{canonical_params(params)}", loader)
+
+    def invalidate(self, version, product_ids=()):
+        for product_id in product_ids:
+            self.backend.delete(f"product:{version}:{product_id}")
+        with self._lock:
+            self.invalidations += 1
+
+    def stats(self):
+        stats = self.backend.stats()
+        stats["invalidations"] = self.invalidations
+        return stats
+
+
+def canonical_params(params):
+    return "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+
+
+catalog_cache = CatalogCache(backend_from_env())
+
+
+def catalog_changed(db, product_ids=()):
+    """Punto único para avisar que el catálogo cambió: cache + versión (ETags)."""
+    catalog_cache.invalidate(catalog_version(db)[0], product_ids=product_ids)
+    return bump_catalog_version(db)
+
+
+def stock_changed(db, product_ids=()):
+    """Una venta cambió el stock: detalle de esos productos + versión de listados."""
+    catalog_cache.invalidate(catalog_version(db)[0], product_ids=product_ids)
+    return bump_stock_version(db)
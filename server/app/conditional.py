@@ -0,0 +1,118 @@
+import hashlib
+import os
+import time
+from datetime import datetime, timezone
+from flask import Response, request
+from pymongo import ReturnDocument
+
+# Peticiones condicionales (ETag / Last-Modified) para el catálogo. Un
+# producto se identifica por _id + updated_at; los listados por dos
+# contadores globales que se guardan en Mongo para que todos los workers vean
+# el mismo valor: la versión del catálogo (ediciones del admin) y la de stock
+# (ventas del checkout, que cambian el `stock` de los listados sin tocar el
+# resto del catálogo).
+COUNTERS_COLLECTION = "counters"
+CATALOG_VERSION_ID = "catalog_version"
+STOCK_VERSION_ID = "stock_version"
+# Cada listado lee los contadores; se guardan en el proceso este tiempo para
+# no hacer una consulta por request. Una escritura en otro worker se ve con
+# hasta este atraso (en el propio worker, enseguida).
+CATALOG_VERSION_TTL = float(os.getenv("CATALOG_VERSION_TTL", 1.0))
+
+_cached_counters = {}
+
+
+def as_utc(value):
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def make_etag(*parts):
+    return hashlib.sha1(":".join(str(p) for p in parts).encode()).hexdigest()
+
+
+def product_validators(product):
+    updated_at = as_utc(product.get("updated_at") or product.get("created_at"))
+    stamp = updated_at.isoformat() if updated_at else "0"
+    return make_etag("product", product["_id"], stamp), updated_at
+
+
+def remember_counter(counter_id, state):
+    counter = (state.get("value", 0), as_utc(state.get("updated_at"))) if state else (0, None)
+    _cached_counters[counter_id] = (time.monotonic() + CATALOG_VERSION_TTL, counter)
+    return counter
+
+
+def read_counters(db, counter_ids):
+    """{id: (valor, updated_at)}; sólo consulta los que vencieron en el cache del proceso."""
+    now = time.monotonic()
+    counters = {}
+    for counter_id in counter_ids:
+        cached = _cached_counters.get(counter_id)
+        if cached and now < cached[0]:
+            counters[counter_id] = cached[1]
+    missing = [counter_id for counter_id in counter_ids if counter_id not in counters]
+    if missing:
+        states = {state["_id"]: state for state in db[COUNTERS_COLLECTION].find({"_id": {"$in": missing}})}
+        for counter_id in missing:
+            counters[counter_id] = remember_counter(counter_id, states.get(counter_id))
+    return counters
+
+
+def catalog_version(db):
+    return read_counters(db, [CATALOG_VERSION_ID])[CATALOG_VERSION_ID]
+
+
+def listing_version(db):
+    """Versión de los listados (catálogo + stock) y su Last-Modified."""
+    counters = read_counters(db, [CATALOG_VERSION_ID, STOCK_VERSION_ID])
+    (catalog, catalog_at), (stock, stock_at) = counters[CATALOG_VERSION_ID], counters[STOCK_VERSION_ID]
+    stamps = [stamp for stamp in (catalog_at, stock_at) if stamp]
+    return f"{catalog}.{stock}", max(stamps) if stamps else None
+
+
+def bump_counter(db, counter_id):
+    state = db[COUNTERS_COLLECTION].find_one_and_update(
+        {"_id": counter_id},
+        {"$inc": {"value": 1}, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return remember_counter(counter_id, state)[0]
+
+
+def bump_catalog_version(db):
+    return bump_counter(db, CATALOG_VERSION_ID)
+
+
+def bump_stock_version(db):
+    return bump_counter(db, STOCK_VERSION_ID)
+
+
+def listing_etag(version, scope):
+    """ETag para un listado: versión de listados (listing_version) + ruta + parámetros."""
+    params = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+    return make_etag("listing", version, scope, params)
+
+
+def is_not_modified(etag, last_modified):
+    # Si viene If-None-Match, manda sobre If-Modified-Since (RFC 9110).
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def with_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    return response
+
+
+def not_modified_response(etag, last_modified):
+    return with_validators(Response(status=304), etag, last_modified)
@@ -1,24 +1,208 @@
 from datetime import datetime
-from pymongo import MongoClient
-from sqlalchemy import false, true
+import os
+import threading
+import time
+from pymongo import MongoClient, monitoring
 
 MONGO_URI = "mongodb://localhost:27017/"
 DATABASE_NAME = "tiendaGenerica"
 
+# Un único MongoClient por proceso y URI. MongoClient ya mantiene su propio
+# pool de conexiones y es thread-safe, así que crear uno por request sólo
+# agrega handshakes y deja pools abiertos.
+_clients = {}
+_clients_lock = threading.Lock()
+_clients_pid = os.getpid()
+
+
+def _pool_options():
+    return {
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", 50)),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", 0)),
+        "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 60000)),
+        "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 2000)),
+        "maxConnecting": int(os.getenv("MONGO_MAX_CONNECTING", 2)),
+    }
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Acumula métricas del pool de conexiones para poder dimensionarlo bajo carga."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.open_connections = 0
+            self.checked_out = 0
+            self.max_checked_out = 0
+            self.checkouts = 0
+            self.checkout_failures = {}
+            self.pool_clears = 0
+            self.wait_time_total = 0.0
+            self.wait_time_max = 0.0
+
+    def _wait_started(self, address):
+        starts = getattr(self._local, "starts", None)
+        if starts is None:
+            starts = self._local.starts = {}
+        starts[address] = time.perf_counter()
+
+    def _wait_finished(self, address):
+        starts = getattr(self._local, "starts", {})
+        started = starts.pop(address, None)
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def connection_check_out_started(self, event):
+        self._wait_started(event.address)
+
+    def connection_check_out_failed(self, event):
+        self._wait_finished(event.address)
+        with self._lock:
+            reason = str(event.reason)
+            self.checkout_failures[reason] = self.checkout_failures.get(reason, 0) + 1
+
+    def connection_checked_out(self, event):
+        waited = self._wait_finished(event.address)
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": dict(self.checkout_failures),
+                "pool_clears": self.pool_clears,
+                "wait_time_avg_ms": round(self.wait_time_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "wait_time_max_ms": round(self.wait_time_max * 1000, 3),
+            }
+
+
+pool_stats = PoolStatsListener()
+
+
+def _reset_after_fork():
+    # Los workers prefork de gunicorn heredan el registro del master; un
+    # MongoClient no sobrevive a fork(), así que el hijo arranca de cero.
+    global _clients, _clients_lock, _clients_pid
+    _clients = {}
+    _clients_lock = threading.Lock()
+    _clients_pid = os.getpid()
+    pool_stats.reset()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_client(uri=None):
+    uri = uri or os.getenv("MONGO_URI", MONGO_URI)
+    if _clients_pid != os.getpid():
+        _reset_after_fork()
+
+    client = _clients.get(uri)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(uri)
+        if client is None:
+            client = MongoClient(
+                uri,
+                ssl=False,
+                socketTimeoutMS=20000,
+                connectTimeoutMS=20000,
+                serverSelectionTimeoutMS=5000,
+                event_listeners=[pool_stats],
+                **_pool_options()
+            )
+            _clients[uri] = client
+            print("Conexión exitosa a la base de datos")
+    return client
+
+
+def register_client(client, uri=None):
+    """Usa `client` para `uri` en este proceso (p. ej. mongomock en los benchmarks)."""
+    uri = uri or os.getenv("MONGO_URI", MONGO_URI)
+    if _clients_pid != os.getpid():
+        _reset_after_fork()
+    with _clients_lock:
+        _clients[uri] = client
+    return client
+
+
+def close_clients():
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+def get_pool_stats():
+    stats = pool_stats.snapshot()
+    stats["pid"] = os.getpid()
+    stats["options"] = _pool_options()
+    return stats
+
+
 def dbConnect():
     try:
-        client = MongoClient(
-    'mongodb://localhost:27017/',
-    ssl=False, 
-    socketTimeoutMS=20000,
-    connectTimeoutMS=20000,
-    serverSelectionTimeoutMS=5000
-)
-        print("Conexión exitosa a la base de datos")
-        db = client[DATABASE_NAME]
-        
+        client = get_client()
+        db = client[os.getenv("DATABASE_NAME", DATABASE_NAME)]
+
         return db
     except ConnectionError as e:
         print(f"Error al conectar a la base de datos: {e}")
         raise
-    
+
+
+class LazyDatabase:
+    """Se comporta como el Database de dbConnect() pero lo resuelve en cada uso.
+
+    Los módulos lo guardan a nivel global sin abrir conexiones al importarse,
+    y como dbConnect() es consciente de fork(), con preload de gunicorn cada
+    worker termina usando su propio cliente.
+    """
+
+    def __getitem__(self, name):
+        return dbConnect()[name]
+
+    def __getattr__(self, name):
+        return getattr(dbConnect(), name)
@@ -1,8 +1,8 @@
 from functools import wraps
 from flask import jsonify
 from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
-from bson import ObjectId
 import database as db
+from principals import get_principal
 
 def admin_required(fn):
     @wraps(fn)
@@ -10,10 +10,7 @@ def admin_required(fn):
         verify_jwt_in_request()
         current_user_id = get_jwt_identity()
         
-        database = db.dbConnect()
-        users_collection = database.users
-        
-        user = users_collection.find_one({"_id": ObjectId(current_user_id)})
+        user = get_principal(db.dbConnect(), current_user_id)
         
         if not user or user.get("role") != "admin":
             return jsonify({
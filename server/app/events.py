@@ -0,0 +1,374 @@
+"""Bus de eventos de productos y órdenes.
+
+Lee los cambios de `products` y `orders` y los entrega por lotes a
+suscriptores en el mismo proceso, que mantienen los datos derivados:
+
+  products  search_index    recalcula el índice de búsqueda si cambió
+            facets          ajusta los conteos por categoría (facet_members)
+            stock_alerts    abre/cierra alertas de stock bajo
+  orders    recommendations refresh incremental de product_neighbors
+
+search_index y facetas también se mantienen en línea en cada escritura de
+la API (product_rules.sync_derived); el bus cubre lo que escribe por fuera
+(checkout, scripts, la consola de Mongo). Las dos vías son idempotentes y
+pueden correr a la vez. stock_alerts y recommendations dependen sólo del
+bus: tiene que correr como proceso aparte (ver READme.md). /metrics expone
+tienda_events_bus_up y el arranque de gunicorn avisa si no está corriendo.
+
+Fuente: change streams de Mongo (full_document="updateLookup") si el
+servidor es un replica set; en un standalone, polling por (updated_at, _id)
+sobre el índice updated_id, leyendo sólo hasta EVENTS_POLL_SETTLE segundos
+atrás para no saltear escrituras que confirman tarde.
+
+La posición de cada fuente (resume token o (updated_at, _id)) se guarda en
+`event_offsets` después de entregar el lote, así que al reiniciar se sigue
+desde ahí: la entrega es al menos una vez y los suscriptores son
+idempotentes. Un lease en la misma colección deja correr varias instancias
+(p. ej. una por servidor) con una sola activa.
+
+    python events.py            # corre el bus
+    python events.py status     # posición, modo y lag por fuente
+    python events.py check      # sale con 1 si ninguna instancia tiene el lease
+"""
+import logging
+import os
+import socket
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+import facets
+import inventory
+import recommendations
+import search
+
+logger = logging.getLogger(__name__)
+
+OFFSETS_COLLECTION = "event_offsets"
+GROUP = os.getenv("EVENTS_GROUP", "derived")
+BATCH_SIZE = int(os.getenv("EVENTS_BATCH_SIZE", 500))
+MAX_WAIT = float(os.getenv("EVENTS_MAX_WAIT", 1.0))
+POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", 2.0))
+POLL_SETTLE = timedelta(seconds=float(os.getenv("EVENTS_POLL_SETTLE", 2.0)))
+LEASE_SECONDS = int(os.getenv("EVENTS_LEASE_SECONDS", 30))
+HEARTBEAT_SECONDS = 10
+MAX_ATTEMPTS = 3
+
+# Códigos de error: change streams no soportados (standalone) y resume token
+# que ya salió del oplog.
+CHANGE_STREAMS_UNSUPPORTED = (40573,)
+HISTORY_LOST = (286, 280)
+
+# Campos que escriben los propios suscriptores: un cambio que sólo toca estos
+# no es un cambio del producto.
+DERIVED_FIELDS = {search.SEARCH_INDEX_FIELD}
+EVENT_FIELDS = {
+    "products": sorted(
+        set(search.SEARCH_FIELD_WEIGHTS) | set(facets.FACET_SOURCE_FIELDS)
+        | {search.SEARCH_INDEX_FIELD, "sku", "title", "stock", "updated_at"}
+    ),
+    "orders": ["items.product_id", "status", "created_at", "updated_at"],
+}
+MIN_OBJECT_ID = ObjectId("0" * 24)
+
+
+def make_event(collection, op, doc_id, doc, at, fields=None):
+    return {"collection": collection, "op": op, "id": doc_id, "doc": doc, "at": at, "fields": fields}
+
+
+def derived_only(event):
+    fields = event["fields"]
+    return fields is not None and {field.split(".")[0] for field in fields} <= DERIVED_FIELDS
+
+
+def latest_docs(events):
+    """{_id: último documento visto o None si se borró}, en orden de llegada."""
+    docs = {}
+    for event in events:
+        docs[event["id"]] = None if event["op"] == "delete" else event["doc"]
+    return docs
+
+
+def utc_naive(value):
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+# --- Fuentes -----------------------------------------------------------------
+
+class ChangeStreamSource:
+    mode = "change_stream"
+
+    def __init__(self, db, collection, offset):
+        self.collection = collection
+        project = {"_id": 1, "operationType": 1, "documentKey": 1, "clusterTime": 1,
+                   "updateDescription.updatedFields": 1}
+        project.update({f"fullDocument.{field}": 1 for field in EVENT_FIELDS[collection]})
+        options = {"full_document": "updateLookup", "max_await_time_ms": int(MAX_WAIT * 1000)}
+        if offset.get("token"):
+            options["resume_after"] = offset["token"]
+        # watch() ya falla acá si el servidor no soporta change streams.
+        self.stream = db[collection].watch([{"$project": project}], **options)
+
+    def read(self, limit):
+        events = []
+        deadline = time.monotonic() + MAX_WAIT
+        while len(events) < limit and time.monotonic() < deadline:
+            change = self.stream.try_next()
+            if change is None:
+                if events:
+                    break
+                continue
+            op = change["operationType"]
+            if op == "invalidate":
+                # La colección se borró o renombró: el stream no se puede reanudar.
+                self.stream.close()
+                raise OperationFailure("Change stream invalidado", code=HISTORY_LOST[0])
+            if op not in ("insert", "update", "replace", "delete"):
+                continue
+            fields = change.get("updateDescription", {}).get("updatedFields")
+            events.append(make_event(
+                self.collection, op, change["documentKey"]["_id"], change.get("fullDocument"),
+                utc_naive(change["clusterTime"].as_datetime()),
+                list(fields) if fields is not None else None
+            ))
+        return events, {"token": self.stream.resume_token}
+
+    def close(self):
+        self.stream.close()
+
+
+class PollingSource:
+    mode = "polling"
+
+    def __init__(self, db, collection, offset):
+        self.collection = collection
+        self.db = db
+        self.position = offset.get("position") or {"updated_at": datetime.utcnow(), "_id": MIN_OBJECT_ID}
+
+    def read(self, limit):
+        position = self.position
+        query = {"$and": [
+            {"updated_at": {"$lt": datetime.utcnow() - POLL_SETTLE}},
+            {"$or": [
+                {"updated_at": {"$gt": position["updated_at"]}},
+                {"updated_at": position["updated_at"], "_id": {"$gt": position["_id"]}},
+            ]},
+        ]}
+        docs = list(
+            self.db[self.collection].find(query, EVENT_FIELDS[self.collection])
+            .sort([("updated_at", 1), ("_id", 1)])
+            .limit(limit)
+        )
+        if not docs:
+            time.sleep(POLL_INTERVAL)
+            return [], {"position": position}
+        self.position = {"updated_at": docs[-1]["updated_at"], "_id": docs[-1]["_id"]}
+        # Sin estado previo no se distingue alta de edición; los suscriptores no lo necesitan.
+        return [
+            make_event(self.collection, "update", doc["_id"], doc, doc["updated_at"]) for doc in docs
+        ], {"position": self.position}
+
+    def close(self):
+        pass
+
+
+# --- Bus ---------------------------------------------------------------------
+
+class EventBus:
+    def __init__(self, db, group=GROUP, owner=None):
+        self.db = db
+        self.group = group
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self.subscribers = defaultdict(list)
+        self.sources = {}
+        self.saved_at = {}
+
+    def subscribe(self, collection, name, handler):
+        """handler(events) recibe una lista de eventos; tiene que ser idempotente."""
+        self.subscribers[collection].append((name, handler))
+
+    def offset_id(self, collection):
+        return f"{self.group}:{collection}"
+
+    def claim_lease(self):
+        now = datetime.utcnow()
+        try:
+            self.db[OFFSETS_COLLECTION].find_one_and_update(
+                {"_id": f"{self.group}:lease", "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=LEASE_SECONDS)}},
+                upsert=True, return_document=ReturnDocument.AFTER
+            )
+            return True
+        except DuplicateKeyError:
+            # El upsert chocó con el lease vigente de otra instancia.
+            return False
+
+    def reset_token(self, collection):
+        self.db[OFFSETS_COLLECTION].update_one({"_id": self.offset_id(collection)}, {"$unset": {"token": ""}})
+
+    def open_source(self, collection):
+        offset = self.db[OFFSETS_COLLECTION].find_one({"_id": self.offset_id(collection)}) or {}
+        try:
+            return ChangeStreamSource(self.db, collection, offset)
+        except OperationFailure as e:
+            if e.code in HISTORY_LOST:
+                logger.warning("Resume token de %s vencido; se sigue desde ahora "
+                               "(conviene correr facets.py y search.py)", collection)
+                self.reset_token(collection)
+                return ChangeStreamSource(self.db, collection, {})
+            if e.code not in CHANGE_STREAMS_UNSUPPORTED:
+                raise
+        logger.info("Change streams no disponibles; %s en modo polling", collection)
+        return PollingSource(self.db, collection, offset)
+
+    def deliver(self, collection, events):
+        """Entrega el lote a cada suscriptor; devuelve cuántos fallaron."""
+        failed = 0
+        for name, handler in self.subscribers[collection]:
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                try:
+                    handler(events)
+                    break
+                except Exception:
+                    # Cualquier error, no sólo de Mongo: un lote que rompe un
+                    # suscriptor (un documento con datos inesperados) no
+                    # puede dejar al bus reiniciando sobre el mismo lote.
+                    if attempt == MAX_ATTEMPTS:
+                        # Se sigue adelante para no trabar el bus; el derivado
+                        # se corrige con el próximo cambio o con un rebuild.
+                        logger.exception("Suscriptor %s falló con %d eventos de %s", name, len(events), collection)
+                        failed += 1
+                    else:
+                        time.sleep(0.5 * 2 ** (attempt - 1))
+        return failed
+
+    def save_offset(self, collection, source, position, events, failed):
+        now = datetime.utcnow()
+        lag = (now - events[-1]["at"]).total_seconds() if events else 0.0
+        self.db[OFFSETS_COLLECTION].update_one(
+            {"_id": self.offset_id(collection)},
+            {"$set": {**position, "mode": source.mode, "owner": self.owner,
+                      "lag_seconds": round(max(lag, 0.0), 3), "updated_at": now},
+             "$inc": {"delivered": len(events), "failed": failed}},
+            upsert=True
+        )
+        self.saved_at[collection] = time.monotonic()
+
+    def step(self, collection):
+        source = self.sources.get(collection)
+        if source is None:
+            source = self.sources[collection] = self.open_source(collection)
+        try:
+            events, position = source.read(BATCH_SIZE)
+        except OperationFailure as e:
+            if e.code not in HISTORY_LOST:
+                raise
+            logger.warning("Stream de %s perdido (%s); se sigue desde ahora", collection, e)
+            source.close()
+            del self.sources[collection]
+            self.reset_token(collection)
+            return 0
+
+        relevant = [event for event in events if not derived_only(event)]
+        failed = self.deliver(collection, relevant) if relevant else 0
+        recently_saved = time.monotonic() - self.saved_at.get(collection, 0) < HEARTBEAT_SECONDS
+        if events or not recently_saved:
+            # También sin eventos: el resume token avanza y lag vuelve a 0.
+            self.save_offset(collection, source, position, relevant, failed)
+        return len(relevant)
+
+    def close_sources(self):
+        for source in self.sources.values():
+            source.close()
+        self.sources = {}
+
+    def run(self, should_stop=lambda: False):
+        lease_checked = 0
+        while not should_stop():
+            if time.monotonic() - lease_checked > LEASE_SECONDS / 3:
+                if not self.claim_lease():
+                    self.close_sources()
+                    time.sleep(LEASE_SECONDS / 3)
+                    continue
+                lease_checked = time.monotonic()
+            for collection in list(self.subscribers):
+                self.step(collection)
+        self.close_sources()
+
+
+def default_subscribers(bus, db):
+    # El cache del catálogo no se toca desde acá: el bus es otro proceso y su
+    # cache no es el de los workers. Lo invalida cada escritura en el request
+    # (catalog_changed / stock_changed), subiendo los contadores compartidos.
+    bus.subscribe("products", "search_index", lambda events: search.sync_search_index(db, latest_docs(events)))
+    bus.subscribe("products", "facets", lambda events: facets.sync_facet_members(db, latest_docs(events)))
+    bus.subscribe("products", "stock_alerts", lambda events: inventory.sync_stock_alerts(db, latest_docs(events)))
+    bus.subscribe("orders", "recommendations", lambda events: recommendations.refresh(db))
+    return bus
+
+
+# --- Estado y métricas ---------------------------------------------------------
+
+def status(db, group=GROUP):
+    return list(db[OFFSETS_COLLECTION].find(
+        {"_id": {"$regex": f"^{group}:"}},
+        {"token": 0, "position": 0}
+    ))
+
+
+def bus_running(db, group=GROUP):
+    """True si alguna instancia del bus tiene el lease vigente."""
+    lease = db[OFFSETS_COLLECTION].find_one({"_id": f"{group}:lease"}, {"expires_at": 1})
+    return bool(lease) and lease["expires_at"] > datetime.utcnow()
+
+
+def metric_lines(db, group=GROUP):
+    """Gauges/counters por fuente para /metrics (los escribe el proceso del bus)."""
+    offsets = [offset for offset in status(db, group) if "mode" in offset]
+    metrics = (
+        ("tienda_events_lag_seconds", "gauge", "Atraso del último lote entregado", "lag_seconds"),
+        ("tienda_events_delivered_total", "counter", "Eventos entregados a los suscriptores", "delivered"),
+        ("tienda_events_failed_total", "counter", "Lotes que algún suscriptor no pudo procesar", "failed"),
+    )
+    lines = [
+        "# HELP tienda_events_bus_up 1 si alguna instancia del bus tiene el lease vigente",
+        "# TYPE tienda_events_bus_up gauge",
+        f"tienda_events_bus_up {int(bus_running(db, group))}",
+    ]
+    for name, kind, help_text, field in metrics:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for offset in offsets:
+            source = offset["_id"].split(":", 1)[1]
+            lines.append(f'{name}{{source="{source}",mode="{offset["mode"]}"}} {offset.get(field, 0)}')
+    return lines
+
+
+if __name__ == '__main__':
+    from database import dbConnect
+    import indexes
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    command = sys.argv[1] if len(sys.argv) > 1 else "run"
+    database = dbConnect()
+    if command == "run":
+        indexes.migrate(database)
+        try:
+            default_subscribers(EventBus(database), database).run()
+        except KeyboardInterrupt:
+            pass
+    elif command == "status":
+        for offset in status(database):
+            print(offset)
+    elif command == "check":
+        if not bus_running(database):
+            print("El bus de eventos no está corriendo (python events.py)")
+            sys.exit(1)
+        print("El bus de eventos está corriendo")
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,271 @@
+"""Navegación por categoría con facetas precalculadas.
+
+Cada producto guarda, además de `category`, `subcategories` y `brand`:
+
+  category_key   slug normalizado ("Electrónica" -> "electronica"); la
+                 URL /products/category/<slug> lo busca por igualdad
+  price_bucket   rango de precio ("1000-5000", "100000+")
+
+y `category_facets` tiene un documento por categoría con los conteos de
+productos activos por subcategoría, marca y rango de precio, así que una
+página de categoría es una lectura por _id de las facetas más una página de
+productos sobre un índice (category_key, is_active, ...).
+
+Los conteos se mantienen con $inc en cada alta/edición/baja del admin, la
+importación y la sincronización de inventario (product_rules.sync_derived),
+y el bus de eventos (events.py) aplica lo mismo a cualquier otro cambio.
+Por cada producto se compara lo que aporta ahora con lo que ya estaba
+contado (`facet_members`, un documento por producto) y se aplica sólo la
+diferencia: no hace falta el estado previo del producto y procesar dos
+veces el mismo cambio no cuenta nada de más.
+
+rebuild_facets completa los productos existentes y siembra facet_members;
+corre una vez como migración de datos (indexes.py, versión 8) antes de que
+se aplique ninguna diferencia. Para corregir desvíos después:
+
+    python facets.py
+"""
+import re
+from collections import defaultdict
+from datetime import datetime
+from urllib.parse import unquote
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from search import fold
+
+FACETS_COLLECTION = "category_facets"
+MEMBERS_COLLECTION = "facet_members"
+PRICE_BUCKETS = (1000, 5000, 10000, 25000, 50000, 100000)
+# Campos de los que dependen las facetas; si una edición no toca ninguno no
+# hay conteos que ajustar.
+FACET_SOURCE_FIELDS = {"category": 1, "subcategories": 1, "brand": 1, "price": 1, "is_active": 1}
+FACET_GROUPS = ("subcategories", "brands", "price_buckets")
+FILTER_FIELDS = {"brand": "brand", "subcategory": "subcategories", "price": "price_bucket"}
+
+_slug_re = re.compile(r"[^a-z0-9]+")
+
+
+def category_slug(name):
+    return _slug_re.sub("-", fold(name)).strip("-")
+
+
+def price_bucket(price):
+    try:
+        price = float(price)
+    except (TypeError, ValueError):
+        return None
+    lower = 0
+    for upper in PRICE_BUCKETS:
+        if price < upper:
+            return f"{lower}-{upper}"
+        lower = upper
+    return f"{lower}+"
+
+
+def price_bucket_labels():
+    bounds = (0,) + PRICE_BUCKETS
+    return [f"{lower}-{upper}" for lower, upper in zip(bounds, PRICE_BUCKETS)] + [f"{PRICE_BUCKETS[-1]}+"]
+
+
+def facet_fields(product):
+    """Campos derivados para $set en el producto (sólo los que se pueden calcular)."""
+    fields = {}
+    if "category" in product:
+        fields["category_key"] = category_slug(product["category"] or "")
+    if "price" in product:
+        fields["price_bucket"] = price_bucket(product["price"])
+    return fields
+
+
+def encode_key(value):
+    # Las claves de un subdocumento no pueden llevar '.' ni empezar con '$'
+    # si se las quiere actualizar con $inc.
+    encoded = str(value).replace("%", "%25").replace(".", "%2E")
+    return "%24" + encoded[1:] if encoded.startswith("$") else encoded
+
+
+def contribution(product):
+    """(category_key, nombre, {path: 1}) con lo que el producto suma a las facetas."""
+    if not product or not product.get("is_active", True) or not product.get("category"):
+        return None
+    paths = {"total": 1}
+    for subcategory in set(product.get("subcategories") or []) - {""}:
+        paths[f"subcategories.{encode_key(subcategory)}"] = 1
+    if product.get("brand"):
+        paths[f"brands.{encode_key(product['brand'])}"] = 1
+    bucket = price_bucket(product.get("price"))
+    if bucket:
+        paths[f"price_buckets.{bucket}"] = 1
+    return category_slug(product["category"]), product["category"], paths
+
+
+def member_contribution(member):
+    if not member:
+        return None
+    return member["key"], member["name"], {path: 1 for path in member["paths"]}
+
+
+def contribution_delta(before, after):
+    """{category_key: ({path: delta}, nombre)} entre dos aportes (o None)."""
+    deltas = defaultdict(lambda: defaultdict(int))
+    names = {}
+    for contributed, sign in ((before, -1), (after, 1)):
+        if contributed is None:
+            continue
+        key, name, paths = contributed
+        names[key] = name
+        for path, count in paths.items():
+            deltas[key][path] += sign * count
+    return {
+        key: ({path: count for path, count in paths.items() if count}, names[key])
+        for key, paths in deltas.items()
+        if any(paths.values())
+    }
+
+
+def member_doc(contributed):
+    key, name, paths = contributed
+    return {"key": key, "name": name, "paths": sorted(paths)}
+
+
+def claim_member_change(db, product_id, member, after):
+    """Pasa el miembro de `member` (lo leído) a `after`; False si otro se adelantó.
+
+    El request y el bus pueden procesar el mismo producto a la vez: sólo
+    quien gana esta escritura condicional aplica la diferencia.
+    """
+    members = db[MEMBERS_COLLECTION]
+    if member is None:
+        try:
+            members.insert_one({"_id": product_id, **member_doc(after)})
+            return True
+        except DuplicateKeyError:
+            return False
+    expected = {"_id": product_id, "key": member["key"], "paths": member["paths"]}
+    if after is None:
+        return members.delete_one(expected).deleted_count == 1
+    return members.replace_one(expected, member_doc(after)).matched_count == 1
+
+
+def sync_facet_members(db, products):
+    """Ajusta los conteos para {product_id: producto o None (ya no existe)}.
+
+    Devuelve cuántos productos cambiaron su aporte.
+    """
+    members = {member["_id"]: member for member in db[MEMBERS_COLLECTION].find({"_id": {"$in": list(products)}})}
+    merged = defaultdict(lambda: defaultdict(int))
+    names = {}
+    changed = 0
+    for product_id, product in products.items():
+        member = members.get(product_id)
+        after = contribution(product)
+        delta = contribution_delta(member_contribution(member), after)
+        if not delta or not claim_member_change(db, product_id, member, after):
+            continue
+        changed += 1
+        for key, (increments, name) in delta.items():
+            names[key] = name
+            for path, count in increments.items():
+                merged[key][path] += count
+
+    now = datetime.utcnow()
+    for key, increments in merged.items():
+        increments = {path: count for path, count in increments.items() if count}
+        if increments:
+            db[FACETS_COLLECTION].update_one(
+                {"_id": key},
+                {"$inc": increments, "$set": {"name": names[key], "updated_at": now}},
+                upsert=True
+            )
+    return changed
+
+
+def category_facets(db, key):
+    doc = db[FACETS_COLLECTION].find_one({"_id": key})
+    if not doc:
+        return None
+
+    def counts(group, order=None):
+        values = {unquote(value): count for value, count in (doc.get(group) or {}).items() if count > 0}
+        if order:
+            return [{"value": value, "count": values[value]} for value in order if value in values]
+        return [
+            {"value": value, "count": count}
+            for value, count in sorted(values.items(), key=lambda kv: (-kv[1], kv[0]))
+        ]
+
+    return {
+        "name": doc.get("name"),
+        "total": doc.get("total", 0),
+        "subcategories": counts("subcategories"),
+        "brands": counts("brands"),
+        "price_buckets": counts("price_buckets", order=price_bucket_labels()),
+    }
+
+
+def browse_query(key, args):
+    query = {"category_key": key, "is_active": True}
+    for param, field in FILTER_FIELDS.items():
+        value = args.get(param)
+        if value:
+            query[field] = value
+    return query
+
+
+def rebuild_facets(db, batch_size=1000):
+    """Completa category_key/price_bucket en todos los productos y recalcula los conteos."""
+    facets = {}
+    batch = []
+    members = []
+    rebuilt_at = datetime.utcnow()
+    for product in db['products'].find({}, FACET_SOURCE_FIELDS).batch_size(batch_size):
+        batch.append(UpdateOne({"_id": product["_id"]}, {"$set": facet_fields(
+            {"category": product.get("category") or "", "price": product.get("price")}
+        )}))
+        if len(batch) >= batch_size:
+            db['products'].bulk_write(batch, ordered=False)
+            batch = []
+
+        contributed = contribution(product)
+        if contributed is None:
+            continue
+        key, name, paths = contributed
+        members.append(ReplaceOne(
+            {"_id": product["_id"]},
+            {"key": key, "name": name, "paths": sorted(paths), "rebuilt_at": rebuilt_at},
+            upsert=True
+        ))
+        if len(members) >= batch_size:
+            db[MEMBERS_COLLECTION].bulk_write(members, ordered=False)
+            members = []
+        doc = facets.setdefault(key, {"_id": key, "name": name, "total": 0,
+                                      **{group: {} for group in FACET_GROUPS}})
+        for path in paths:
+            if path == "total":
+                doc["total"] += 1
+            else:
+                group, value = path.split(".", 1)
+                doc[group][value] = doc[group].get(value, 0) + 1
+    if batch:
+        db['products'].bulk_write(batch, ordered=False)
+    if members:
+        db[MEMBERS_COLLECTION].bulk_write(members, ordered=False)
+    db[MEMBERS_COLLECTION].delete_many({"$or": [
+        {"rebuilt_at": {"$lt": rebuilt_at}}, {"rebuilt_at": {"$exists": False}}
+    ]})
+
+    now = datetime.utcnow()
+    requests = [ReplaceOne({"_id": key}, dict(doc, updated_at=now), upsert=True) for key, doc in facets.items()]
+    if requests:
+        db[FACETS_COLLECTION].bulk_write(requests, ordered=False)
+    db[FACETS_COLLECTION].delete_many({"_id": {"$nin": list(facets)}})
+    return len(facets)
+
+
+if __name__ == '__main__':
+    from database import dbConnect
+    import indexes
+
+    database = dbConnect()
+    indexes.migrate(database)
+    print(f"Categorías con facetas: {rebuild_facets(database)}")
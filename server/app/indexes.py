@@ -0,0 +1,384 @@
+"""Índices versionados de MongoDB.
+
+Cada migración declara los índices que agrega, los que quedan de más
+("drop") y, si hace falta completar datos existentes, una función `run(db)`
+que corre después de crearlos (tiene que ser idempotente: si el proceso
+muere antes de guardar la versión, se vuelve a correr). La versión aplicada
+queda en `schema_migrations`. Se ejecuta al arrancar la app
+(MONGO_AUTO_INDEX=1, por defecto), events.py y jobs.py, o a mano; un lock
+en la misma colección hace que migre un solo proceso y los demás esperen.
+Si un índice único nuevo choca con datos duplicados, la migración se corta
+con MigrationError y ejemplos de los valores repetidos:
+
+    python indexes.py migrate   # aplica las migraciones pendientes
+    python indexes.py verify    # explain() de las consultas calientes
+    python indexes.py status    # versión aplicada e índices existentes
+"""
+import os
+import socket
+import sys
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError, OperationFailure
+import facets
+import purchases
+import search
+
+MIGRATIONS_COLLECTION = "schema_migrations"
+MIGRATIONS_ID = "indexes"
+INDEX_NOT_FOUND = 27
+DUPLICATE_KEY = 11000
+LOCK_ID = "indexes:lock"
+LOCK_SECONDS = int(os.getenv("MIGRATIONS_LOCK_SECONDS", 600))
+LOCK_WAIT = float(os.getenv("MIGRATIONS_LOCK_WAIT", 900))
+
+MIGRATIONS = [
+    {
+        "version": 1,
+        "description": "Búsquedas de login/registro, órdenes por usuario y catálogo por categoría",
+        "indexes": {
+            "users": [
+                IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+                IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+            ],
+            "orders": [
+                IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created"),
+            ],
+            "products": [
+                IndexModel([("is_active", ASCENDING), ("category", ASCENDING)], name="active_category"),
+                IndexModel(
+                    [("sku", ASCENDING)], name="sku_unique", unique=True,
+                    partialFilterExpression={"sku": {"$gt": ""}}
+                ),
+            ],
+        },
+    },
+    {
+        "version": 2,
+        "description": "Índice de tokens de búsqueda y orden por fecha de alta",
+        "indexes": {
+            "products": [
+                IndexModel([("search_index.t", ASCENDING)], name="search_index_token"),
+                IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)], name="created_id"),
+            ],
+        },
+    },
+    {
+        "version": 3,
+        "description": "Órdenes por fecha de alta (refresh incremental de recomendaciones)",
+        "indexes": {
+            "orders": [
+                IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)], name="created_id"),
+            ],
+        },
+    },
+    {
+        "version": 4,
+        "description": "Listado de órdenes del admin por estado y por usuario, más nuevas primero",
+        # user_created_id cubre todo lo que usaba user_created (prefijo user_id, created_at).
+        "drop": {"orders": ["user_created"]},
+        "indexes": {
+            "orders": [
+                IndexModel(
+                    [("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                    name="status_created_id"
+                ),
+                IndexModel(
+                    [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                    name="user_created_id"
+                ),
+            ],
+        },
+    },
+    {
+        "version": 5,
+        "description": "Navegación por categoría (slug) con filtros de marca y rango de precio",
+        "indexes": {
+            "products": [
+                IndexModel(
+                    [("category_key", ASCENDING), ("is_active", ASCENDING), ("_id", ASCENDING)],
+                    name="category_browse"
+                ),
+                IndexModel(
+                    [("category_key", ASCENDING), ("is_active", ASCENDING), ("brand", ASCENDING), ("_id", ASCENDING)],
+                    name="category_brand"
+                ),
+                IndexModel(
+                    [("category_key", ASCENDING), ("is_active", ASCENDING), ("price_bucket", ASCENDING),
+                     ("_id", ASCENDING)],
+                    name="category_price"
+                ),
+            ],
+        },
+    },
+    {
+        "version": 6,
+        "description": "Cambios por fecha de modificación (bus de eventos en modo polling)",
+        "indexes": {
+            "products": [
+                IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)], name="updated_id"),
+            ],
+            "orders": [
+                IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)], name="updated_id"),
+            ],
+        },
+    },
+    {
+        "version": 7,
+        "description": "Cola de trabajos (idempotencia por key y próximos listos) y facturas por orden",
+        "indexes": {
+            "jobs": [
+                IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+                IndexModel([("status", ASCENDING), ("run_at", ASCENDING)], name="status_run_at"),
+            ],
+            "invoices": [
+                IndexModel([("order_id", ASCENDING)], name="order_unique", unique=True),
+            ],
+        },
+    },
+    {
+        "version": 8,
+        "description": "Completa category_key/price_bucket y siembra facet_members con los conteos actuales",
+        # Sin esto el primer cambio de cada producto existente lo cuenta de
+        # nuevo sobre conteos que ya lo incluían.
+        "run": facets.rebuild_facets,
+    },
+    {
+        "version": 9,
+        "description": "Completa search_index en los productos creados antes del índice de búsqueda",
+        "run": search.reindex_products,
+    },
+    {
+        "version": 10,
+        "description": "Pasa el purchase_history embebido a orders y recalcula los datos de compra",
+        "indexes": {
+            "orders": [
+                IndexModel(
+                    [("legacy_key", ASCENDING)], name="legacy_key_unique", unique=True,
+                    partialFilterExpression={"legacy_key": {"$exists": True}}
+                ),
+            ],
+        },
+        "run": purchases.backfill_purchases,
+    },
+]
+
+# Consultas que nunca deberían recorrer la colección completa.
+HOT_QUERIES = [
+    ("auth.login", "users", {"email": "hot@query.check"}, None),
+    ("auth.register", "users", {"$or": [{"email": "hot@query.check"}, {"username": "hot"}]}, None),
+    (
+        "get_user_orders", "orders",
+        {"user_id": ObjectId("000000000000000000000000")}, [("created_at", -1), ("_id", -1)]
+    ),
+    ("admin.orders_by_status", "orders", {"status": "pending"}, [("created_at", -1), ("_id", -1)]),
+    ("products_by_category", "products", {"category_key": "hot", "is_active": True}, [("_id", 1)]),
+    (
+        "products_by_category_brand", "products",
+        {"category_key": "hot", "is_active": True, "brand": "Hot"}, [("_id", 1)]
+    ),
+    ("search_products", "products", {"is_active": True, "search_index.t": "hot"}, None),
+    (
+        "recommendations.refresh", "orders",
+        {"created_at": {"$gt": datetime(2000, 1, 1)}}, [("created_at", 1), ("_id", 1)]
+    ),
+    (
+        "events.poll_products", "products",
+        {"updated_at": {"$gt": datetime(2000, 1, 1)}}, [("updated_at", 1), ("_id", 1)]
+    ),
+    (
+        "jobs.claim", "jobs",
+        {"status": {"$in": ["queued", "running"]}, "run_at": {"$lte": datetime(2000, 1, 1)}}, [("run_at", 1)]
+    ),
+]
+
+
+class IndexVerificationError(RuntimeError):
+    pass
+
+
+class MigrationError(RuntimeError):
+    """Una migración no se puede aplicar sin intervención (p. ej. datos duplicados)."""
+
+
+def applied_version(db):
+    state = db[MIGRATIONS_COLLECTION].find_one({"_id": MIGRATIONS_ID})
+    return state["version"] if state else 0
+
+
+def claim_lock(db, owner):
+    """Toma (o renueva) el lock de migraciones; False si lo tiene otro proceso."""
+    now = datetime.utcnow()
+    try:
+        db[MIGRATIONS_COLLECTION].find_one_and_update(
+            {"_id": LOCK_ID, "$or": [{"owner": owner}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=LOCK_SECONDS)}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        # El upsert chocó con el lock vigente de otro proceso.
+        return False
+
+
+def release_lock(db, owner):
+    db[MIGRATIONS_COLLECTION].delete_one({"_id": LOCK_ID, "owner": owner})
+
+
+def duplicate_examples(db, collection, model, limit=5):
+    """Valores repetidos de la clave de un índice único, para el mensaje de error."""
+    fields = [field for field, _ in model.document["key"].items()]
+    match = model.document.get("partialFilterExpression", {})
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": {field.replace(".", "_"): f"${field}" for field in fields}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": limit},
+    ]
+    return [row["_id"] for row in db[collection].aggregate(pipeline, allowDiskUse=True)]
+
+
+def create_indexes(db, migration):
+    for collection, models in migration.get("indexes", {}).items():
+        for model in models:
+            # `background` sólo tiene efecto en servidores < 4.2; en los
+            # nuevos el build ya no bloquea la colección.
+            model.document.setdefault("background", True)
+        try:
+            db[collection].create_indexes(models)
+        except OperationFailure as e:
+            if e.code != DUPLICATE_KEY:
+                raise
+            unique = [model for model in models if model.document.get("unique")]
+            examples = {model.document["name"]: duplicate_examples(db, collection, model) for model in unique}
+            raise MigrationError(
+                f"Migración {migration['version']}: `{collection}` tiene documentos duplicados para "
+                f"un índice único; hay que corregirlos y volver a correr `python indexes.py migrate`. "
+                f"Ejemplos: {examples}"
+            ) from e
+
+
+def apply_migration(db, migration):
+    create_indexes(db, migration)
+    for collection, names in migration.get("drop", {}).items():
+        for name in names:
+            try:
+                db[collection].drop_index(name)
+            except OperationFailure as e:
+                if e.code != INDEX_NOT_FOUND:
+                    raise
+    if "run" in migration:
+        migration["run"](db)
+    db[MIGRATIONS_COLLECTION].update_one(
+        {"_id": MIGRATIONS_ID},
+        {"$set": {
+            "version": migration["version"],
+            "description": migration["description"],
+            "applied_at": datetime.utcnow()
+        }},
+        upsert=True
+    )
+    print(f"Índices: migración {migration['version']} aplicada ({migration['description']})")
+
+
+def migrate(db, wait=LOCK_WAIT):
+    """Aplica las migraciones pendientes en orden y devuelve la versión final.
+
+    Sólo un proceso migra a la vez (lock en schema_migrations); los demás
+    esperan a que termine, hasta `wait` segundos, y siguen con la versión
+    que haya quedado.
+    """
+    latest = MIGRATIONS[-1]["version"]
+    current = applied_version(db)
+    if current >= latest:
+        return current
+
+    owner = f"{socket.gethostname()}:{os.getpid()}:{ObjectId()}"
+    deadline = time.monotonic() + wait
+    while not claim_lock(db, owner):
+        if time.monotonic() > deadline:
+            raise MigrationError(f"Otro proceso sigue migrando después de {wait:.0f}s (lock {LOCK_ID})")
+        time.sleep(1)
+        current = applied_version(db)
+        if current >= latest:
+            return current
+
+    try:
+        # Con el lock tomado: otro proceso pudo haber avanzado mientras tanto.
+        current = applied_version(db)
+        for migration in MIGRATIONS:
+            if migration["version"] <= current:
+                continue
+            apply_migration(db, migration)
+            current = migration["version"]
+            # Renueva el lock entre pasos (los rebuilds pueden ser largos).
+            claim_lock(db, owner)
+    finally:
+        release_lock(db, owner)
+    return current
+
+
+def plan_stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from plan_stages(value)
+
+
+def verify(db):
+    """Corre explain() sobre cada consulta caliente y falla si alguna hace COLLSCAN."""
+    report = {}
+    failures = []
+    for name, collection, query, sort in HOT_QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        winning_plan = cursor.explain()["queryPlanner"]["winningPlan"]
+        stages = set(plan_stages(winning_plan))
+        report[name] = sorted(stages)
+        if "COLLSCAN" in stages:
+            failures.append(name)
+    if failures:
+        raise IndexVerificationError(
+            f"Consultas calientes sin índice (COLLSCAN): {', '.join(failures)}"
+        )
+    return report
+
+
+def status(db):
+    return {
+        "version": applied_version(db),
+        "latest": MIGRATIONS[-1]["version"],
+        "indexes": {
+            collection: sorted(db[collection].index_information())
+            for collection in ("users", "orders", "products")
+        },
+    }
+
+
+def bootstrap(db):
+    migrate(db)
+    return verify(db)
+
+
+if __name__ == '__main__':
+    from database import dbConnect
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "migrate"
+    database = dbConnect()
+    if command == "migrate":
+        print(f"Versión de índices: {migrate(database)}")
+    elif command == "verify":
+        for name, stages in verify(database).items():
+            print(f"{name}: {', '.join(stages)}")
+    elif command == "status":
+        print(status(database))
+    else:
+        print(f"Comando desconocido: {command}")
+        sys.exit(2)
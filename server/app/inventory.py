@@ -0,0 +1,148 @@
+"""Actualización masiva de stock y precio (sincronización con el depósito).
+
+Cada ítem trae el sku y los valores nuevos de stock y/o price; opcionalmente
+el updated_at que el sistema de origen vio por última vez:
+
+    {"items": [{"sku": "A-1", "stock": 12, "price": 1500.0,
+                "updated_at": "2026-01-01T10:00:00+00:00"}, ...]}
+
+Todo el lote es una lectura por sku y un bulk_write no ordenado. Cada
+UpdateOne se condiciona al updated_at del producto (el recibido o, si no
+viene, el leído al principio), así un ítem que llega tarde o choca con una
+edición concurrente no pisa el cambio: queda como "conflict" y el cliente lo
+reintenta con el updated_at nuevo. El cache del catálogo se invalida una
+sola vez por lote y los conteos de facetas (rango de precio) se ajustan con
+product_rules.sync_derived sobre los productos aplicados.
+
+Resultado por ítem, en el orden recibido:
+
+    {"sku": "A-1", "status": "ok", "updated_at": "..."}
+    {"sku": "B-2", "status": "conflict" | "not_found" | "invalid", "error": "..."}
+
+También mantiene `stock_alerts`: un documento por producto activo con stock
+en o bajo LOW_STOCK_THRESHOLD, alimentado por el bus de eventos (events.py)
+sea cual sea el origen del cambio (checkout, este endpoint, el admin).
+"""
+import os
+from datetime import datetime, timezone
+from pymongo import DeleteOne, UpdateOne
+from catalog_cache import catalog_changed
+import product_rules
+
+INVENTORY_FIELDS = ("stock", "price")
+MAX_ITEMS = 10000
+LOOKUP_FIELDS = {"sku": 1, "updated_at": 1}
+ALERTS_COLLECTION = "stock_alerts"
+LOW_STOCK_THRESHOLD = int(os.getenv("LOW_STOCK_THRESHOLD", 5))
+ALERT_FIELDS = ("sku", "title", "stock")
+
+
+def parse_expected(raw):
+    """updated_at ISO 8601 -> datetime naive en UTC, con la precisión de Mongo (ms)."""
+    value = datetime.fromisoformat(str(raw).replace("Z", "+00:00"))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return truncate_ms(value)
+
+
+def truncate_ms(value):
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+def item_update(item, now):
+    """Valida un ítem y devuelve los campos a $set."""
+    data = {field: item[field] for field in INVENTORY_FIELDS if item.get(field) is not None}
+    if not data:
+        raise product_rules.ProductValidationError("Se requiere stock o price")
+    update = product_rules.product_update(data, now)
+    if any(update[field] < 0 for field in INVENTORY_FIELDS if field in update):
+        raise product_rules.ProductValidationError("stock y price no pueden ser negativos")
+    return update
+
+
+def apply_inventory(db, items):
+    """Aplica el lote y devuelve (resultados por ítem, resumen)."""
+    results = [None] * len(items)
+    skus = {str(item.get("sku") or "").strip() for item in items if isinstance(item, dict)} - {""}
+    current = {doc["sku"]: doc for doc in db['products'].find({"sku": {"$in": list(skus)}}, LOOKUP_FIELDS)}
+    # Todos los ítems del lote comparten updated_at; sirve para reconocer
+    # cuáles se aplicaron si alguno no matcheó.
+    now = truncate_ms(datetime.utcnow())
+
+    seen = set()
+    pending = []
+    for index, item in enumerate(items):
+        sku = str(item.get("sku") or "").strip() if isinstance(item, dict) else ""
+        if not sku:
+            results[index] = {"sku": None, "status": "invalid", "error": "sku requerido"}
+            continue
+        if sku in seen:
+            results[index] = {"sku": sku, "status": "invalid", "error": "sku repetido en el lote"}
+            continue
+        seen.add(sku)
+
+        product = current.get(sku)
+        if product is None:
+            results[index] = {"sku": sku, "status": "not_found"}
+            continue
+        try:
+            update = item_update(item, now)
+            expected = parse_expected(item["updated_at"]) if item.get("updated_at") else product.get("updated_at")
+        except product_rules.ProductValidationError as e:
+            results[index] = {"sku": sku, "status": "invalid", "error": str(e)}
+            continue
+        except ValueError:
+            results[index] = {"sku": sku, "status": "invalid", "error": "updated_at debe ser una fecha ISO"}
+            continue
+        pending.append((index, sku, product, update, expected))
+
+    applied = set()
+    if pending:
+        result = db['products'].bulk_write([
+            UpdateOne({"_id": product["_id"], "updated_at": expected}, {"$set": update})
+            for _, _, product, update, expected in pending
+        ], ordered=False)
+        ids = [product["_id"] for _, _, product, _, _ in pending]
+        if result.matched_count == len(pending):
+            applied = set(ids)
+        else:
+            applied = {doc["_id"] for doc in db['products'].find({"_id": {"$in": ids}, "updated_at": now}, {"_id": 1})}
+
+    for index, sku, product, _, _ in pending:
+        if product["_id"] in applied:
+            results[index] = {"sku": sku, "status": "ok", "updated_at": now}
+        else:
+            results[index] = {"sku": sku, "status": "conflict", "error": "El producto cambió; reintentar con el updated_at actual"}
+
+    if applied:
+        product_rules.sync_derived_by_id(db, applied)
+        catalog_changed(db, product_ids=[str(product_id) for product_id in applied])
+
+    summary = {"received": len(items), "updated": len(applied)}
+    for item_result in results:
+        if item_result["status"] != "ok":
+            summary[item_result["status"]] = summary.get(item_result["status"], 0) + 1
+    return results, summary
+
+
+def sync_stock_alerts(db, products, threshold=LOW_STOCK_THRESHOLD):
+    """Abre o cierra alertas para {product_id: producto o None (ya no existe)}."""
+    now = datetime.utcnow()
+    writes = []
+    for product_id, product in products.items():
+        if product and product.get("is_active", True) and product.get("stock", 0) <= threshold:
+            writes.append(UpdateOne(
+                {"_id": product_id},
+                {"$set": {**{field: product.get(field) for field in ALERT_FIELDS}, "updated_at": now},
+                 "$setOnInsert": {"since": now}},
+                upsert=True
+            ))
+        else:
+            writes.append(DeleteOne({"_id": product_id}))
+    if writes:
+        db[ALERTS_COLLECTION].bulk_write(writes, ordered=False)
+    return len(writes)
+
+
+def stock_alerts(db, limit=200):
+    return list(db[ALERTS_COLLECTION].find().sort([("stock", 1), ("_id", 1)]).limit(limit))
@@ -0,0 +1,262 @@
+"""Cola de trabajos durable sobre la colección `jobs`.
+
+Un trabajo es {type, key, payload} más su estado:
+
+    status      queued | running | done | failed
+    run_at      cuándo puede tomarlo un worker; mientras corre, hasta cuándo
+                lo tiene reservado (visibility timeout)
+    attempts    intentos hechos; al llegar a max_attempts queda en failed
+    lease       id de la reserva vigente, para que sólo el dueño lo cierre
+
+`key` es único: encolar dos veces el mismo trabajo (un reintento del
+cliente, una transacción repetida) no crea otro. Un worker toma el trabajo
+más viejo listo con un find_one_and_update sobre el índice (status, run_at);
+un trabajo "running" cuyo run_at ya pasó es de un worker que murió y vuelve
+a tomarse solo, salvo que ya haya gastado sus max_attempts: ése pasa a
+failed. Mientras el handler corre, el worker renueva la reserva cada tercio
+del visibility timeout, así que un trabajo largo no lo toma otro worker.
+Los errores se reintentan con backoff exponencial, así que los handlers
+tienen que ser idempotentes.
+
+    python jobs.py work [--processes N]    # workers
+    python jobs.py status                  # trabajos por tipo y estado
+    python jobs.py retry-failed [tipo]     # vuelve a encolar los fallidos
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = "jobs"
+VISIBILITY_TIMEOUT = int(os.getenv("JOBS_VISIBILITY_TIMEOUT", 60))
+MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", 5))
+BACKOFF_BASE = float(os.getenv("JOBS_BACKOFF_BASE", 2.0))
+BACKOFF_MAX = float(os.getenv("JOBS_BACKOFF_MAX", 600))
+IDLE_SLEEP_MAX = 1.0
+
+
+class PermanentJobError(Exception):
+    """Un error que no se arregla reintentando (datos inválidos, orden inexistente)."""
+
+
+def enqueue(db, job_type, payload, key, session=None, max_attempts=MAX_ATTEMPTS, delay=0):
+    """Encola un trabajo; si ya existe uno con la misma key no hace nada."""
+    now = datetime.utcnow()
+    try:
+        db[JOBS_COLLECTION].update_one(
+            {"key": key},
+            {"$setOnInsert": {
+                "type": job_type,
+                "payload": payload,
+                "status": "queued",
+                "attempts": 0,
+                "max_attempts": max_attempts,
+                "run_at": now + timedelta(seconds=delay),
+                "created_at": now,
+                "updated_at": now,
+            }},
+            upsert=True,
+            session=session
+        )
+    except DuplicateKeyError:
+        # Dos upserts concurrentes con la misma key: ya quedó encolado.
+        pass
+
+
+def backoff_seconds(attempts):
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _attempts(op):
+    return {op: ["$attempts", {"$ifNull": ["$max_attempts", MAX_ATTEMPTS]}]}
+
+
+def expire_exhausted(db, now=None):
+    """Pasa a failed los trabajos abandonados que ya gastaron todos sus intentos."""
+    now = now or datetime.utcnow()
+    return db[JOBS_COLLECTION].update_many(
+        {"status": "running", "run_at": {"$lte": now}, "$expr": _attempts("$gte")},
+        {"$set": {"status": "failed", "finished_at": now, "updated_at": now,
+                  "last_error": "La reserva venció en el último intento"},
+         "$unset": {"lease": "", "locked_by": ""}}
+    ).modified_count
+
+
+def claim(db, worker_id, types=None, visibility=VISIBILITY_TIMEOUT):
+    """Reserva el próximo trabajo listo (o abandonado) y lo devuelve, o None."""
+    now = datetime.utcnow()
+    expire_exhausted(db, now)
+    # El chequeo de intentos va en el mismo filtro: dos workers no pueden
+    # tomar a la vez el último intento de un trabajo abandonado.
+    query = {"status": {"$in": ["queued", "running"]}, "run_at": {"$lte": now},
+             "$expr": _attempts("$lt")}
+    if types:
+        query["type"] = {"$in": list(types)}
+    return db[JOBS_COLLECTION].find_one_and_update(
+        query,
+        {"$set": {
+            "status": "running",
+            "run_at": now + timedelta(seconds=visibility),
+            "locked_by": worker_id,
+            "lease": ObjectId(),
+            "updated_at": now,
+        }, "$inc": {"attempts": 1}},
+        sort=[("run_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def extend(db, job, visibility=VISIBILITY_TIMEOUT):
+    """Renueva la reserva; False si el trabajo ya no es nuestro."""
+    now = datetime.utcnow()
+    return db[JOBS_COLLECTION].update_one(
+        {"_id": job["_id"], "lease": job["lease"], "status": "running"},
+        {"$set": {"run_at": now + timedelta(seconds=visibility), "updated_at": now}}
+    ).matched_count == 1
+
+
+def _keep_leased(db, job, visibility, stop):
+    while not stop.wait(visibility / 3):
+        if not extend(db, job, visibility):
+            logger.warning("Trabajo %s (%s): se perdió la reserva", job["_id"], job["type"])
+            return
+
+
+def complete(db, job):
+    now = datetime.utcnow()
+    return db[JOBS_COLLECTION].update_one(
+        {"_id": job["_id"], "lease": job["lease"]},
+        {"$set": {"status": "done", "finished_at": now, "updated_at": now},
+         "$unset": {"lease": "", "locked_by": "", "last_error": ""}}
+    ).modified_count == 1
+
+
+def fail(db, job, error, permanent=False):
+    now = datetime.utcnow()
+    retry = not permanent and job["attempts"] < job.get("max_attempts", MAX_ATTEMPTS)
+    update = {"last_error": str(error)[:500], "updated_at": now}
+    if retry:
+        update.update(status="queued", run_at=now + timedelta(seconds=backoff_seconds(job["attempts"])))
+    else:
+        update.update(status="failed", finished_at=now)
+    db[JOBS_COLLECTION].update_one(
+        {"_id": job["_id"], "lease": job["lease"]},
+        {"$set": update, "$unset": {"lease": "", "locked_by": ""}}
+    )
+    return retry
+
+
+def run_job(db, job, handlers, visibility=VISIBILITY_TIMEOUT):
+    handler = handlers.get(job["type"])
+    if handler is None:
+        fail(db, job, f"Tipo de trabajo desconocido: {job['type']}", permanent=True)
+        return False
+    stop = threading.Event()
+    keeper = threading.Thread(target=_keep_leased, args=(db, job, visibility, stop), daemon=True)
+    keeper.start()
+    try:
+        handler(db, job["payload"])
+    except PermanentJobError as e:
+        logger.warning("Trabajo %s (%s) descartado: %s", job["_id"], job["type"], e)
+        fail(db, job, e, permanent=True)
+        return False
+    except Exception as e:
+        retried = fail(db, job, e)
+        logger.warning("Trabajo %s (%s) falló en el intento %d%s: %s", job["_id"], job["type"],
+                       job["attempts"], ", se reintenta" if retried else "", e)
+        return False
+    finally:
+        stop.set()
+        keeper.join()
+    return complete(db, job)
+
+
+def work(db, handlers, worker_id=None, should_stop=lambda: False, max_jobs=None,
+         visibility=VISIBILITY_TIMEOUT):
+    """Loop de un worker; devuelve cuántos trabajos completó."""
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    done = 0
+    idle_sleep = 0.05
+    while not should_stop() and (max_jobs is None or done < max_jobs):
+        job = claim(db, worker_id, types=list(handlers), visibility=visibility)
+        if job is None:
+            time.sleep(idle_sleep)
+            idle_sleep = min(idle_sleep * 2, IDLE_SLEEP_MAX)
+            continue
+        idle_sleep = 0.05
+        if run_job(db, job, handlers, visibility=visibility):
+            done += 1
+    return done
+
+
+def status(db):
+    pipeline = [
+        {"$group": {"_id": {"type": "$type", "status": "$status"}, "count": {"$sum": 1}}},
+        {"$sort": {"_id.type": 1, "_id.status": 1}},
+    ]
+    return [
+        {"type": row["_id"]["type"], "status": row["_id"]["status"], "count": row["count"]}
+        for row in db[JOBS_COLLECTION].aggregate(pipeline)
+    ]
+
+
+def retry_failed(db, job_type=None):
+    query = {"status": "failed"}
+    if job_type:
+        query["type"] = job_type
+    now = datetime.utcnow()
+    return db[JOBS_COLLECTION].update_many(
+        query, {"$set": {"status": "queued", "attempts": 0, "run_at": now, "updated_at": now}}
+    ).modified_count
+
+
+def _worker_process():
+    # Cada proceso abre su propio cliente (dbConnect es consciente de fork()).
+    from database import dbConnect
+    from orders.postprocess import HANDLERS
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(levelname)s %(message)s")
+    try:
+        work(dbConnect(), HANDLERS)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    from database import dbConnect
+
+    parser = argparse.ArgumentParser(description="Cola de trabajos")
+    parser.add_argument("command", choices=("work", "status", "retry-failed"))
+    parser.add_argument("job_type", nargs="?")
+    parser.add_argument("--processes", type=int, default=int(os.getenv("JOBS_WORKERS", 1)))
+    args = parser.parse_args()
+
+    if args.command == "work":
+        import indexes
+
+        indexes.migrate(dbConnect())
+        processes = [multiprocessing.Process(target=_worker_process) for _ in range(args.processes)]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.join()
+    elif args.command == "status":
+        for row in status(dbConnect()):
+            print(f"{row['type']:<32} {row['status']:<8} {row['count']}")
+    else:
+        print(f"Trabajos reencolados: {retry_failed(dbConnect(), args.job_type)}")
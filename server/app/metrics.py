@@ -0,0 +1,214 @@
+"""Métricas por request en formato de texto de Prometheus (GET /metrics).
+
+Registra latencia y tamaño de respuesta por endpoint, errores, y la cantidad
+y duración de los comandos que cada request le manda a Mongo (vía un
+CommandListener de PyMongo). Un request que supera METRICS_MAX_DB_COMMANDS
+comandos se cuenta y se loguea: así una regresión N+1 aparece sola.
+
+Las métricas son por proceso; con varios workers de gunicorn cada uno expone
+las suyas (la etiqueta `pid` permite distinguirlas).
+"""
+import bisect
+import os
+import threading
+import time
+from flask import Response, current_app, g, request
+from pymongo import monitoring
+from pymongo.errors import PyMongoError
+from catalog_cache import catalog_cache
+from database import LazyDatabase, get_pool_stats
+import events
+import passwords
+from ratelimit import limiter
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+DB_COMMAND_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+MAX_DB_COMMANDS = int(os.getenv("METRICS_MAX_DB_COMMANDS", 10))
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+        series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+        series["sum"] += value
+        series["count"] += 1
+
+    def render(self, label_names):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self.series.items()):
+            base = format_labels(label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series["counts"]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{base},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {series['sum']}")
+            lines.append(f"{self.name}_count{{{base}}} {series['count']}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.series = {}
+
+    def inc(self, labels, value=1):
+        self.series[labels] = self.series.get(labels, 0) + value
+
+    def render(self, label_names):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.series.items()):
+            lines.append(f"{self.name}{{{format_labels(label_names, labels)}}} {value}")
+        return lines
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names, values):
+    pairs = [f'{n}="{escape_label(v)}"' for n, v in zip(names, values)]
+    return ",".join(pairs + [f'pid="{os.getpid()}"'])
+
+
+_lock = threading.Lock()
+REQUEST_LABELS = ("method", "endpoint")
+request_latency = Histogram("tienda_request_duration_seconds", "Latencia de los requests", LATENCY_BUCKETS)
+response_size = Histogram("tienda_response_size_bytes", "Tamaño del cuerpo de la respuesta", SIZE_BUCKETS)
+request_db_commands = Histogram("tienda_request_db_commands", "Comandos Mongo por request", DB_COMMAND_BUCKETS)
+requests_total = Counter("tienda_requests_total", "Requests por endpoint y status")
+request_exceptions = Counter("tienda_request_exceptions_total", "Excepciones no manejadas por endpoint")
+db_budget_exceeded = Counter(
+    "tienda_db_command_budget_exceeded_total",
+    f"Requests con más de {MAX_DB_COMMANDS} comandos Mongo (posible N+1)"
+)
+COMMAND_LABELS = ("command",)
+db_command_latency = Histogram("tienda_db_command_duration_seconds", "Duración de comandos Mongo", LATENCY_BUCKETS)
+db_command_failures = Counter("tienda_db_command_failures_total", "Comandos Mongo fallidos")
+
+_request_state = threading.local()
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    def started(self, event):
+        state = getattr(_request_state, "current", None)
+        if state is not None:
+            state["commands"] += 1
+
+    def succeeded(self, event):
+        self._finished(event)
+
+    def failed(self, event):
+        with _lock:
+            db_command_failures.inc((event.command_name,))
+        self._finished(event)
+
+    def _finished(self, event):
+        duration = event.duration_micros / 1e6
+        state = getattr(_request_state, "current", None)
+        if state is not None:
+            state["db_time"] += duration
+        with _lock:
+            db_command_latency.observe((event.command_name,), duration)
+
+
+# Registrado globalmente: aplica a todo MongoClient creado después de importar
+# este módulo (los clientes se crean perezosamente en el primer request).
+monitoring.register(CommandMetricsListener())
+
+
+def endpoint_label():
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+def before_request():
+    g.metrics_started = time.perf_counter()
+    _request_state.current = {"commands": 0, "db_time": 0.0}
+
+
+def after_request(response):
+    state = getattr(_request_state, "current", None) or {"commands": 0, "db_time": 0.0}
+    labels = (request.method, endpoint_label())
+    elapsed = time.perf_counter() - g.get("metrics_started", time.perf_counter())
+
+    with _lock:
+        request_latency.observe(labels, elapsed)
+        requests_total.inc(labels + (response.status_code,))
+        request_db_commands.observe(labels, state["commands"])
+        if response.content_length is not None:
+            response_size.observe(labels, response.content_length)
+        if state["commands"] > MAX_DB_COMMANDS:
+            db_budget_exceeded.inc(labels)
+
+    if state["commands"] > MAX_DB_COMMANDS:
+        current_app.logger.warning(
+            "%s %s hizo %d comandos Mongo (límite %d)",
+            request.method, endpoint_label(), state["commands"], MAX_DB_COMMANDS
+        )
+    response.headers["Server-Timing"] = f'db;dur={state["db_time"] * 1000:.1f};desc="{state["commands"]} cmds"'
+    return response
+
+
+def teardown_request(error):
+    if error is not None:
+        with _lock:
+            request_exceptions.inc((request.method, endpoint_label()))
+    _request_state.current = None
+
+
+def render(extra_lines=()):
+    with _lock:
+        lines = []
+        lines += request_latency.render(REQUEST_LABELS)
+        lines += response_size.render(REQUEST_LABELS)
+        lines += request_db_commands.render(REQUEST_LABELS)
+        lines += requests_total.render(REQUEST_LABELS + ("status",))
+        lines += request_exceptions.render(REQUEST_LABELS)
+        lines += db_budget_exceeded.render(REQUEST_LABELS)
+        lines += db_command_latency.render(COMMAND_LABELS)
+        lines += db_command_failures.render(COMMAND_LABELS)
+    lines += extra_lines
+    return "\n".join(lines) + "\n"
+
+
+def gauge_lines(name, help_text, value):
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f'{name}{{pid="{os.getpid()}"}} {value}']
+
+
+def metrics_view():
+    pool = get_pool_stats()
+    cache = catalog_cache.stats()
+    hashing = passwords.stats()
+    rate_limited = Counter("tienda_ratelimit_rejected_total", "Requests rechazados por rate limit")
+    rate_limited.series = {(endpoint,): count for endpoint, count in limiter.stats()["rejected"].items()}
+    extra = []
+    extra += gauge_lines("tienda_mongo_pool_checked_out", "Conexiones Mongo en uso", pool["checked_out"])
+    extra += gauge_lines("tienda_mongo_pool_open", "Conexiones Mongo abiertas", pool["open_connections"])
+    extra += gauge_lines("tienda_mongo_pool_wait_max_ms", "Espera máxima por una conexión", pool["wait_time_max_ms"])
+    extra += gauge_lines("tienda_catalog_cache_hit_rate", "Hit rate del cache de catálogo", cache["hit_rate"])
+    extra += gauge_lines("tienda_password_hash_in_flight", "Hashes de contraseña en curso o en cola", hashing["in_flight"])
+    extra += gauge_lines("tienda_password_hash_rejected", "Hashes rechazados por pool saturado", hashing["rejected"])
+    extra += rate_limited.render(("endpoint",))
+    try:
+        # El bus corre en otro proceso (events.py); su estado está en la base.
+        extra += events.metric_lines(LazyDatabase())
+    except PyMongoError:
+        current_app.logger.warning("No se pudo leer el estado del bus de eventos")
+    return Response(render(extra), mimetype="text/plain; version=0.0.4")
+
+
+def init_app(app):
+    app.before_request(before_request)
+    app.after_request(after_request)
+    app.teardown_request(teardown_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
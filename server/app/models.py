@@ -1,4 +1,6 @@
-from werkzeug.security import generate_password_hash, check_password_hash
+import passwords
+from purchases import ORDER_STATS_FIELD, PURCHASED_FIELD, purchase_history
+from recommendations import recommend
 from bson import ObjectId
 from flask_login import UserMixin
 from datetime import datetime
@@ -7,19 +9,21 @@ class User(UserMixin):
         self.id = str(user_data["_id"])
         self.username = user_data["username"]
         self.email = user_data["email"]
-        self.password_hash = user_data["password_hash"]
+        self.password_hash = user_data.get("password_hash", "")
         self.role = user_data.get("role", "user")
         self.address = user_data.get("address", {})
         self.cart = user_data.get("cart", [])
         self.wishlist = user_data.get("wishlist", [])
-        self.purchase_history = user_data.get("purchase_history", [])
+        # El historial completo está en `orders`; acá sólo el resumen.
+        self.purchased_product_ids = set(user_data.get(PURCHASED_FIELD, []))
+        self.order_stats = user_data.get(ORDER_STATS_FIELD, {})
         self.created_at = user_data.get("created_at", datetime.utcnow())
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.hash_password(password)
 
     def verify_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return passwords.verify_password(self.password_hash, password)
     
     def is_admin(self):
         return self.role == "admin"
@@ -39,16 +43,13 @@ class User(UserMixin):
             self.wishlist.append(product_id)
 
     def can_review_product(self, product_id):
-        return any(
-            item["product_id"] == product_id
-            for order in self.purchase_history
-            for item in order.get("items", [])
-        )
+        return str(product_id) in self.purchased_product_ids
 
-    def get_recommended_products(self, limit=5):
-        if not self.purchase_history:
-            return []
-        return []
+    def get_purchase_history(self, db, limit=20):
+        return purchase_history(db, self.id, limit)
+
+    def get_recommended_products(self, db, limit=5):
+        return recommend(db, self.purchased_product_ids, limit)
 
     def toDBCollection(self):
         return {
@@ -60,7 +61,8 @@ class User(UserMixin):
             "address": self.address,
             "cart": self.cart,
             "wishlist": self.wishlist,
-            "purchase_history": self.purchase_history,
+            PURCHASED_FIELD: sorted(self.purchased_product_ids),
+            ORDER_STATS_FIELD: self.order_stats,
             "created_at": self.created_at
         }
 
@@ -0,0 +1,150 @@
+"""Listado y resúmenes de órdenes para el panel de administración.
+
+Filtros (query string): status (uno o varios separados por coma), from/to
+(fechas ISO, to exclusivo), user_id y flagged=1 (marcadas por el scoring de
+fraude). El listado va del más nuevo al más viejo con keyset pagination
+sobre (created_at, _id); los resúmenes se calculan en Mongo con un único
+aggregate ($facet).
+"""
+from datetime import datetime
+from bson import ObjectId
+from werkzeug.exceptions import BadRequest
+from catalog import decode_cursor, encode_cursor
+
+ORDER_LIST_FIELDS = {
+    "user_id": 1, "status": 1, "total": 1, "subtotal": 1, "shipping_cost": 1,
+    "discount": 1, "shipping_method": 1, "payment_method": 1,
+    "items.product_id": 1, "items.name": 1, "items.quantity": 1, "items.price": 1,
+    "created_at": 1, "updated_at": 1, "fraud.score": 1, "fraud.flagged": 1,
+}
+NEWEST_FIRST = [("created_at", -1), ("_id", -1)]
+DEFAULT_TOP_PRODUCTS = 10
+MAX_TOP_PRODUCTS = 100
+
+
+def parse_date(raw, name):
+    try:
+        return datetime.fromisoformat(raw)
+    except ValueError:
+        raise BadRequest(f"{name} debe ser una fecha ISO (AAAA-MM-DD)")
+
+
+def user_id_filter(user_id):
+    if not ObjectId.is_valid(user_id):
+        raise BadRequest("ID de usuario no válido")
+    # Órdenes viejas guardaban user_id como string; las dos formas usan el índice.
+    return {"$in": [ObjectId(user_id), user_id]}
+
+
+def order_filters(args):
+    query = {}
+    statuses = [s.strip() for s in (args.get('status') or "").split(",") if s.strip()]
+    if statuses:
+        query["status"] = statuses[0] if len(statuses) == 1 else {"$in": statuses}
+
+    created = {}
+    if args.get('from'):
+        created["$gte"] = parse_date(args['from'], "from")
+    if args.get('to'):
+        created["$lt"] = parse_date(args['to'], "to")
+    if created:
+        query["created_at"] = created
+
+    if args.get('user_id'):
+        query["user_id"] = user_id_filter(args['user_id'])
+    if args.get('flagged') == '1':
+        # Marcadas por el scoring de fraude (orders/postprocess.py).
+        query["fraud.flagged"] = True
+    return query
+
+
+def newest_first_after(query, after):
+    if after is None:
+        return query
+    return {"$and": [query, {"$or": [
+        {"created_at": {"$lt": after["created_at"]}},
+        {"created_at": after["created_at"], "_id": {"$lt": after["_id"]}},
+    ]}]}
+
+
+def list_orders(db, query, limit, after=None):
+    """Una página de órdenes (más nuevas primero); pide limit+1 para saber si hay más."""
+    docs = list(
+        db['orders'].find(newest_first_after(query, after), ORDER_LIST_FIELDS)
+        .sort(NEWEST_FIRST)
+        .limit(limit + 1)
+    )
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], "created_at")
+    return docs, next_cursor
+
+
+def decode_after(token):
+    return decode_cursor(token, "created_at") if token else None
+
+
+def parse_top(raw):
+    try:
+        top = int(raw) if raw is not None else DEFAULT_TOP_PRODUCTS
+    except ValueError:
+        raise BadRequest("top debe ser un número entero")
+    return min(max(top, 1), MAX_TOP_PRODUCTS)
+
+
+def summary_pipeline(query, top=DEFAULT_TOP_PRODUCTS):
+    return [
+        {"$match": query},
+        {"$facet": {
+            "totals": [
+                {"$group": {
+                    "_id": None,
+                    "orders": {"$sum": 1},
+                    "revenue": {"$sum": "$total"},
+                    "average_order": {"$avg": "$total"},
+                }},
+                {"$project": {"_id": 0}},
+            ],
+            "by_status": [
+                {"$group": {"_id": "$status", "orders": {"$sum": 1}, "revenue": {"$sum": "$total"}}},
+                {"$sort": {"orders": -1}},
+                {"$project": {"_id": 0, "status": "$_id", "orders": 1, "revenue": 1}},
+            ],
+            "revenue_per_day": [
+                {"$group": {
+                    "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+                    "orders": {"$sum": 1},
+                    "revenue": {"$sum": "$total"},
+                }},
+                {"$sort": {"_id": 1}},
+                {"$project": {"_id": 0, "day": "$_id", "orders": 1, "revenue": 1}},
+            ],
+            "top_products": [
+                {"$unwind": "$items"},
+                {"$group": {
+                    "_id": "$items.product_id",
+                    "name": {"$first": "$items.name"},
+                    "units": {"$sum": "$items.quantity"},
+                    "revenue": {"$sum": {"$multiply": ["$items.price", "$items.quantity"]}},
+                    "orders": {"$sum": 1},
+                }},
+                {"$sort": {"units": -1, "_id": 1}},
+                {"$limit": top},
+                {"$project": {"_id": 0, "product_id": "$_id", "name": 1, "units": 1, "revenue": 1, "orders": 1}},
+            ],
+        }},
+    ]
+
+
+def order_summary(db, query, top=DEFAULT_TOP_PRODUCTS):
+    result = next(db['orders'].aggregate(summary_pipeline(query, top), allowDiskUse=True), None) or {}
+    totals = (result.get("totals") or [{}])[0]
+    return {
+        "orders": totals.get("orders", 0),
+        "revenue": totals.get("revenue", 0),
+        "average_order": round(totals.get("average_order") or 0, 2),
+        "by_status": result.get("by_status", []),
+        "revenue_per_day": result.get("revenue_per_day", []),
+        "top_products": result.get("top_products", []),
+    }
@@ -0,0 +1,190 @@
+from datetime import datetime
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+from catalog import fetch_products_by_ids, unavailable_reason
+from purchases import purchase_update
+from orders.postprocess import enqueue_order_jobs
+
+# Los precios, el envío y los descuentos se calculan acá; lo que mande el
+# cliente para esos campos se ignora.
+SHIPPING_COSTS = {"standard": 800, "express": 1500}
+COUPONS = {"DESCUENTO10": 0.10}
+CHECKOUT_PRODUCT_FIELDS = {"title": 1, "price": 1, "stock": 1, "is_active": 1, "sku": 1}
+MAX_LINE_QUANTITY = 100
+
+
+class CheckoutError(Exception):
+    def __init__(self, message, status=400, details=None):
+        super().__init__(message)
+        self.status = status
+        self.details = details or []
+
+
+class OutOfStock(CheckoutError):
+    def __init__(self, product_ids):
+        super().__init__("Stock insuficiente", 409, [
+            {"product_id": str(pid), "reason": "out_of_stock"} for pid in product_ids
+        ])
+
+
+def parse_items(raw_items):
+    """Normaliza los ítems del request y junta las líneas repetidas."""
+    quantities = {}
+    for item in raw_items:
+        product_id = str(item.get('product_id', ''))
+        if not ObjectId.is_valid(product_id):
+            raise CheckoutError(f"ID de producto inválido: {product_id}")
+        try:
+            quantity = int(item.get('quantity', 1))
+        except (TypeError, ValueError):
+            raise CheckoutError(f"Cantidad inválida para {product_id}")
+        if quantity < 1 or quantity > MAX_LINE_QUANTITY:
+            raise CheckoutError(f"Cantidad inválida para {product_id}")
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+def price_order(db, quantities, shipping_method, coupon=None):
+    """Trae todos los productos en una consulta y arma las líneas con el precio real."""
+    products = fetch_products_by_ids(db, list(quantities), CHECKOUT_PRODUCT_FIELDS)
+
+    problems = []
+    lines = []
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        reason = unavailable_reason(product)
+        if reason is None and product.get("stock", 0) < quantity:
+            reason = "out_of_stock"
+        if reason:
+            problems.append({"product_id": product_id, "reason": reason})
+            continue
+        lines.append({
+            "product_id": ObjectId(product_id),
+            "quantity": quantity,
+            "price": float(product["price"]),
+            "name": product.get("title", ""),
+            "sku": product.get("sku", ""),
+        })
+    if problems:
+        raise CheckoutError("Algunos productos no están disponibles", 409, problems)
+
+    if shipping_method not in SHIPPING_COSTS:
+        raise CheckoutError(f"Método de envío inválido: {shipping_method}")
+
+    subtotal = round(sum(line["price"] * line["quantity"] for line in lines), 2)
+    discount_rate = COUPONS.get((coupon or "").upper(), 0) if coupon else 0
+    if coupon and not discount_rate:
+        raise CheckoutError("Cupón no válido o expirado")
+    discount = round(subtotal * discount_rate, 2)
+    shipping_cost = SHIPPING_COSTS[shipping_method]
+
+    return lines, {
+        "subtotal": subtotal,
+        "shipping_cost": shipping_cost,
+        "discount": discount,
+        "total": round(subtotal + shipping_cost - discount, 2),
+    }
+
+
+def reserve_stock(db, lines, session=None):
+    """Descuenta stock con guardas; devuelve las líneas reservadas hasta fallar."""
+    reserved = []
+    for line in lines:
+        result = db['products'].update_one(
+            {"_id": line["product_id"], "is_active": True, "stock": {"$gte": line["quantity"]}},
+            {"$inc": {"stock": -line["quantity"]}, "$set": {"updated_at": datetime.utcnow()}},
+            session=session
+        )
+        if result.modified_count == 0:
+            return reserved, line
+        reserved.append(line)
+    return reserved, None
+
+
+def release_stock(db, lines):
+    for line in lines:
+        db['products'].update_one(
+            {"_id": line["product_id"]},
+            {"$inc": {"stock": line["quantity"]}, "$set": {"updated_at": datetime.utcnow()}}
+        )
+
+
+def update_buyer(db, user_id, order_data, session=None):
+    """Saca lo comprado del carrito y actualiza los datos de compra del usuario."""
+    lines = order_data["items"]
+    update = purchase_update(lines, order_data["total"], order_data["created_at"])
+    update["$pull"] = {"cart": {"product_id": {"$in": [str(line["product_id"]) for line in lines]}}}
+    db['users'].update_one({"_id": user_id}, update, session=session)
+
+
+def supports_transactions(db):
+    description = getattr(db.client, "topology_description", None)
+    if description is None:
+        return False
+    return description.topology_type_name in ("ReplicaSetWithPrimary", "Sharded")
+
+
+def place_order(db, user_id, data):
+    """Precio en servidor + reserva de stock + orden + limpieza del carrito.
+
+    En replica set / sharded todo corre en una transacción. En un mongod
+    standalone se reserva línea por línea y, si algo falla, se devuelve el
+    stock ya descontado (compensación).
+
+    Mail, factura y scoring de fraude no corren acá: se encolan (jobs.py)
+    junto con la orden y los procesa un worker.
+    """
+    if not data or not data.get('items'):
+        raise CheckoutError("Datos inválidos - items requeridos")
+
+    user_id = ObjectId(user_id)
+    quantities = parse_items(data['items'])
+    shipping_method = data.get('shipping_method', 'standard')
+    coupon = data.get('coupon')
+    if coupon is not None and not isinstance(coupon, str):
+        raise CheckoutError("Cupón no válido o expirado")
+    lines, totals = price_order(db, quantities, shipping_method, coupon)
+
+    now = datetime.utcnow()
+    order_data = {
+        "user_id": user_id,
+        "items": lines,
+        "shipping_address": data.get('shipping_address', {}),
+        "payment_method": data.get('payment_method', 'credit_card'),
+        "shipping_method": shipping_method,
+        "coupon": coupon,
+        **totals,
+        "status": "pending",
+        "created_at": now,
+        "updated_at": now
+    }
+
+    if supports_transactions(db):
+        def unit_of_work(session):
+            _, failed = reserve_stock(db, lines, session)
+            if failed:
+                raise OutOfStock([failed["product_id"]])
+            result = db['orders'].insert_one(order_data, session=session)
+            update_buyer(db, user_id, order_data, session)
+            enqueue_order_jobs(db, result.inserted_id, session)
+            return result.inserted_id
+
+        with db.client.start_session() as session:
+            order_id = session.with_transaction(unit_of_work)
+    else:
+        reserved, failed = reserve_stock(db, lines)
+        if failed:
+            release_stock(db, reserved)
+            raise OutOfStock([failed["product_id"]])
+        try:
+            order_id = db['orders'].insert_one(order_data).inserted_id
+        except PyMongoError:
+            release_stock(db, reserved)
+            raise
+        update_buyer(db, user_id, order_data)
+        # Sin transacción: si esto falla la orden ya existe; los trabajos
+        # tienen key por orden, así que reencolarlos después es seguro.
+        enqueue_order_jobs(db, order_id)
+
+    order_data["_id"] = order_id
+    return order_data
@@ -0,0 +1,173 @@
+"""Trabajos que corren después del checkout, fuera del request (ver jobs.py).
+
+El checkout encola uno de cada tipo por orden, en la misma transacción que
+inserta la orden, con key "<tipo>:<order_id>". Cada handler es idempotente:
+un reintento o un trabajo retomado tras un visibility timeout no duplica
+facturas ni mails.
+"""
+import os
+import smtplib
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+import jobs
+from purchases import ORDER_STATS_FIELD
+
+CONFIRMATION_EMAIL = "order.confirmation_email"
+INVOICE = "order.invoice"
+FRAUD_SCORE = "order.fraud_score"
+ORDER_JOB_TYPES = (FRAUD_SCORE, INVOICE, CONFIRMATION_EMAIL)
+
+INVOICES_COLLECTION = "invoices"
+FRAUD_REVIEW_THRESHOLD = float(os.getenv("FRAUD_REVIEW_THRESHOLD", 0.7))
+HIGH_VALUE_ORDER = float(os.getenv("FRAUD_HIGH_VALUE_ORDER", 500000))
+MANY_UNITS = 20
+
+
+def enqueue_order_jobs(db, order_id, session=None):
+    for job_type in ORDER_JOB_TYPES:
+        jobs.enqueue(db, job_type, {"order_id": str(order_id)}, key=f"{job_type}:{order_id}", session=session)
+
+
+def load_order(db, payload, projection=None):
+    order_id = payload.get("order_id")
+    if not order_id or not ObjectId.is_valid(order_id):
+        raise jobs.PermanentJobError(f"order_id inválido: {order_id}")
+    order = db['orders'].find_one({"_id": ObjectId(order_id)}, projection)
+    if order is None:
+        raise jobs.PermanentJobError(f"Orden no encontrada: {order_id}")
+    return order
+
+
+# --- Fraude ------------------------------------------------------------------
+
+def fraud_signals(order, user):
+    """Señales simples con su peso; el score es la suma (tope 1)."""
+    signals = {}
+    stats = (user or {}).get(ORDER_STATS_FIELD) or {}
+    # order_stats ya incluye esta orden (se actualiza en el checkout).
+    previous_orders = stats.get("count", 1) - 1
+    if previous_orders <= 0:
+        signals["first_order"] = 0.3
+    else:
+        average = (stats.get("total_spent", 0) - order.get("total", 0)) / previous_orders
+        if average > 0 and order.get("total", 0) > 5 * average:
+            signals["unusual_total"] = 0.3
+    if order.get("total", 0) >= HIGH_VALUE_ORDER:
+        signals["high_value"] = 0.3
+    if sum(item.get("quantity", 0) for item in order.get("items", [])) >= MANY_UNITS:
+        signals["many_units"] = 0.2
+    if not order.get("shipping_address"):
+        signals["no_shipping_address"] = 0.2
+    created_at = (user or {}).get("created_at")
+    if isinstance(created_at, datetime) and order.get("created_at") and \
+            order["created_at"] - created_at < timedelta(days=1):
+        signals["new_account"] = 0.2
+    return signals
+
+
+def score_fraud(db, payload):
+    order = load_order(db, payload, {"user_id": 1, "total": 1, "items.quantity": 1,
+                                     "shipping_address": 1, "created_at": 1})
+    user = db['users'].find_one({"_id": order["user_id"]}, {ORDER_STATS_FIELD: 1, "created_at": 1})
+    signals = fraud_signals(order, user)
+    score = round(min(sum(signals.values()), 1.0), 2)
+    # El estado de la orden no se toca: las marcadas se revisan desde el
+    # listado del admin (GET /admin/orders?flagged=1).
+    db['orders'].update_one(
+        {"_id": order["_id"]},
+        {"$set": {"fraud": {
+            "score": score,
+            "signals": sorted(signals),
+            "flagged": score >= FRAUD_REVIEW_THRESHOLD,
+            "scored_at": datetime.utcnow(),
+        }}}
+    )
+
+
+# --- Factura -----------------------------------------------------------------
+
+def next_invoice_number(db):
+    counter = db['counters'].find_one_and_update(
+        {"_id": "invoice_number"}, {"$inc": {"value": 1}},
+        upsert=True, return_document=ReturnDocument.AFTER
+    )
+    return counter["value"]
+
+
+def generate_invoice(db, payload):
+    order = load_order(db, payload, {"user_id": 1, "items": 1, "subtotal": 1, "shipping_cost": 1,
+                                     "discount": 1, "total": 1, "invoice_number": 1})
+    if order.get("invoice_number"):
+        return
+    invoice = db[INVOICES_COLLECTION].find_one({"order_id": order["_id"]}, {"number": 1})
+    if invoice is None:
+        invoice = {
+            "number": next_invoice_number(db),
+            "order_id": order["_id"],
+            "user_id": order["user_id"],
+            "lines": [{
+                "product_id": item["product_id"],
+                "name": item.get("name"),
+                "quantity": item["quantity"],
+                "price": item["price"],
+                "total": round(item["price"] * item["quantity"], 2),
+            } for item in order.get("items", [])],
+            **{field: order.get(field, 0) for field in ("subtotal", "shipping_cost", "discount", "total")},
+            "issued_at": datetime.utcnow(),
+        }
+        try:
+            db[INVOICES_COLLECTION].insert_one(invoice)
+        except DuplicateKeyError:
+            # Otro intento la emitió primero (índice único por orden); ese número queda sin usar.
+            invoice = db[INVOICES_COLLECTION].find_one({"order_id": order["_id"]}, {"number": 1})
+    db['orders'].update_one({"_id": order["_id"]}, {"$set": {"invoice_number": invoice["number"]}})
+
+
+# --- Mail de confirmación --------------------------------------------------------
+
+def deliver_email(to, subject, body):
+    host = os.getenv("SMTP_HOST")
+    if not host:
+        # Sin SMTP configurado (desarrollo) se muestra por consola, como el enlace de reset.
+        print(f"Mail para {to}: {subject}\n{body}")
+        return
+    message = EmailMessage()
+    message["From"] = os.getenv("MAIL_FROM", "tienda@localhost")
+    message["To"] = to
+    message["Subject"] = subject
+    message.set_content(body)
+    with smtplib.SMTP(host, int(os.getenv("SMTP_PORT", 587)), timeout=10) as smtp:
+        if os.getenv("SMTP_USER"):
+            smtp.starttls()
+            smtp.login(os.getenv("SMTP_USER"), os.getenv("SMTP_PASSWORD", ""))
+        smtp.send_message(message)
+
+
+def confirmation_body(order, user):
+    lines = [f"Hola {user.get('username', '')}, recibimos tu orden {order['_id']}.", ""]
+    for item in order.get("items", []):
+        lines.append(f"  {item['quantity']} x {item.get('name', item['product_id'])}  ${item['price']:.2f}")
+    lines += ["", f"Total: ${order.get('total', 0):.2f}"]
+    return "\n".join(lines)
+
+
+def send_confirmation_email(db, payload):
+    order = load_order(db, payload, {"user_id": 1, "items": 1, "total": 1, "notifications": 1})
+    if (order.get("notifications") or {}).get("confirmation_sent_at"):
+        return
+    user = db['users'].find_one({"_id": order["user_id"]}, {"email": 1, "username": 1})
+    if not user or not user.get("email"):
+        raise jobs.PermanentJobError(f"La orden {order['_id']} no tiene un usuario con email")
+    deliver_email(user["email"], f"Confirmación de tu orden {order['_id']}", confirmation_body(order, user))
+    # Si el proceso muere entre el envío y esta marca, el reintento reenvía el mail.
+    db['orders'].update_one({"_id": order["_id"]}, {"$set": {"notifications.confirmation_sent_at": datetime.utcnow()}})
+
+
+HANDLERS = {
+    FRAUD_SCORE: score_fraud,
+    INVOICE: generate_invoice,
+    CONFIRMATION_EMAIL: send_confirmation_email,
+}
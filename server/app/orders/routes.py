@@ -3,6 +3,8 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson import ObjectId
 from datetime import datetime
 import database as db
+from catalog_cache import stock_changed
+from orders.checkout import CheckoutError, place_order
 
 orders= Blueprint('orders', __name__)
 
@@ -22,14 +24,6 @@ def get_order(order_id):
         if not order:
             return jsonify({"success": False, "error": "Orden no encontrada"}), 404
             
-        order['_id'] = str(order['_id'])
-        order['user_id'] = str(order['user_id'])
-        order['created_at'] = order['created_at'].isoformat()
-        order['updated_at'] = order['updated_at'].isoformat()
-        
-        for item in order['items']:
-            item['product_id'] = str(item['product_id'])
-        
         return jsonify({"success": True, "order": order}), 200
         
     except Exception as e:
@@ -46,44 +40,32 @@ def checkout():
         current_user_id = get_jwt_identity()
         data = request.get_json()
         
-        if not data or 'items' not in data or not data['items']:
-            return jsonify({"success": False, "error": "Datos inválidos - items requeridos"}), 400
-        
         database = db.dbConnect()
-        orders_collection = database.orders
-        
-        order_data = {
-            "user_id": ObjectId(current_user_id),
-            "items": [{
-                "product_id": ObjectId(item.get('product_id')),
-                "quantity": item.get('quantity', 1),
-                "price": item.get('price'),
-                "name": item.get('name', '')
-            } for item in data['items']],
-            "shipping_address": data.get('shipping_address', {}),
-            "payment_method": data.get('payment_method', 'credit_card'),
-            "shipping_method": data.get('shipping_method', 'standard'),
-            "subtotal": data.get('subtotal'),
-            "shipping_cost": data.get('shipping_cost', 0),
-            "discount": data.get('discount', 0),
-            "total": data.get('total'),
-            "status": "pending",
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        }
-        
-        # Insert order
-        result = orders_collection.insert_one(order_data)
+        order = place_order(database, current_user_id, data)
+        # Cambió el stock de los productos comprados: los listados lo
+        # muestran, así que sube la versión de stock (ETag de listados), no la
+        # del catálogo (detalle y facetas de los demás productos siguen).
+        stock_changed(database, product_ids=[str(item["product_id"]) for item in order["items"]])
         
         return jsonify({
             "success": True,
-            "order_id": str(result.inserted_id),
+            "order_id": str(order["_id"]),
+            "subtotal": order["subtotal"],
+            "shipping_cost": order["shipping_cost"],
+            "discount": order["discount"],
+            "total": order["total"],
             "message": "Orden creada exitosamente"
         }), 201
         
+    except CheckoutError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "details": e.details
+        }), e.status
     except Exception as e:
         return jsonify({
             "success": False,
             "error": "Error al procesar la orden",
             "details": str(e)
-        }), 500
\ No newline at end of file
+        }), 500
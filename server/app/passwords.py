@@ -0,0 +1,217 @@
+"""Hash y verificación de contraseñas fuera del hilo del request.
+
+scrypt/argon2 son deliberadamente caros en CPU: hechos inline, una ráfaga de
+logins bloquea el worker y el catálogo servido por el mismo proceso se queda
+esperando. Acá el trabajo va a un pool de procesos acotado; si ya hay
+PASSWORD_HASH_QUEUE_SIZE operaciones en curso o en cola, se espera a lo sumo
+PASSWORD_HASH_QUEUE_TIMEOUT segundos y después se rechaza con HashingBusy
+(las rutas responden 503 + Retry-After) en vez de acumular requests.
+
+Algoritmo y costo se configuran por entorno:
+  PASSWORD_HASH_METHOD   scrypt (default), pbkdf2 o argon2 (requiere argon2-cffi)
+  PASSWORD_SCRYPT_N / _R / _P, PASSWORD_PBKDF2_ITERATIONS,
+  PASSWORD_ARGON2_TIME_COST / _MEMORY_COST / _PARALLELISM
+
+Cuando los parámetros cambian, verify_and_update() devuelve un hash nuevo en
+el siguiente login correcto para reemplazar el guardado.
+
+PASSWORD_HASH_WORKERS=0 hace todo inline (útil en desarrollo).
+"""
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import threading
+from werkzeug.security import check_password_hash, generate_password_hash
+
+HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", 2 ** 15))
+SCRYPT_R = int(os.getenv("PASSWORD_SCRYPT_R", 8))
+SCRYPT_P = int(os.getenv("PASSWORD_SCRYPT_P", 1))
+PBKDF2_ITERATIONS = int(os.getenv("PASSWORD_PBKDF2_ITERATIONS", 1000000))
+ARGON2_TIME_COST = int(os.getenv("PASSWORD_ARGON2_TIME_COST", 3))
+ARGON2_MEMORY_COST = int(os.getenv("PASSWORD_ARGON2_MEMORY_COST", 65536))
+ARGON2_PARALLELISM = int(os.getenv("PASSWORD_ARGON2_PARALLELISM", 1))
+
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", 32))
+HASH_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", 2))
+HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", 10))
+
+ARGON2_PREFIX = "$argon2"
+
+
+class HashingBusy(Exception):
+    """El pool de hashing está saturado; el cliente debería reintentar."""
+
+    retry_after = 1
+
+
+def settings():
+    # Los parámetros de argon2 van siempre: verificar un hash argon2 viejo
+    # necesita el hasher aunque el método actual sea otro.
+    config = {
+        "time_cost": ARGON2_TIME_COST,
+        "memory_cost": ARGON2_MEMORY_COST,
+        "parallelism": ARGON2_PARALLELISM,
+    }
+    if HASH_METHOD == "argon2":
+        config["method"] = "argon2"
+    elif HASH_METHOD == "pbkdf2":
+        config["method"] = f"pbkdf2:sha256:{PBKDF2_ITERATIONS}"
+    elif HASH_METHOD == "scrypt":
+        config["method"] = f"scrypt:{SCRYPT_N}:{SCRYPT_R}:{SCRYPT_P}"
+    else:
+        raise RuntimeError(f"PASSWORD_HASH_METHOD no soportado: {HASH_METHOD}")
+    return config
+
+
+def _argon2_hasher(config):
+    try:
+        from argon2 import PasswordHasher
+    except ImportError:
+        raise RuntimeError("Para usar argon2 hay que instalar el paquete 'argon2-cffi'")
+    return PasswordHasher(
+        time_cost=config["time_cost"],
+        memory_cost=config["memory_cost"],
+        parallelism=config["parallelism"],
+    )
+
+
+# Estas dos corren en los procesos del pool: tienen que ser funciones de
+# módulo (picklables) y recibir la configuración como argumento.
+def _hash(password, config):
+    if config["method"] == "argon2":
+        return _argon2_hasher(config).hash(password)
+    return generate_password_hash(password, method=config["method"])
+
+
+def _verify(stored_hash, password, config):
+    if not stored_hash:
+        return False
+    if stored_hash.startswith(ARGON2_PREFIX):
+        from argon2.exceptions import InvalidHashError, VerificationError
+
+        try:
+            return _argon2_hasher(config).verify(stored_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+    return check_password_hash(stored_hash, password)
+
+
+def needs_rehash(stored_hash, config=None):
+    config = config or settings()
+    if config["method"] == "argon2":
+        if not stored_hash.startswith(ARGON2_PREFIX):
+            return True
+        return _argon2_hasher(config).check_needs_rehash(stored_hash)
+    if stored_hash.startswith(ARGON2_PREFIX):
+        return True
+    # Formato de werkzeug: "<método>$<salt>$<hash>", p. ej. "scrypt:32768:8:1$...".
+    return stored_hash.split("$", 1)[0] != config["method"]
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(HASH_QUEUE_SIZE)
+_stats_lock = threading.Lock()
+_stats = {"submitted": 0, "rejected": 0, "in_flight": 0}
+
+
+def _reset_after_fork():
+    # Un ProcessPoolExecutor no sobrevive a fork(): cada worker arma el suyo.
+    global _executor, _executor_pid, _executor_lock, _slots, _stats_lock
+    _executor = None
+    _executor_pid = None
+    _executor_lock = threading.Lock()
+    _slots = threading.BoundedSemaphore(HASH_QUEUE_SIZE)
+    _stats_lock = threading.Lock()
+    _stats.update(submitted=0, rejected=0, in_flight=0)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _mp_context():
+    # Con fork el hijo copiaría un worker con hilos (gthread, el pool de
+    # Mongo) y podría heredar un lock tomado; forkserver arranca los procesos
+    # desde un servidor limpio. En Windows sólo existe spawn.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def get_executor():
+    global _executor, _executor_pid
+    if _executor is not None and _executor_pid == os.getpid():
+        return _executor
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(max_workers=HASH_WORKERS, mp_context=_mp_context())
+            _executor_pid = os.getpid()
+    return _executor
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None and _executor_pid == os.getpid():
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _run(fn, *args):
+    if HASH_WORKERS <= 0:
+        return fn(*args)
+
+    if not _slots.acquire(timeout=HASH_QUEUE_TIMEOUT):
+        with _stats_lock:
+            _stats["rejected"] += 1
+        raise HashingBusy("Demasiadas operaciones de contraseña en curso")
+
+    slots = _slots
+    with _stats_lock:
+        _stats["submitted"] += 1
+        _stats["in_flight"] += 1
+
+    def release(_future):
+        with _stats_lock:
+            _stats["in_flight"] -= 1
+        slots.release()
+
+    try:
+        future = get_executor().submit(fn, *args)
+    except Exception:
+        release(None)
+        raise
+    future.add_done_callback(release)
+    return future.result(timeout=HASH_TIMEOUT)
+
+
+def hash_password(password):
+    return _run(_hash, password, settings())
+
+
+def verify_password(stored_hash, password):
+    return _run(_verify, stored_hash or "", password, settings())
+
+
+def verify_and_update(stored_hash, password):
+    """Devuelve (ok, nuevo_hash); nuevo_hash es None si el guardado sigue vigente."""
+    stored_hash = stored_hash or ""
+    if not verify_password(stored_hash, password):
+        return False, None
+    if needs_rehash(stored_hash):
+        return True, hash_password(password)
+    return True, None
+
+
+def stats():
+    with _stats_lock:
+        current = dict(_stats)
+    current.update(
+        method=settings()["method"],
+        workers=HASH_WORKERS,
+        queue_size=HASH_QUEUE_SIZE,
+    )
+    return current
@@ -0,0 +1,43 @@
+import os
+from bson import ObjectId
+from cache import LRUCache
+
+# Cache de "principales" (id -> datos mínimos para autorizar) para que
+# admin_required no consulte la base en cada request. Cada proceso tiene su
+# propia copia: la invalidación explícita es local y el TTL acota cuánto puede
+# tardar otro worker en ver un cambio de rol.
+PRINCIPAL_FIELDS = {"username": 1, "email": 1, "role": 1}
+
+_principals = LRUCache(
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", 10000)),
+    ttl=float(os.getenv("PRINCIPAL_CACHE_TTL", 60)),
+)
+
+
+def get_principal(db, user_id):
+    principal = _principals.get(user_id)
+    if principal is not None:
+        return principal
+
+    if not ObjectId.is_valid(user_id):
+        return None
+    user = db['users'].find_one({"_id": ObjectId(user_id)}, PRINCIPAL_FIELDS)
+    if not user:
+        return None
+
+    principal = {
+        "id": str(user["_id"]),
+        "username": user.get("username"),
+        "email": user.get("email"),
+        "role": user.get("role", "user"),
+    }
+    _principals.set(user_id, principal)
+    return principal
+
+
+def invalidate_principal(user_id):
+    _principals.delete(str(user_id))
+
+
+def principal_cache_stats():
+    return _principals.stats()
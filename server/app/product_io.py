@@ -0,0 +1,262 @@
+"""Importación y exportación masiva del catálogo.
+
+Importar acepta CSV (con encabezado) o NDJSON (un producto JSON por línea),
+valida cada fila con las mismas reglas que el alta/edición individual
+(product_rules) y hace upsert por `sku`: si el sku existe se actualizan los
+campos presentes en la fila, si no se crea el producto con los valores por
+defecto. Las filas se escriben en chunks con un bulk_write no ordenado, así
+una fila inválida o rechazada por Mongo no frena al resto.
+
+El import es un generador de eventos para ir informando el avance:
+
+    {"type": "error", "row": 12, "sku": "A-1", "error": "..."}
+    {"type": "progress", "rows": 5000, "inserted": ..., "updated": ..., "failed": ...}
+    {"type": "done", ...mismos contadores...}
+
+En CSV las listas (subcategories, image_urls) van separadas por '|' y
+attributes como JSON.
+
+    python product_io.py import proveedor.csv
+    python product_io.py export catalogo.ndjson
+"""
+import csv
+import io
+import json
+import os
+import sys
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from catalog import STREAM_BATCH_SIZE
+from catalog_cache import catalog_changed
+import product_rules
+
+CHUNK_SIZE = int(os.getenv("PRODUCT_IMPORT_CHUNK_SIZE", 1000))
+FORMATS = ("csv", "ndjson")
+LIST_FIELDS = ("subcategories", "image_urls")
+BOOL_FIELDS = ("is_featured", "is_active")
+LIST_SEPARATOR = "|"
+TRUE_VALUES = ("1", "true", "si", "sí", "yes")
+EXPORT_FIELDS = [
+    "_id", "sku", "title", "description", "price", "original_price", "category",
+    "subcategories", "brand", "stock", "image_urls", "main_image", "attributes",
+    "is_featured", "is_active", "created_at", "updated_at",
+]
+
+
+def format_from_name(name, default="ndjson"):
+    extension = os.path.splitext(name or "")[1].lstrip(".").lower()
+    if extension == "jsonl":
+        return "ndjson"
+    return extension if extension in FORMATS else default
+
+
+# --- Lectura ---------------------------------------------------------------
+
+def csv_row_to_data(row):
+    """Fila de csv.DictReader -> datos como los recibiría create_product."""
+    data = {}
+    for field, value in row.items():
+        if field is None or value is None:
+            continue
+        field, value = field.strip(), value.strip()
+        if value == "":
+            continue
+        if field in LIST_FIELDS:
+            data[field] = [item.strip() for item in value.split(LIST_SEPARATOR) if item.strip()]
+        elif field == "attributes":
+            try:
+                data[field] = json.loads(value)
+            except ValueError:
+                raise product_rules.ProductValidationError("attributes debe ser un objeto JSON")
+        elif field in BOOL_FIELDS:
+            data[field] = value.lower() in TRUE_VALUES
+        else:
+            data[field] = value
+    return data
+
+
+def read_rows(stream, fmt):
+    """Genera (número de fila, datos, error) desde un stream binario."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        # La fila 1 es el encabezado.
+        for number, row in enumerate(csv.DictReader(text), start=2):
+            try:
+                yield number, csv_row_to_data(row), None
+            except product_rules.ProductValidationError as e:
+                yield number, None, str(e)
+        return
+
+    for number, line in enumerate(text, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            yield number, None, "JSON inválido"
+            continue
+        if not isinstance(data, dict):
+            yield number, None, "Cada línea debe ser un objeto JSON"
+            continue
+        yield number, data, None
+
+
+# --- Importación -----------------------------------------------------------
+
+def row_operation(data, existing_id, now):
+    """UpdateOne para una fila ya decodificada."""
+    if existing_id is None:
+        product = product_rules.new_product(data, now)
+        # $setOnInsert: si otro proceso creó el sku en el medio no se pisa.
+        return UpdateOne({"sku": data["sku"]}, {"$setOnInsert": product}, upsert=True)
+    # search_index y facetas se recalculan después del bulk (write_chunk).
+    return UpdateOne({"_id": existing_id}, {"$set": product_rules.product_update(data, now)})
+
+
+def write_chunk(db, chunk, counts):
+    """Escribe un chunk de (fila, datos) y devuelve (errores, ids actualizados)."""
+    skus = [data["sku"] for _, data in chunk]
+    existing = {doc["sku"]: doc["_id"] for doc in db['products'].find({"sku": {"$in": skus}}, {"sku": 1})}
+    now = datetime.utcnow()
+
+    errors = []
+    pending = []
+    for number, data in chunk:
+        try:
+            operation = row_operation(data, existing.get(data["sku"]), now)
+        except product_rules.ProductValidationError as e:
+            errors.append({"row": number, "sku": data["sku"], "error": str(e)})
+            continue
+        pending.append((number, data["sku"], operation, existing.get(data["sku"])))
+
+    failed, upserted = {}, {}
+    if pending:
+        try:
+            result = db['products'].bulk_write([operation for _, _, operation, _ in pending], ordered=False)
+            upserted = dict(result.upserted_ids)
+        except BulkWriteError as e:
+            failed = {error["index"]: error.get("errmsg", "Error de escritura") for error in e.details["writeErrors"]}
+            upserted = {item["index"]: item["_id"] for item in e.details.get("upserted", [])}
+
+    updated_ids = []
+    written = list(upserted.values())
+    for index, (number, sku, _, existing_id) in enumerate(pending):
+        if index in failed:
+            errors.append({"row": number, "sku": sku, "error": failed[index]})
+        elif existing_id is not None:
+            counts["updated"] += 1
+            updated_ids.append(str(existing_id))
+            written.append(existing_id)
+        elif index in upserted:
+            counts["inserted"] += 1
+        else:
+            errors.append({"row": number, "sku": sku, "error": "El sku se creó en paralelo; reintentar la fila"})
+
+    product_rules.sync_derived_by_id(db, written)
+    counts["failed"] += len(errors)
+    return errors, updated_ids
+
+
+def import_products(db, rows, chunk_size=CHUNK_SIZE):
+    """Procesa (fila, datos, error) de read_rows y genera eventos de avance."""
+    counts = {"rows": 0, "inserted": 0, "updated": 0, "failed": 0}
+    updated_ids = []
+    chunk, chunk_skus = [], set()
+
+    def flush():
+        errors, ids = write_chunk(db, chunk, counts)
+        updated_ids.extend(ids)
+        chunk.clear()
+        chunk_skus.clear()
+        return [{"type": "error", **error} for error in errors] + [{"type": "progress", **counts}]
+
+    for number, data, error in rows:
+        counts["rows"] += 1
+        if error is None and not str((data or {}).get("sku") or "").strip():
+            error = "sku requerido para importar"
+        if error is not None:
+            counts["failed"] += 1
+            yield {"type": "error", "row": number, "sku": (data or {}).get("sku"), "error": error}
+            continue
+
+        data["sku"] = str(data["sku"]).strip()
+        # Un sku repetido dentro del mismo chunk se aplica después del anterior.
+        if data["sku"] in chunk_skus:
+            yield from flush()
+        chunk.append((number, data))
+        chunk_skus.add(data["sku"])
+        if len(chunk) >= chunk_size:
+            yield from flush()
+
+    if chunk:
+        yield from flush()
+    if counts["inserted"] or counts["updated"]:
+        catalog_changed(db, product_ids=updated_ids)
+    yield {"type": "done", **counts}
+
+
+# --- Exportación -----------------------------------------------------------
+
+def csv_value(field, value):
+    if value is None:
+        return ""
+    if field in LIST_FIELDS:
+        return LIST_SEPARATOR.join(str(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def export_products(db, fmt, dumps, query=None):
+    """Genera el catálogo como CSV o NDJSON leyendo el cursor por lotes."""
+    cursor = db['products'].find(query or {}, {field: 1 for field in EXPORT_FIELDS}) \
+        .sort("_id", 1).batch_size(STREAM_BATCH_SIZE)
+
+    if fmt != "csv":
+        for doc in cursor:
+            yield dumps(doc) + "\n"
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        writer.writerow(values)
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    yield line(EXPORT_FIELDS)
+    for doc in cursor:
+        yield line([csv_value(field, doc.get(field)) for field in EXPORT_FIELDS])
+
+
+if __name__ == '__main__':
+    from database import dbConnect
+    from json_provider import default as json_default
+
+    if len(sys.argv) < 3 or sys.argv[1] not in ("import", "export"):
+        print(__doc__)
+        sys.exit(1)
+
+    command, path = sys.argv[1], sys.argv[2]
+    fmt = sys.argv[3] if len(sys.argv) > 3 else format_from_name(path)
+    database = dbConnect()
+
+    if command == "import":
+        with open(path, "rb") as source:
+            for event in import_products(database, read_rows(source, fmt)):
+                print(json.dumps(event, ensure_ascii=False))
+    else:
+        def dumps(doc):
+            return json.dumps(doc, default=json_default, ensure_ascii=False)
+
+        with open(path, "w", encoding="utf-8", newline="") as target:
+            for text in export_products(database, fmt, dumps):
+                target.write(text)
+        print(f"Catálogo exportado en {path}")
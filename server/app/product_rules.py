@@ -0,0 +1,114 @@
+"""Reglas de validación de productos, compartidas por el alta/edición
+individual (app.create_product / app.update_product) y la importación masiva
+(product_io). También agrega los campos derivados (search_index,
+category_key y price_bucket) y los mantiene después de cada escritura
+(sync_derived).
+"""
+from datetime import datetime
+import facets
+import search
+
+REQUIRED_FIELDS = ('title', 'price', 'category')
+# Lo que hace falta leer de un producto para recalcular search_index y facetas.
+DERIVED_SOURCE_FIELDS = {
+    **{field: 1 for field in search.SEARCH_FIELD_WEIGHTS},
+    **facets.FACET_SOURCE_FIELDS,
+    search.SEARCH_INDEX_FIELD: 1,
+    "updated_at": 1,
+}
+
+# Campos editables y el tipo al que se convierten.
+FIELD_TYPES = {
+    'title': str,
+    'description': str,
+    'price': float,
+    'original_price': float,
+    'category': str,
+    'subcategories': list,
+    'image_urls': list,
+    'main_image': str,
+    'stock': int,
+    'sku': str,
+    'brand': str,
+    'attributes': dict,
+    'is_featured': bool,
+    'is_active': bool
+}
+
+
+class ProductValidationError(ValueError):
+    pass
+
+
+def new_product(data, now=None):
+    """Documento completo para un alta, con valores por defecto."""
+    for field in REQUIRED_FIELDS:
+        if field not in data:
+            raise ProductValidationError(f"Campo requerido faltante: {field}")
+
+    now = now or datetime.utcnow()
+    try:
+        product = {
+            "title": data['title'],
+            "description": data.get('description', ''),
+            "price": float(data['price']),
+            "original_price": float(data.get('original_price', data['price'])),
+            "category": data['category'],
+            "subcategories": data.get('subcategories', []),
+            "image_urls": data.get('image_urls', []),
+            "main_image": data.get('main_image', data.get('image_urls', [])[0] if data.get('image_urls') else ''),
+            "stock": int(data.get('stock', 0)),
+            "sku": data.get('sku', ''),
+            "brand": data.get('brand', ''),
+            "attributes": data.get('attributes', {}),
+            "is_featured": bool(data.get('is_featured', False)),
+            "is_active": bool(data.get('is_active', True)),
+            "created_at": now,
+            "updated_at": now
+        }
+    except (ValueError, TypeError):
+        raise ProductValidationError("Datos numéricos inválidos")
+    product.update(derived_fields(product))
+    return product
+
+
+def product_update(data, now=None):
+    """Campos a $set para una edición parcial (sin search_index: depende del resto)."""
+    update = {}
+    for field, field_type in FIELD_TYPES.items():
+        if field in data:
+            try:
+                update[field] = field_type(data[field])
+            except (ValueError, TypeError):
+                raise ProductValidationError(f"Tipo inválido para el campo {field}")
+
+    if not update:
+        raise ProductValidationError("No se proporcionaron datos válidos para actualizar")
+
+    update['updated_at'] = now or datetime.utcnow()
+    update.update(facets.facet_fields(update))
+    return update
+
+
+def derived_fields(product):
+    return {"search_index": search.build_search_index(product), **facets.facet_fields(product)}
+
+
+def sync_derived(db, products):
+    """search_index y conteos de facetas para {product_id: producto leído con DERIVED_SOURCE_FIELDS}.
+
+    Sólo escribe lo que cambió; el bus de eventos hace lo mismo con los
+    cambios que no pasan por acá, así que repetirlo no tiene efecto.
+    """
+    search.sync_search_index(db, products)
+    facets.sync_facet_members(db, products)
+
+
+def sync_derived_by_id(db, product_ids):
+    if not product_ids:
+        return
+    products = {
+        product["_id"]: product
+        for product in db['products'].find({"_id": {"$in": list(product_ids)}}, DERIVED_SOURCE_FIELDS)
+    }
+    sync_derived(db, products)
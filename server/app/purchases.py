@@ -0,0 +1,165 @@
+"""Datos de compra que viven en el documento del usuario.
+
+El historial completo está en `orders` (índice user_created_id). En el
+usuario quedan sólo:
+
+  purchased_product_ids  ids (str) de productos comprados alguna vez, para
+                         saber si puede reseñar un producto en O(1)
+  order_stats            {count, total_spent, last_order_at}
+
+Los dos se actualizan en la misma escritura del checkout que limpia el
+carrito. backfill_purchases pasa el viejo purchase_history embebido a
+`orders` (una orden por entrada, marcada con legacy_key para no duplicarla
+si se vuelve a correr), recalcula los dos campos y recién entonces borra el
+historial embebido. Corre como migración de datos (indexes.py, versión 10);
+para recalcular a mano:
+
+    python purchases.py
+"""
+from datetime import datetime
+from bson import ObjectId
+from pymongo import UpdateOne
+
+PURCHASED_FIELD = "purchased_product_ids"
+ORDER_STATS_FIELD = "order_stats"
+LEGACY_HISTORY_FIELD = "purchase_history"
+
+# Lo que devuelve el historial paginado: sin direcciones ni datos de pago.
+ORDER_SUMMARY_FIELDS = {
+    "items.product_id": 1, "items.name": 1, "items.quantity": 1, "items.price": 1,
+    "total": 1, "status": 1, "created_at": 1,
+}
+
+
+def purchase_update(lines, total, now):
+    """Fragmento de update para el usuario al confirmar una orden."""
+    return {
+        "$addToSet": {PURCHASED_FIELD: {"$each": [str(line["product_id"]) for line in lines]}},
+        "$inc": {f"{ORDER_STATS_FIELD}.count": 1, f"{ORDER_STATS_FIELD}.total_spent": total},
+        "$max": {f"{ORDER_STATS_FIELD}.last_order_at": now},
+    }
+
+
+def purchase_history(db, user_id, limit=20):
+    user_id = ObjectId(user_id)
+    # Órdenes viejas guardaban user_id como string; las dos formas usan el índice.
+    return list(
+        db['orders'].find({"user_id": {"$in": [user_id, str(user_id)]}}, ORDER_SUMMARY_FIELDS)
+        .sort("created_at", -1)
+        .limit(limit)
+    )
+
+
+def legacy_order(user, index, entry):
+    """Orden para una entrada del purchase_history embebido."""
+    created_at = entry.get("created_at") or entry.get("date") or entry.get("purchased_at")
+    if not isinstance(created_at, datetime):
+        created_at = user.get("created_at") if isinstance(user.get("created_at"), datetime) else datetime.utcnow()
+    items = [{
+        "product_id": item["product_id"],
+        "name": item.get("name") or item.get("title"),
+        "quantity": item.get("quantity", 1),
+        "price": item.get("price", 0),
+    } for item in entry.get("items", []) if item.get("product_id") is not None]
+    total = entry.get("total")
+    if total is None:
+        total = round(sum(item["price"] * item["quantity"] for item in items), 2)
+    return {
+        # Usuario + fecha + posición: estable entre corridas.
+        "legacy_key": f"{user['_id']}:{created_at.isoformat()}:{index}",
+        "user_id": user["_id"],
+        "items": items,
+        "subtotal": entry.get("subtotal", total),
+        "shipping_cost": entry.get("shipping_cost", 0),
+        "discount": entry.get("discount", 0),
+        "total": total,
+        "status": entry.get("status", "delivered"),
+        "created_at": created_at,
+        "updated_at": created_at,
+    }
+
+
+def copy_legacy_orders(db, batch_size=1000):
+    """Inserta en `orders` las entradas embebidas que todavía no están; devuelve cuántas."""
+    inserted = 0
+    requests = []
+    users = db['users'].find({LEGACY_HISTORY_FIELD: {"$exists": True, "$ne": []}},
+                             {LEGACY_HISTORY_FIELD: 1, "created_at": 1})
+    for user in users:
+        for index, entry in enumerate(user.get(LEGACY_HISTORY_FIELD) or []):
+            order_id = entry.get("order_id") or entry.get("_id")
+            if order_id and db['orders'].count_documents({"_id": order_id}, limit=1):
+                # La entrada era una copia de una orden que ya está en `orders`.
+                continue
+            order = legacy_order(user, index, entry)
+            requests.append(UpdateOne({"legacy_key": order["legacy_key"]}, {"$setOnInsert": order}, upsert=True))
+            if len(requests) >= batch_size:
+                inserted += db['orders'].bulk_write(requests, ordered=False).upserted_count
+                requests = []
+    if requests:
+        inserted += db['orders'].bulk_write(requests, ordered=False).upserted_count
+    return inserted
+
+
+def backfill_purchases(db, batch_size=1000):
+    """Pasa el historial embebido a `orders` y recalcula los datos de compra desde ahí."""
+    # Si la copia falla, la excepción corta antes de borrar nada del usuario.
+    copy_legacy_orders(db, batch_size)
+
+    summaries = {}
+    pipeline = [
+        {"$unwind": "$items"},
+        {"$group": {
+            "_id": {"user": "$user_id", "order": "$_id"},
+            "products": {"$addToSet": "$items.product_id"},
+            "total": {"$first": "$total"},
+            "created_at": {"$first": "$created_at"},
+        }},
+        {"$group": {
+            "_id": "$_id.user",
+            "products": {"$push": "$products"},
+            "count": {"$sum": 1},
+            "total_spent": {"$sum": "$total"},
+            "last_order_at": {"$max": "$created_at"},
+        }},
+    ]
+    for row in db['orders'].aggregate(pipeline, allowDiskUse=True):
+        # Hay órdenes viejas con user_id como string: se juntan con las de ObjectId.
+        summary = summaries.setdefault(str(row["_id"]), {
+            "products": set(),
+            "stats": {"count": 0, "total_spent": 0, "last_order_at": None},
+        })
+        summary["products"].update(str(pid) for products in row["products"] for pid in products)
+        stats = summary["stats"]
+        stats["count"] += row["count"]
+        stats["total_spent"] += row["total_spent"] or 0
+        if row["last_order_at"] and (stats["last_order_at"] is None or row["last_order_at"] > stats["last_order_at"]):
+            stats["last_order_at"] = row["last_order_at"]
+
+    updated = 0
+    requests = []
+    users = db['users'].find({}, {"_id": 1})
+    for user in users:
+        summary = summaries.get(str(user["_id"])) or {
+            "products": set(), "stats": {"count": 0, "total_spent": 0, "last_order_at": None}
+        }
+
+        requests.append(UpdateOne(
+            {"_id": user["_id"]},
+            {
+                "$set": {PURCHASED_FIELD: sorted(summary["products"]), ORDER_STATS_FIELD: summary["stats"]},
+                "$unset": {LEGACY_HISTORY_FIELD: ""},
+            }
+        ))
+        if len(requests) >= batch_size:
+            updated += db['users'].bulk_write(requests, ordered=False).modified_count
+            requests = []
+    if requests:
+        updated += db['users'].bulk_write(requests, ordered=False).modified_count
+    return updated
+
+
+if __name__ == "__main__":
+    from database import dbConnect
+
+    print(f"Usuarios actualizados: {backfill_purchases(dbConnect())}")
@@ -0,0 +1,212 @@
+"""Rate limiting por cliente con contadores de ventana deslizante.
+
+Las políticas se asignan por endpoint ("auth.login") o por blueprint
+("auth", aplica a todas sus rutas salvo que el endpoint tenga la suya) y son
+listas de reglas "<clave>:<límite>/<período>":
+
+    "auth.login": ["ip:20/minute", "email:5/minute"]
+
+Claves: ip (remote_addr; detrás de un proxy, la de X-Forwarded-For según
+TRUSTED_PROXY_HOPS, ver app.py), user (identidad del JWT si viene uno), email (del
+body JSON, para frenar credential stuffing contra una cuenta desde muchas
+IPs) y route (global para el endpoint). Se pueden reemplazar con
+app.config["RATELIMIT_POLICIES"].
+
+El chequeo corre en un before_request, antes de la vista y de cualquier
+consulta a Mongo, y cuesta O(1): cada regla es una ventana deslizante
+aproximada (ventana fija actual + la anterior ponderada), dos contadores por
+clave. Con RATELIMIT_STORAGE_URL los contadores van a Redis y se comparten
+entre workers; si no, cada proceso tiene los suyos en memoria. En los dos
+casos cuentan también los intentos rechazados: un cliente que sigue
+insistiendo mientras está bloqueado no recupera lugar.
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+DEFAULT_POLICIES = {
+    "auth.login": ["ip:20/minute", "email:5/minute"],
+    "auth.request_reset": ["ip:5/minute", "email:3/hour"],
+    "main.search_products": ["ip:60/minute", "user:120/minute"],
+}
+
+
+def parse_rule(rule):
+    key, _, limit = rule.partition(":")
+    count, _, period = limit.partition("/")
+    if key not in KEY_FUNCTIONS or period not in PERIODS:
+        raise ValueError(f"Regla de rate limit inválida: {rule}")
+    return key, int(count), PERIODS[period]
+
+
+def sliding_window(now, window, current, previous, limit):
+    """Devuelve (permitido, segundos hasta poder reintentar)."""
+    elapsed = (now % window) / window
+    if previous * (1 - elapsed) + current < limit:
+        return True, 0
+    if previous and current < limit:
+        # La ventana anterior pesa cada vez menos; se libera lugar antes del corte.
+        wait = (1 - (limit - current) / previous - elapsed) * window
+    else:
+        wait = (1 - elapsed) * window
+    return False, max(1, math.ceil(wait))
+
+
+class MemoryRateLimitStore:
+    """Contadores en memoria del proceso, con desalojo LRU para acotar claves."""
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, window):
+        now = time.time()
+        index = int(now // window)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < index - 1:
+                current, previous = 0, 0
+            elif entry[0] == index - 1:
+                current, previous = 0, entry[1]
+            else:
+                current, previous = entry[1], entry[2]
+
+            allowed, retry_after = sliding_window(now, window, current, previous, limit)
+            # Igual que el INCR de Redis: el intento cuenta aunque se rechace.
+            current += 1
+            self._data[key] = (index, current, previous)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return allowed, retry_after
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {"backend": "memory", "keys": len(self._data), "maxsize": self.maxsize}
+
+
+class RedisRateLimitStore:
+    """Contadores compartidos entre workers: un INCR y un GET por regla."""
+
+    def __init__(self, client, prefix="tienda:ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+
+    def hit(self, key, limit, window):
+        now = time.time()
+        index = int(now // window)
+        pipe = self.client.pipeline()
+        pipe.incr(f"{self.prefix}{key}:{index}")
+        pipe.expire(f"{self.prefix}{key}:{index}", window * 2)
+        pipe.get(f"{self.prefix}{key}:{index - 1}")
+        current, _, previous = pipe.execute()
+        # El INCR ya contó este intento; se compara lo que había antes.
+        return sliding_window(now, window, current - 1, int(previous or 0), limit)
+
+    def stats(self):
+        return {"backend": "redis"}
+
+
+def store_from_env():
+    url = os.getenv("RATELIMIT_STORAGE_URL")
+    if url:
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("Para usar rate limiting en Redis hay que instalar el paquete 'redis'")
+        return RedisRateLimitStore(redis.Redis.from_url(url))
+    return MemoryRateLimitStore(maxsize=int(os.getenv("RATELIMIT_MEMORY_KEYS", 100000)))
+
+
+def client_ip():
+    return request.remote_addr or "unknown"
+
+
+def client_user():
+    # Sólo decodifica el token (sin ir a la base); sin JWT no hay clave.
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+
+def client_email():
+    data = request.get_json(silent=True)
+    email = data.get("email") if isinstance(data, dict) else None
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+def route_key():
+    return "*"
+
+
+KEY_FUNCTIONS = {
+    "ip": client_ip,
+    "user": client_user,
+    "email": client_email,
+    "route": route_key,
+}
+
+
+class RateLimiter:
+    def __init__(self, store=None):
+        self.store = store
+        self.policies = {}
+        self._lock = threading.Lock()
+        self.rejected = {}
+
+    def init_app(self, app):
+        if self.store is None:
+            self.store = store_from_env()
+        policies = app.config.get("RATELIMIT_POLICIES", DEFAULT_POLICIES)
+        self.policies = {name: [parse_rule(rule) for rule in rules] for name, rules in policies.items()}
+        if app.config.get("RATELIMIT_ENABLED", True):
+            app.before_request(self.check)
+
+    def rules_for(self, endpoint, blueprint):
+        rules = self.policies.get(endpoint)
+        if rules is None and blueprint:
+            rules = self.policies.get(blueprint)
+        return rules or ()
+
+    def check(self):
+        if request.method == "OPTIONS" or request.endpoint is None:
+            return None
+        for key_name, limit, window in self.rules_for(request.endpoint, request.blueprint):
+            value = KEY_FUNCTIONS[key_name]()
+            if value is None:
+                continue
+            key = f"{request.endpoint}:{key_name}:{value}:{window}"
+            allowed, retry_after = self.store.hit(key, limit, window)
+            if not allowed:
+                with self._lock:
+                    self.rejected[request.endpoint] = self.rejected.get(request.endpoint, 0) + 1
+                current_app.logger.warning(
+                    "Rate limit %s/%ss por %s excedido en %s", limit, window, key_name, request.endpoint
+                )
+                return jsonify({
+                    "success": False,
+                    "error": "Demasiadas solicitudes, reintentá más tarde"
+                }), 429, {"Retry-After": str(retry_after), "X-RateLimit-Limit": str(limit)}
+        return None
+
+    def stats(self):
+        with self._lock:
+            rejected = dict(self.rejected)
+        stats = self.store.stats() if self.store is not None else {}
+        stats["rejected"] = rejected
+        return stats
+
+
+limiter = RateLimiter()
@@ -0,0 +1,275 @@
+"""Recomendaciones ítem a ítem por co-compra.
+
+Tabla `product_neighbors`, un documento por producto:
+
+    {_id: "<product_id>", n: <órdenes de 2+ productos que lo incluyen>,
+     neighbors: [{p: "<product_id>", c: <co-compras>, s: <score>}, ...]}
+
+con score = c / sqrt(n_a * n_b) (coseno sobre la matriz orden x producto) y
+los NEIGHBOR_CANDIDATES mejores vecinos ordenados por score.
+
+  build    recalcula todo desde `orders` con matrices dispersas (numpy +
+           scipy, sólo los necesita este paso): C = XᵀX.
+  refresh  incremental: procesa las órdenes posteriores a la marca de agua
+           guardada en `counters` y actualiza sólo los productos tocados.
+           Como un checkout fija created_at antes de confirmar la
+           escritura, una orden puede aparecer con un created_at ya pasado
+           por la marca: cada corrida vuelve a mirar RECOMMENDATIONS_SETTLE
+           segundos antes de la marca y saltea las órdenes de esa ventana que
+           ya contó (sus _id quedan en el mismo documento de estado).
+           Es exacto para pares que ya están en la tabla; un par nuevo entra
+           con las co-compras vistas desde el último build, así que conviene
+           reconstruir periódicamente (p. ej. de noche).
+
+Servir a un usuario es una sola consulta por _id con los productos que ya
+compró (purchased_product_ids, ver purchases.py).
+
+    python recommendations.py build
+    python recommendations.py refresh
+"""
+import heapq
+import math
+import os
+import sys
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from pymongo import ReplaceOne
+
+NEIGHBORS_COLLECTION = "product_neighbors"
+STATE_ID = "recommendations"
+NEIGHBOR_CANDIDATES = 50
+MAX_SOURCE_PRODUCTS = 200
+WRITE_BATCH_SIZE = 1000
+ORDER_FIELDS = {"items.product_id": 1, "created_at": 1}
+SETTLE = timedelta(seconds=float(os.getenv("RECOMMENDATIONS_SETTLE", 60)))
+
+
+def order_products(order):
+    return {str(item["product_id"]) for item in order.get("items", [])}
+
+
+def top_neighbors(candidates, limit=NEIGHBOR_CANDIDATES):
+    return heapq.nlargest(limit, candidates, key=lambda neighbor: (neighbor["s"], neighbor["p"]))
+
+
+def cosine(co_count, n_a, n_b):
+    return round(co_count / math.sqrt(n_a * n_b), 6) if n_a and n_b else 0.0
+
+
+def get_state(db):
+    return db['counters'].find_one({"_id": STATE_ID}) or {}
+
+
+def save_state(db, watermark, recent, **fields):
+    db['counters'].update_one(
+        {"_id": STATE_ID},
+        {"$set": {"watermark": watermark, "recent": recent, "updated_at": datetime.utcnow(), **fields}},
+        upsert=True
+    )
+
+
+def settle_window(watermark):
+    """Órdenes desde SETTLE antes de la marca (las ya contadas se saltean por _id)."""
+    if not watermark or not watermark.get("created_at"):
+        return {}
+    return {"created_at": {"$gte": watermark["created_at"] - SETTLE}}
+
+
+def recent_orders(orders, watermark):
+    """Las (created_at, _id) que caen en la ventana de la próxima corrida."""
+    if not watermark or not watermark.get("created_at"):
+        return []
+    since = watermark["created_at"] - SETTLE
+    return [{"created_at": created_at, "_id": order_id}
+            for created_at, order_id in orders if created_at and created_at >= since]
+
+
+def write_neighbors(db, docs):
+    requests = [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs]
+    for start in range(0, len(requests), WRITE_BATCH_SIZE):
+        db[NEIGHBORS_COLLECTION].bulk_write(requests[start:start + WRITE_BATCH_SIZE], ordered=False)
+
+
+def build(db, candidates=NEIGHBOR_CANDIDATES):
+    """Reconstruye la tabla completa y devuelve cuántos productos tienen vecinos."""
+    try:
+        import numpy as np
+        from scipy import sparse
+    except ImportError:
+        raise RuntimeError("Para construir las recomendaciones hay que instalar 'numpy' y 'scipy'")
+
+    product_index = {}
+    rows, cols = [], []
+    watermark = None
+    order_count = 0
+    # Las órdenes de la cola que refresh volvería a mirar, ya contadas acá.
+    tail = deque()
+    cursor = db['orders'].find({}, ORDER_FIELDS).sort([("created_at", 1), ("_id", 1)])
+    for order in cursor.batch_size(5000):
+        products = order_products(order)
+        if len(products) > 1:
+            for product_id in products:
+                rows.append(order_count)
+                cols.append(product_index.setdefault(product_id, len(product_index)))
+            order_count += 1
+        watermark = {"created_at": order.get("created_at"), "_id": order["_id"]}
+        if watermark["created_at"]:
+            tail.append((watermark["created_at"], order["_id"]))
+            while tail[0][0] < watermark["created_at"] - SETTLE:
+                tail.popleft()
+
+    product_ids = [None] * len(product_index)
+    for product_id, column in product_index.items():
+        product_ids[column] = product_id
+
+    built_at = datetime.utcnow()
+    docs = []
+    if order_count:
+        # Matriz binaria orden x producto; XᵀX da co-compras fuera de la
+        # diagonal y órdenes por producto en la diagonal.
+        matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (np.array(rows), np.array(cols))),
+            shape=(order_count, len(product_ids))
+        )
+        co = (matrix.T @ matrix).tocsr()
+        counts = co.diagonal()
+        co.setdiag(0)
+        co.eliminate_zeros()
+
+        for row in range(co.shape[0]):
+            start, end = co.indptr[row], co.indptr[row + 1]
+            if start == end:
+                continue
+            neighbors_idx = co.indices[start:end]
+            co_counts = co.data[start:end]
+            scores = co_counts / np.sqrt(counts[row] * counts[neighbors_idx])
+            if len(scores) > candidates:
+                best = np.argpartition(-scores, candidates)[:candidates]
+            else:
+                best = np.arange(len(scores))
+            best = best[np.lexsort((neighbors_idx[best], -scores[best]))]
+            docs.append({
+                "_id": product_ids[row],
+                "n": int(counts[row]),
+                "neighbors": [{
+                    "p": product_ids[neighbors_idx[i]],
+                    "c": int(co_counts[i]),
+                    "s": round(float(scores[i]), 6),
+                } for i in best],
+                "updated_at": built_at,
+            })
+
+    write_neighbors(db, docs)
+    db[NEIGHBORS_COLLECTION].delete_many({"updated_at": {"$lt": built_at}})
+    save_state(db, watermark, recent_orders(tail, watermark), built_at=built_at, orders=order_count)
+    return len(docs)
+
+
+def refresh(db, candidates=NEIGHBOR_CANDIDATES, limit=None):
+    """Incorpora las órdenes nuevas desde la última corrida; devuelve cuántas procesó."""
+    state = get_state(db)
+    watermark = state.get("watermark")
+    counted = {order["_id"]: order["created_at"] for order in state.get("recent", [])}
+    if watermark and "recent" not in state:
+        # Estado de antes de la ventana: no se sabe qué hay detrás de la
+        # marca, así que se sigue estrictamente después de ella.
+        counted = {order["_id"]: order["created_at"] for order in db['orders'].find(
+            {**settle_window(watermark), "$or": [
+                {"created_at": {"$lt": watermark["created_at"]}},
+                {"created_at": watermark["created_at"], "_id": {"$lte": watermark["_id"]}},
+            ]}, {"created_at": 1}
+        )}
+    cursor = db['orders'].find(settle_window(watermark), ORDER_FIELDS).sort([("created_at", 1), ("_id", 1)])
+
+    n_delta = defaultdict(int)
+    pair_delta = defaultdict(lambda: defaultdict(int))
+    processed = 0
+    for order in cursor:
+        if order["_id"] in counted:
+            continue
+        if limit and processed >= limit:
+            break
+        products = order_products(order)
+        if len(products) > 1:
+            for product_id in products:
+                n_delta[product_id] += 1
+                for other in products:
+                    if other != product_id:
+                        pair_delta[product_id][other] += 1
+        counted[order["_id"]] = order.get("created_at")
+        # La marca sólo avanza: una orden que llega tarde queda detrás.
+        key = (order.get("created_at") or datetime.min, order["_id"])
+        if not watermark or key > (watermark["created_at"] or datetime.min, watermark["_id"]):
+            watermark = {"created_at": order.get("created_at"), "_id": order["_id"]}
+        processed += 1
+    if not processed:
+        return 0
+
+    touched = set(n_delta)
+    existing = {doc["_id"]: doc for doc in db[NEIGHBORS_COLLECTION].find({"_id": {"$in": list(touched)}})}
+
+    co_counts = {}
+    for product_id in touched:
+        doc = existing.get(product_id) or {}
+        merged = {neighbor["p"]: neighbor["c"] for neighbor in doc.get("neighbors", [])}
+        for other, delta in pair_delta[product_id].items():
+            merged[other] = merged.get(other, 0) + delta
+        co_counts[product_id] = merged
+
+    # n de cada vecino (tocado o no) para recalcular los scores.
+    n = {product_id: doc.get("n", 0) for product_id, doc in existing.items()}
+    for product_id, delta in n_delta.items():
+        n[product_id] = n.get(product_id, 0) + delta
+    missing = {other for merged in co_counts.values() for other in merged} - set(n)
+    if missing:
+        for doc in db[NEIGHBORS_COLLECTION].find({"_id": {"$in": list(missing)}}, {"n": 1}):
+            n[doc["_id"]] = doc.get("n", 0)
+    for other in missing:
+        # La tabla es simétrica; sólo falta una fila si se borró a mano.
+        n.setdefault(other, 1)
+
+    now = datetime.utcnow()
+    docs = [{
+        "_id": product_id,
+        "n": n[product_id],
+        "neighbors": top_neighbors(
+            [{"p": other, "c": count, "s": cosine(count, n[product_id], n[other])}
+             for other, count in merged.items()],
+            candidates
+        ),
+        "updated_at": now,
+    } for product_id, merged in co_counts.items()]
+
+    write_neighbors(db, docs)
+    recent = recent_orders(((created_at, order_id) for order_id, created_at in counted.items()), watermark)
+    save_state(db, watermark, recent)
+    return processed
+
+
+def recommend(db, purchased_ids, limit=5):
+    """Ids de productos recomendados a partir de lo que el usuario ya compró."""
+    purchased = {str(product_id) for product_id in purchased_ids}
+    if not purchased:
+        return []
+    sources = sorted(purchased)[:MAX_SOURCE_PRODUCTS]
+
+    scores = defaultdict(float)
+    for doc in db[NEIGHBORS_COLLECTION].find({"_id": {"$in": sources}}, {"neighbors": 1}):
+        for neighbor in doc.get("neighbors", []):
+            if neighbor["p"] not in purchased:
+                scores[neighbor["p"]] += neighbor["s"]
+    return [product_id for product_id, _ in heapq.nlargest(limit, scores.items(), key=lambda kv: (kv[1], kv[0]))]
+
+
+if __name__ == "__main__":
+    from database import dbConnect
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "refresh"
+    database = dbConnect()
+    if command == "build":
+        print(f"Productos con vecinos: {build(database)}")
+    elif command == "refresh":
+        print(f"Órdenes procesadas: {refresh(database)}")
+    else:
+        print(__doc__)
+        sys.exit(1)
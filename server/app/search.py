@@ -0,0 +1,176 @@
+import re
+import unicodedata
+from pymongo import UpdateOne
+
+# Índice invertido guardado en el propio producto: `search_index` es una lista
+# de {t: token, w: peso} con un índice multikey sobre `search_index.t`. Así la
+# búsqueda usa el índice (igualdad o prefijo anclado) en lugar de recorrer la
+# colección con un $regex sin anclar. Los productos anteriores al índice se
+# completan con reindex_products, que corre como migración de datos
+# (indexes.py, versión 9).
+
+SEARCH_FIELD_WEIGHTS = {
+    "title": 5,
+    "brand": 3,
+    "category": 3,
+    "subcategories": 2,
+    "tags": 2,
+    "description": 1,
+}
+SEARCH_INDEX_FIELD = "search_index"
+MIN_TOKEN_LENGTH = 2
+MAX_QUERY_TOKENS = 8
+DEFAULT_LIMIT = 10
+
+STOPWORDS = {
+    "de", "la", "el", "los", "las", "y", "o", "en", "con", "para", "por",
+    "un", "una", "unos", "unas", "del", "al", "a", "su", "sus", "que",
+}
+
+_token_re = re.compile(r"[a-z0-9]+")
+
+
+def fold(text):
+    """Minúsculas y sin acentos: 'Camión Niño' -> 'camion nino'."""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text):
+    return [
+        token for token in _token_re.findall(fold(text))
+        if len(token) >= MIN_TOKEN_LENGTH and token not in STOPWORDS
+    ]
+
+
+def build_search_index(product):
+    weights = {}
+    for field, weight in SEARCH_FIELD_WEIGHTS.items():
+        value = product.get(field)
+        if not value:
+            continue
+        if isinstance(value, (list, tuple)):
+            value = " ".join(str(v) for v in value)
+        for token in tokenize(value):
+            weights[token] = max(weights.get(token, 0), weight)
+    return [{"t": token, "w": weight} for token, weight in weights.items()]
+
+
+def parse_query(query):
+    """Separa la consulta en términos completos y un prefijo (typeahead).
+
+    La última palabra se toma como prefijo salvo que la consulta termine en
+    espacio, que indica que el usuario ya la completó.
+    """
+    tokens = tokenize(query)[:MAX_QUERY_TOKENS]
+    if not tokens:
+        return [], None
+    if query[-1:].isspace():
+        return tokens, None
+    return tokens[:-1], tokens[-1]
+
+
+def search_pipeline(query, base_filter=None, limit=DEFAULT_LIMIT):
+    terms, prefix = parse_query(query)
+    if not terms and not prefix:
+        return None
+
+    conditions = [base_filter or {}]
+    if terms:
+        conditions.append({f"{SEARCH_INDEX_FIELD}.t": {"$all": terms}})
+    if prefix:
+        # Prefijo anclado y escapado: usa los límites del índice.
+        conditions.append({f"{SEARCH_INDEX_FIELD}.t": {"$regex": "^" + re.escape(prefix)}})
+
+    matches = [{"$in": ["$$entry.t", terms]}]
+    if prefix:
+        matches.append({"$eq": [{"$indexOfCP": ["$$entry.t", prefix]}, 0]})
+
+    return [
+        {"$match": {"$and": conditions}},
+        {"$addFields": {"_score": {"$sum": {"$map": {
+            "input": {"$filter": {
+                "input": f"${SEARCH_INDEX_FIELD}",
+                "as": "entry",
+                "cond": {"$or": matches},
+            }},
+            "as": "entry",
+            "in": "$$entry.w",
+        }}}}},
+        {"$sort": {"_score": -1, "rating": -1, "_id": 1}},
+        {"$limit": limit},
+        {"$project": {SEARCH_INDEX_FIELD: 0, "_score": 0}},
+    ]
+
+
+def search_products(db, query, base_filter=None, limit=DEFAULT_LIMIT):
+    pipeline = search_pipeline(query, base_filter, limit)
+    if pipeline is None:
+        return []
+    products = list(db['products'].aggregate(pipeline))
+    for product in products:
+        product["_id"] = str(product["_id"])
+    return products
+
+
+def touches_search_fields(update_data):
+    return any(field in update_data for field in SEARCH_FIELD_WEIGHTS)
+
+
+def refresh_product(db, product_id):
+    """Recalcula el índice de un producto después de editar sus textos."""
+    projection = {field: 1 for field in SEARCH_FIELD_WEIGHTS}
+    product = db['products'].find_one({"_id": product_id}, projection)
+    if product:
+        db['products'].update_one(
+            {"_id": product_id},
+            {"$set": {SEARCH_INDEX_FIELD: build_search_index(product)}}
+        )
+
+
+def sync_search_index(db, products):
+    """Recalcula search_index para {product_id: producto} y escribe sólo los que difieren.
+
+    La escritura se condiciona a updated_at: si el producto volvió a cambiar,
+    el evento siguiente trae la versión nueva.
+    """
+    writes = []
+    for product_id, product in products.items():
+        if product is None:
+            continue
+        index = build_search_index(product)
+        if product.get(SEARCH_INDEX_FIELD) != index:
+            writes.append(UpdateOne(
+                {"_id": product_id, "updated_at": product.get("updated_at")},
+                {"$set": {SEARCH_INDEX_FIELD: index}}
+            ))
+    if writes:
+        db['products'].bulk_write(writes, ordered=False)
+    return len(writes)
+
+
+def reindex_products(db, batch_size=1000):
+    """Reconstruye `search_index` para todo el catálogo, en lotes."""
+    projection = {field: 1 for field in SEARCH_FIELD_WEIGHTS}
+    batch = []
+    updated = 0
+    for product in db['products'].find({}, projection).batch_size(batch_size):
+        batch.append(UpdateOne(
+            {"_id": product["_id"]},
+            {"$set": {SEARCH_INDEX_FIELD: build_search_index(product)}}
+        ))
+        if len(batch) >= batch_size:
+            updated += db['products'].bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += db['products'].bulk_write(batch, ordered=False).modified_count
+    return updated
+
+
+if __name__ == '__main__':
+    from database import dbConnect
+    import indexes
+
+    database = dbConnect()
+    indexes.migrate(database)
+    print(f"Productos reindexados: {reindex_products(database)}")
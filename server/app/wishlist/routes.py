@@ -2,14 +2,19 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson import ObjectId
 from models import User
-from database import dbConnect
+from database import LazyDatabase
+from catalog import hydrate_products, unavailable_header
 
-db = dbConnect()
+db = LazyDatabase()
 wishlist = Blueprint('wishlist', __name__, url_prefix='/wishlist')
 
 
+# Sólo lo que estas rutas usan: nada de datos de compra ni password_hash.
+CURRENT_USER_FIELDS = {"username": 1, "email": 1, "role": 1, "wishlist": 1}
+
+
 def get_current_user():
-    user_data = db['users'].find_one({"_id": ObjectId(get_jwt_identity())})
+    user_data = db['users'].find_one({"_id": ObjectId(get_jwt_identity())}, CURRENT_USER_FIELDS)
     return User(user_data) if user_data else None
 
 
@@ -20,14 +25,12 @@ def get_wishlist():
     if not user:
         return jsonify({"error": "Usuario no encontrado"}), 404
     
-    wishlist_products = []
-    for product_id in user.wishlist:
-        product = db['products'].find_one({"_id": ObjectId(product_id)})
-        if product:
-            product["_id"] = str(product["_id"])
-            wishlist_products.append(product)
-    
-    return jsonify(wishlist_products), 200
+    wishlist_products, unavailable = hydrate_products(db, user.wishlist)
+
+    response = jsonify(wishlist_products)
+    if unavailable:
+        response.headers["X-Unavailable-Products"] = unavailable_header(unavailable)
+    return response, 200
 
 
 @wishlist.route('/add', methods=['POST'])
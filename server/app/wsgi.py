@@ -0,0 +1,9 @@
+"""Punto de entrada WSGI para producción.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+(desde server/; la configuración hace chdir a app/).
+"""
+from app import create_app
+
+app = create_app()
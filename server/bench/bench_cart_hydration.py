@@ -0,0 +1,113 @@
+"""Compara la hidratación del carrito producto por producto contra el $in en lote.
+
+Uso (desde server/, con un mongod local):
+
+    python bench/bench_cart_hydration.py --sizes 1 10 40 100 200 --runs 50
+
+Escribe en la base MONGO_BENCH_DB (por defecto tiendaGenerica_bench) y
+reporta round-trips y p95 por tamaño de carrito en JSON.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from bson import ObjectId
+from pymongo import MongoClient, monitoring
+
+from catalog import CART_PRODUCT_FIELDS, fetch_products_by_ids
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def hydrate_one_by_one(db, cart):
+    items = []
+    for item in cart:
+        product = db['products'].find_one({"_id": ObjectId(item["product_id"])})
+        if product:
+            product["_id"] = str(product["_id"])
+            items.append({"product": product, "quantity": item["quantity"]})
+    return items
+
+
+def hydrate_batched(db, cart):
+    products = fetch_products_by_ids(db, [item["product_id"] for item in cart], CART_PRODUCT_FIELDS)
+    return [
+        {"product": products[str(item["product_id"])], "quantity": item["quantity"]}
+        for item in cart if str(item["product_id"]) in products
+    ]
+
+
+def measure(db, counter, fn, cart, runs):
+    timings = []
+    counter.count = 0
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn(db, cart)
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "round_trips": counter.count / runs,
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 40, 100, 200])
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    counter = CommandCounter()
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"), event_listeners=[counter])
+    db = client[os.getenv("MONGO_BENCH_DB", "tiendaGenerica_bench")]
+    db['products'].drop()
+
+    max_size = max(args.sizes)
+    product_ids = db['products'].insert_many([{
+        "title": f"Producto {i}",
+        "description": "x" * 500,
+        "price": 10.0 + i,
+        "category": "Bench",
+        "image_urls": [f"https://img.example/{i}.jpg"] * 4,
+        "main_image": f"https://img.example/{i}.jpg",
+        "stock": 100,
+        "is_active": True,
+    } for i in range(max_size)]).inserted_ids
+
+    results = []
+    for size in args.sizes:
+        cart = [{"product_id": str(pid), "quantity": 1} for pid in product_ids[:size]]
+        results.append({
+            "cart_size": size,
+            "one_by_one": measure(db, counter, hydrate_one_by_one, cart, args.runs),
+            "batched": measure(db, counter, hydrate_batched, cart, args.runs),
+        })
+
+    db['products'].drop()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Latencia de una página de categoría: facetas precalculadas vs $regex.
+
+Uso (desde server/, con un mongod local):
+
+    python bench/bench_category_browse.py --products 500000 --runs 200
+
+Siembra el catálogo con bench/seed.py (incluye category_key, price_bucket y
+category_facets), aplica las migraciones de índices y mide:
+
+  legacy   el find con $regex anclado case-insensitive sobre `category`
+           (límite fijo de 50), como antes
+  facets   página por category_key (con y sin filtro de marca / precio) más
+           la lectura de las facetas de la categoría
+
+Reporta p50/p95 por estrategia y documentos examinados (explain) en JSON.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from pymongo import MongoClient
+
+import catalog
+import facets
+import indexes
+from loadgen import percentile
+from seed import BRANDS, CATEGORIES, seed
+
+
+def legacy_page(db, category):
+    return list(db['products'].find({
+        "category": {"$regex": f"^{category}$", "$options": "i"},
+        "is_active": True
+    }, catalog.DEFAULT_PRODUCT_PROJECTION).limit(50))
+
+
+def facet_page(db, key, args):
+    products, next_cursor = catalog.fetch_page(db, facets.browse_query(key, args), "_id", None, 50)
+    return products, facets.category_facets(db, key)
+
+
+def examined(db, query):
+    stats = db['products'].find(query).sort("_id", 1).limit(50).explain()["executionStats"]
+    return stats["totalDocsExamined"]
+
+
+def measure(fn, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {"p50_ms": round(percentile(timings, 50), 3), "p95_ms": round(percentile(timings, 95), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=500000)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+    db = client[os.getenv("MONGO_BENCH_DB", "tiendaGenerica_bench")]
+    rnd = random.Random(args.seed)
+
+    started = time.perf_counter()
+    seed(db, users=1, products=args.products, orders=0, cart_size=0, seed_value=args.seed)
+    indexes.migrate(db)
+    seed_seconds = time.perf_counter() - started
+
+    scenarios = {
+        "legacy": lambda: legacy_page(db, rnd.choice(CATEGORIES)),
+        "facets": lambda: facet_page(db, facets.category_slug(rnd.choice(CATEGORIES)), {}),
+        "facets_brand": lambda: facet_page(
+            db, facets.category_slug(rnd.choice(CATEGORIES)), {"brand": rnd.choice(BRANDS)}
+        ),
+        "facets_price": lambda: facet_page(
+            db, facets.category_slug(rnd.choice(CATEGORIES)), {"price": rnd.choice(facets.price_bucket_labels())}
+        ),
+    }
+    results = {name: measure(fn, args.runs) for name, fn in scenarios.items()}
+
+    key = facets.category_slug(CATEGORIES[0])
+    results["legacy"]["docs_examined"] = examined(
+        db, {"category": {"$regex": f"^{CATEGORIES[0]}$", "$options": "i"}, "is_active": True}
+    )
+    results["facets"]["docs_examined"] = examined(db, facets.browse_query(key, {}))
+    results["facets_brand"]["docs_examined"] = examined(db, facets.browse_query(key, {"brand": BRANDS[0]}))
+
+    print(json.dumps({
+        "products": args.products,
+        "seed_seconds": round(seed_seconds, 2),
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Checkouts por segundo con contención sobre un SKU caliente.
+
+Uso (desde server/, con un mongod local; para medir el camino transaccional
+levantarlo como replica set de un nodo):
+
+    python bench/bench_checkout_contention.py --threads 16 --checkouts 100 --stock 500
+
+Todos los hilos compran el mismo producto. Se reporta el throughput, cuántas
+órdenes se rechazaron por falta de stock y se verifica que no haya sobreventa.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from pymongo import MongoClient
+
+from orders.checkout import CheckoutError, place_order, supports_transactions
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--checkouts", type=int, default=100, help="checkouts por hilo")
+    parser.add_argument("--stock", type=int, default=500)
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+    db = client[os.getenv("MONGO_BENCH_DB", "tiendaGenerica_bench")]
+    for name in ("products", "orders", "users", "jobs"):
+        db[name].drop()
+        db.create_collection(name)
+    # El checkout encola los trabajos post-orden por key (upsert).
+    db['jobs'].create_index("key", name="key_unique", unique=True)
+
+    product_id = db['products'].insert_one({
+        "title": "SKU caliente", "price": 1000.0, "stock": args.stock, "is_active": True, "sku": "HOT-1"
+    }).inserted_id
+    user_ids = db['users'].insert_many([
+        {"username": f"u{i}", "email": f"u{i}@bench", "cart": []} for i in range(args.threads)
+    ]).inserted_ids
+
+    counters = {"ok": 0, "out_of_stock": 0}
+    lock = threading.Lock()
+    timings = []
+    start = threading.Barrier(args.threads)
+
+    def worker(user_id):
+        start.wait()
+        for _ in range(args.checkouts):
+            started = time.perf_counter()
+            try:
+                place_order(db, str(user_id), {"items": [{"product_id": str(product_id), "quantity": 1}]})
+                outcome = "ok"
+            except CheckoutError:
+                outcome = "out_of_stock"
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                counters[outcome] += 1
+                timings.append(elapsed)
+
+    threads = [threading.Thread(target=worker, args=(uid,)) for uid in user_ids]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    final_stock = db['products'].find_one({"_id": product_id})["stock"]
+    orders = db['orders'].count_documents({})
+    result = {
+        "transactions": supports_transactions(db),
+        "threads": args.threads,
+        "attempts": args.threads * args.checkouts,
+        "orders": counters["ok"],
+        "rejected_out_of_stock": counters["out_of_stock"],
+        "checkouts_per_sec": round((counters["ok"] + counters["out_of_stock"]) / elapsed, 1),
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "final_stock": final_stock,
+        "oversold": final_stock < 0 or orders != args.stock - final_stock,
+    }
+    print(json.dumps(result, indent=2))
+    if result["oversold"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
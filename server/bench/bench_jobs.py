@@ -0,0 +1,115 @@
+"""Throughput de la cola de trabajos (jobs/seg) con N procesos worker.
+
+Uso (desde server/, con un mongod local):
+
+    python bench/bench_jobs.py --jobs 20000 --workers 1,2,4,8 --work-ms 0
+
+Para cada N encola --jobs trabajos, levanta N procesos que corren
+jobs.work() hasta vaciar la cola y mide enqueue/seg, jobs/seg y el atraso
+(p50/p95/p99 entre encolado y fin). --work-ms simula el tiempo de un handler
+(p. ej. 20 para un mail por SMTP); con 0 se mide el costo propio de la cola
+(claim + complete). --fail-rate hace fallar una fracción de los intentos
+(de la mitad de los trabajos) para incluir reintentos con backoff. Reporta
+en JSON.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from pymongo import MongoClient
+
+import jobs
+from loadgen import percentile
+
+JOB_TYPE = "bench.work"
+
+
+def connect():
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+    return client[os.getenv("MONGO_BENCH_DB", "tiendaGenerica_bench")]
+
+
+def bench_handler(work_ms, fail_rate):
+    def handler(db, payload):
+        if work_ms:
+            time.sleep(work_ms / 1000)
+        if fail_rate and random.random() < fail_rate and payload["n"] % 2 == 0:
+            raise RuntimeError("falla simulada")
+    return handler
+
+
+def worker(work_ms, fail_rate, stop):
+    # Reintentos rápidos para que el bench no espere el backoff de producción.
+    jobs.BACKOFF_BASE = 0.05
+    # Cliente propio por proceso: un MongoClient no sobrevive a fork().
+    db = connect()
+    jobs.work(db, {JOB_TYPE: bench_handler(work_ms, fail_rate)}, should_stop=stop.is_set)
+
+
+def run(db, workers, count, work_ms, fail_rate):
+    db[jobs.JOBS_COLLECTION].delete_many({})
+    started = time.perf_counter()
+    for n in range(count):
+        jobs.enqueue(db, JOB_TYPE, {"n": n}, key=f"{JOB_TYPE}:{workers}:{n}")
+    enqueue_seconds = time.perf_counter() - started
+
+    stop = multiprocessing.Event()
+    processes = [multiprocessing.Process(target=worker, args=(work_ms, fail_rate, stop)) for _ in range(workers)]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    pending = {"status": {"$in": ["queued", "running"]}}
+    while db[jobs.JOBS_COLLECTION].count_documents(pending):
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for process in processes:
+        process.join()
+
+    latencies = [
+        (job["finished_at"] - job["created_at"]).total_seconds() * 1000
+        for job in db[jobs.JOBS_COLLECTION].find({"status": "done"}, {"created_at": 1, "finished_at": 1})
+    ]
+    return {
+        "workers": workers,
+        "jobs": count,
+        "enqueue_per_sec": round(count / enqueue_seconds, 1),
+        "jobs_per_sec": round(count / elapsed, 1),
+        "done": len(latencies),
+        "failed": db[jobs.JOBS_COLLECTION].count_documents({"status": "failed"}),
+        "retried": db[jobs.JOBS_COLLECTION].count_documents({"attempts": {"$gt": 1}}),
+        "latency_p50_ms": round(percentile(latencies, 50), 1) if latencies else None,
+        "latency_p95_ms": round(percentile(latencies, 95), 1) if latencies else None,
+        "latency_p99_ms": round(percentile(latencies, 99), 1) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=20000)
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--work-ms", type=float, default=0)
+    parser.add_argument("--fail-rate", type=float, default=0)
+    args = parser.parse_args()
+
+    db = connect()
+    db[jobs.JOBS_COLLECTION].drop()
+    db[jobs.JOBS_COLLECTION].create_index("key", name="key_unique", unique=True)
+    db[jobs.JOBS_COLLECTION].create_index([("status", 1), ("run_at", 1)], name="status_run_at")
+
+    results = [
+        run(db, int(workers), args.jobs, args.work_ms, args.fail_rate)
+        for workers in args.workers.split(",")
+    ]
+    print(json.dumps({"work_ms": args.work_ms, "fail_rate": args.fail_rate, "runs": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Throughput de serialización: json_util + convert_objectid contra MongoJSONProvider.
+
+Uso (desde server/):
+
+    python bench/bench_json_encoding.py --docs 1000 --rounds 20
+
+No necesita Mongo: arma documentos de producto y orden con la forma real
+(ObjectId, datetime, Decimal128, listas anidadas) y reporta docs/s y MB/s
+para cada estrategia en JSON.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from bson import Decimal128, ObjectId, json_util
+from flask import Flask
+
+import json_provider
+from json_provider import MongoJSONProvider
+
+
+def convert_objectid(obj):
+    if isinstance(obj, list):
+        return [convert_objectid(item) for item in obj]
+    elif isinstance(obj, dict):
+        return {k: convert_objectid(v) for k, v in obj.items()}
+    elif isinstance(obj, ObjectId):
+        return str(obj)
+    else:
+        return obj
+
+
+def product(i):
+    now = datetime.utcnow()
+    return {
+        "_id": ObjectId(),
+        "title": f"Zapatilla running {i}",
+        "description": "Capellada de malla, suela de goma. " * 8,
+        "price": 45999.99,
+        "original_price": Decimal128("52999.99"),
+        "category": "Deportes",
+        "subcategories": ["Calzado", "Running"],
+        "image_urls": [f"https://img.example/{i}/{n}.jpg" for n in range(4)],
+        "main_image": f"https://img.example/{i}/0.jpg",
+        "stock": 12,
+        "sku": f"ZAP-{i:06d}",
+        "brand": "Genérica",
+        "attributes": {"variants": [{"talle": t, "stock": 3} for t in (39, 40, 41, 42)]},
+        "rating": 4.5,
+        "review_count": 87,
+        "tags": ["oferta", "nuevo"],
+        "is_featured": False,
+        "is_active": True,
+        "created_at": now - timedelta(days=30),
+        "updated_at": now,
+    }
+
+
+def order(i):
+    return {
+        "_id": ObjectId(),
+        "user_id": ObjectId(),
+        "items": [{"product_id": ObjectId(), "quantity": 2, "price": 1999.5, "name": f"Item {n}"}
+                  for n in range(5)],
+        "shipping_address": {"street": "Av. Siempre Viva 742", "city": "CABA", "zip": "1000"},
+        "payment_method": "credit_card",
+        "subtotal": 19995.0,
+        "total": Decimal128("20795.00"),
+        "status": "pending",
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow(),
+    }
+
+
+def legacy(provider, docs):
+    return provider.dumps(json.loads(json_util.dumps(convert_objectid(docs))))
+
+
+def measure(fn, docs, rounds):
+    size = len(fn(docs))
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn(docs)
+    elapsed = time.perf_counter() - started
+    return {
+        "docs_per_sec": round(len(docs) * rounds / elapsed),
+        "mb_per_sec": round(size * rounds / elapsed / 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    provider = MongoJSONProvider(app)
+    orjson = json_provider.orjson
+
+    results = {"orjson_available": orjson is not None}
+    for name, factory in (("products", product), ("orders", order)):
+        docs = [factory(i) for i in range(args.docs)]
+        row = {"json_util_roundtrip": measure(lambda d: legacy(provider, d), docs, args.rounds)}
+        json_provider.orjson = None
+        row["provider_stdlib"] = measure(provider.dumps, docs, args.rounds)
+        json_provider.orjson = orjson
+        if orjson is not None:
+            row["provider_orjson"] = measure(provider.dumps, docs, args.rounds)
+        results[name] = row
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
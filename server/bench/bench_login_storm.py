@@ -0,0 +1,78 @@
+"""Latencia del catálogo durante una ráfaga de logins.
+
+Uso (desde server/):
+
+    python bench/bench_login_storm.py --hash-workers 0     # hash inline
+    python bench/bench_login_storm.py --hash-workers 4     # pool de procesos
+
+Mide primero GET /products?limit=50 solo y después lo mismo en paralelo con
+--login-concurrency clientes haciendo POST /auth/login sin pausa. Reporta en
+JSON el throughput de login y cuánto empeora el p95/p99 del catálogo; los 503
+por pool saturado cuentan como errores del login.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=("mongomock", "mongod"), default="mongomock")
+    parser.add_argument("--hash-workers", type=int, default=2)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--catalog-concurrency", type=int, default=4)
+    parser.add_argument("--login-concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # Se lee al importar passwords (vía la app), así que va antes.
+    os.environ["PASSWORD_HASH_WORKERS"] = str(args.hash_workers)
+
+    from loadgen import run_load
+    from seed import seed
+    from suite import build_scenarios, connect
+
+    data = seed(connect(args.backend), args.users, args.products, 0, 5, args.seed)
+
+    from app import create_app
+    import passwords
+
+    app = create_app({
+        "TESTING": True,
+        "MONGO_AUTO_INDEX": args.backend == "mongod",
+        # Los escenarios repiten logins con pocas cuentas; sin esto medirían 429.
+        "RATELIMIT_ENABLED": False,
+    })
+    scenarios = build_scenarios(app, data, args.seed)
+
+    catalog_alone = run_load(scenarios["products"], args.catalog_concurrency, args.duration)
+
+    storm = {}
+    login_thread = threading.Thread(target=lambda: storm.update(
+        login=run_load(scenarios["login"], args.login_concurrency, args.duration)
+    ))
+    login_thread.start()
+    catalog_during = run_load(scenarios["products"], args.catalog_concurrency, args.duration)
+    login_thread.join()
+
+    report = {
+        "config": vars(args),
+        "catalog_alone": catalog_alone,
+        "catalog_during_storm": catalog_during,
+        "login_storm": storm["login"],
+        "catalog_p95_slowdown": round(catalog_during["p95_ms"] / catalog_alone["p95_ms"], 2)
+        if catalog_alone["p95_ms"] else None,
+        "hashing": passwords.stats(),
+    }
+    passwords.shutdown()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Tiempo de build/refresh del recomendador y latencia por request.
+
+Uso (desde server/, con un mongod local y numpy + scipy instalados):
+
+    python bench/bench_recommendations.py --orders 1000000 --products 50000
+
+Siembra órdenes sintéticas en MONGO_BENCH_DB con popularidad sesgada (unos
+pocos productos concentran las compras, como en un catálogo real), mide el
+build completo, un refresh incremental con --new-orders órdenes nuevas y
+p50/p95/p99 de recommend() para usuarios con 5 a 50 productos comprados.
+Reporta en JSON.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from bson import ObjectId
+from pymongo import MongoClient
+
+import indexes
+import recommendations
+from loadgen import percentile
+
+
+def make_orders(rnd, product_ids, count, start):
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(product_ids))))
+    for i in range(count):
+        items = set(rnd.choices(product_ids, cum_weights=cum_weights, k=rnd.randint(1, 6)))
+        yield {
+            "user_id": ObjectId(),
+            "items": [{"product_id": pid, "quantity": 1, "price": 1000.0} for pid in items],
+            "total": 1000.0 * len(items),
+            "status": "paid",
+            "created_at": start + timedelta(seconds=i),
+        }
+
+
+def insert_orders(collection, orders, batch=10000):
+    buffer = []
+    for order in orders:
+        buffer.append(order)
+        if len(buffer) >= batch:
+            collection.insert_many(buffer, ordered=False)
+            buffer = []
+    if buffer:
+        collection.insert_many(buffer, ordered=False)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=1000000)
+    parser.add_argument("--new-orders", type=int, default=10000)
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+    db = client[os.getenv("MONGO_BENCH_DB", "tiendaGenerica_bench")]
+    rnd = random.Random(args.seed)
+
+    for name in ("orders", recommendations.NEIGHBORS_COLLECTION):
+        db[name].drop()
+    db['counters'].delete_one({"_id": recommendations.STATE_ID})
+    indexes.migrate(db)
+
+    product_ids = [ObjectId() for _ in range(args.products)]
+    start = datetime.utcnow() - timedelta(days=365)
+    started = time.perf_counter()
+    insert_orders(db['orders'], make_orders(rnd, product_ids, args.orders, start))
+    seed_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with_neighbors = recommendations.build(db)
+    build_seconds = time.perf_counter() - started
+
+    later = start + timedelta(seconds=args.orders + 1)
+    insert_orders(db['orders'], make_orders(rnd, product_ids, args.new_orders, later))
+    started = time.perf_counter()
+    refreshed = recommendations.refresh(db)
+    refresh_seconds = time.perf_counter() - started
+
+    timings = []
+    for _ in range(args.requests):
+        purchased = [str(pid) for pid in rnd.sample(product_ids[:args.products // 4], rnd.randint(5, 50))]
+        started = time.perf_counter()
+        recommendations.recommend(db, purchased, limit=10)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    print(json.dumps({
+        "orders": args.orders,
+        "products": args.products,
+        "seed_seconds": round(seed_seconds, 2),
+        "build_seconds": round(build_seconds, 2),
+        "products_with_neighbors": with_neighbors,
+        "refresh_orders": refreshed,
+        "refresh_seconds": round(refresh_seconds, 3),
+        "recommend_p50_ms": round(percentile(timings, 50), 3),
+        "recommend_p95_ms": round(percentile(timings, 95), 3),
+        "recommend_p99_ms": round(percentile(timings, 99), 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
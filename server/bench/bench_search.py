@@ -0,0 +1,117 @@
+"""Compara /products/search con $regex sin anclar contra el índice de tokens.
+
+Uso (desde server/, con un mongod local):
+
+    python bench/bench_search.py --sizes 10000 100000 1000000 --runs 30
+
+Siembra un catálogo sintético en MONGO_BENCH_DB, mide ambas estrategias con
+las mismas consultas de typeahead y reporta p50/p95 y documentos examinados
+(explain) en JSON.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from pymongo import MongoClient
+
+import search
+
+WORDS = [
+    "camisa", "pantalón", "zapatilla", "campera", "remera", "mochila", "reloj",
+    "auricular", "teclado", "monitor", "lámpara", "sillón", "mesa", "cuchillo",
+    "cafetera", "licuadora", "niño", "algodón", "cuero", "acero", "inalámbrico",
+]
+CATEGORIES = ["Ropa", "Electrónica", "Hogar", "Cocina", "Deportes"]
+QUERIES = ["cam", "zapat", "camisa alg", "auricular inal", "lampara", "nino"]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def seed(collection, size, batch=10000):
+    collection.drop()
+    rnd = random.Random(42)
+    for start in range(0, size, batch):
+        docs = []
+        for _ in range(min(batch, size - start)):
+            product = {
+                "title": " ".join(rnd.sample(WORDS, 3)),
+                "description": " ".join(rnd.choices(WORDS, k=20)),
+                "category": rnd.choice(CATEGORIES),
+                "price": rnd.uniform(1, 1000),
+                "is_active": True,
+            }
+            product["search_index"] = search.build_search_index(product)
+            docs.append(product)
+        collection.insert_many(docs, ordered=False)
+    collection.create_index([("search_index.t", 1)], name="search_index_token")
+
+
+def regex_filter(query):
+    regex_query = {'$regex': f'.*{query}.*', '$options': 'i'}
+    return {'$and': [
+        {'is_active': True},
+        {'$or': [{'title': regex_query}, {'description': regex_query}, {'category': regex_query}]},
+    ]}
+
+
+def run_regex(db, query):
+    return list(db['products'].find(regex_filter(query)).limit(10))
+
+
+def run_index(db, query):
+    return search.search_products(db, query, {'is_active': True}, limit=10)
+
+
+def docs_examined(db, query):
+    regex_plan = db.command("explain", {"find": "products", "filter": regex_filter(query), "limit": 10},
+                            verbosity="executionStats")
+    index_plan = db.command("explain", {"aggregate": "products",
+                                        "pipeline": search.search_pipeline(query, {'is_active': True}, 10),
+                                        "cursor": {}}, verbosity="executionStats")
+    index_stats = index_plan.get("executionStats") or index_plan["stages"][0]["$cursor"]["executionStats"]
+    return regex_plan["executionStats"]["totalDocsExamined"], index_stats["totalDocsExamined"]
+
+
+def measure(db, fn, runs):
+    timings = []
+    for _ in range(runs):
+        for query in QUERIES:
+            started = time.perf_counter()
+            fn(db, query)
+            timings.append((time.perf_counter() - started) * 1000)
+    return {"p50_ms": round(percentile(timings, 50), 3), "p95_ms": round(percentile(timings, 95), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--runs", type=int, default=30)
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+    db = client[os.getenv("MONGO_BENCH_DB", "tiendaGenerica_bench")]
+
+    results = []
+    for size in args.sizes:
+        seed(db['products'], size)
+        regex_docs, index_docs = docs_examined(db, QUERIES[0])
+        results.append({
+            "products": size,
+            "regex": dict(measure(db, run_regex, args.runs), docs_examined=regex_docs),
+            "token_index": dict(measure(db, run_index, args.runs), docs_examined=index_docs),
+        })
+
+    db['products'].drop()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
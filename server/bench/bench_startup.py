@@ -0,0 +1,58 @@
+"""Tiempo de arranque en frío y memoria por worker.
+
+Uso (desde server/):
+
+    python bench/bench_startup.py --runs 5
+
+Para cada corrida lanza un intérprete nuevo que importa wsgi.py (lo que hace
+un worker de gunicorn sin preload) y mide el tiempo de import + create_app y
+el RSS máximo del proceso. Con MONGO_AUTO_INDEX=0 (por defecto acá) no se
+toca la base, así se mide sólo el costo de la app.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+
+PROBE = """
+import json, resource, time
+started = time.perf_counter()
+from wsgi import app
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "startup_ms": elapsed * 1000,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "routes": len(list(app.url_map.iter_rules())),
+}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    env = dict(os.environ, MONGO_AUTO_INDEX=os.getenv("MONGO_AUTO_INDEX", "0"))
+    samples = []
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE], cwd=APP_DIR, env=env,
+            capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(json.dumps({
+        "runs": args.runs,
+        "startup_ms_median": round(statistics.median(s["startup_ms"] for s in samples), 1),
+        "startup_ms_max": round(max(s["startup_ms"] for s in samples), 1),
+        "max_rss_mb_median": round(statistics.median(s["max_rss_mb"] for s in samples), 1),
+        "routes": samples[0]["routes"],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
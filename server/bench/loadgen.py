@@ -0,0 +1,69 @@
+"""Generador de carga concurrente mínimo, compartido por los scripts de bench.
+
+`run_load(request_fn, concurrency, duration)` llama a `request_fn()` desde
+`concurrency` hilos durante `duration` segundos. `request_fn` devuelve el
+status HTTP (o levanta una excepción, que cuenta como error).
+"""
+import threading
+import time
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(timings, errors, elapsed):
+    return {
+        "requests": len(timings),
+        "errors": errors,
+        "requests_per_sec": round(len(timings) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "p99_ms": round(percentile(timings, 99), 3),
+    }
+
+
+def run_load(request_fn, concurrency=16, duration=10.0, warmup=1.0):
+    lock = threading.Lock()
+    timings = []
+    errors = [0]
+    start = threading.Barrier(concurrency + 1)
+    state = {"measuring": False, "stop": False}
+
+    def worker():
+        local_timings = []
+        local_errors = 0
+        start.wait()
+        while not state["stop"]:
+            started = time.perf_counter()
+            try:
+                ok = 200 <= request_fn() < 400
+            except Exception:
+                ok = False
+            elapsed = (time.perf_counter() - started) * 1000
+            if state["measuring"]:
+                if ok:
+                    local_timings.append(elapsed)
+                else:
+                    local_errors += 1
+        with lock:
+            timings.extend(local_timings)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    time.sleep(warmup)
+    state["measuring"] = True
+    measured_from = time.perf_counter()
+    time.sleep(duration)
+    state["measuring"] = False
+    elapsed = time.perf_counter() - measured_from
+    state["stop"] = True
+    for thread in threads:
+        thread.join()
+    return summarize(timings, errors[0], elapsed)
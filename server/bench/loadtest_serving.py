@@ -0,0 +1,80 @@
+"""Compara requests/s y p99 entre configuraciones de gunicorn.
+
+Levantar cada configuración contra la misma base, por ejemplo:
+
+    gunicorn -c gunicorn.conf.py -b :5005 wsgi:app
+    GUNICORN_WORKER_CLASS=gevent gunicorn -c gunicorn.conf.py -b :5006 wsgi:app
+
+y después (desde server/):
+
+    python bench/loadtest_serving.py --target gthread=http://localhost:5005 \\
+        --target gevent=http://localhost:5006 --token <JWT> --concurrency 64
+
+Recorre catálogo, búsqueda, carrito y wishlist (estos dos sólo con --token)
+y reporta el resultado de cada endpoint por configuración en JSON.
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from loadgen import run_load
+
+ENDPOINTS = [
+    ("catalog", "/products?limit=50", False),
+    ("search", "/products/search?q=cam", False),
+    ("cart", "/cart/", True),
+    ("wishlist", "/wishlist/", True),
+]
+
+
+def http_getter(base_url, path, token=None):
+    parts = urlsplit(base_url)
+    local = threading.local()
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+
+    def request():
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            conn = local.conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+        try:
+            conn.request("GET", path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        except Exception:
+            conn.close()
+            local.conn = None
+            raise
+
+    return request
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--target", action="append", required=True, help="nombre=url; se repite")
+    parser.add_argument("--token")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=15)
+    args = parser.parse_args()
+    targets = [target.split("=", 1) for target in args.target]
+
+    results = {}
+    for name, path, needs_auth in ENDPOINTS:
+        if needs_auth and not args.token:
+            continue
+        results[name] = {
+            mode: run_load(http_getter(url, path, args.token if needs_auth else None),
+                           args.concurrency, args.duration)
+            for mode, url in targets
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
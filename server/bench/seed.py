@@ -0,0 +1,99 @@
+"""Datos sintéticos reproducibles (usuarios, productos y órdenes) para los benchmarks."""
+import random
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+import facets
+import purchases
+import search
+
+BENCH_PASSWORD = "bench-password"
+WORDS = [
+    "camisa", "pantalón", "zapatilla", "campera", "remera", "mochila", "reloj",
+    "auricular", "teclado", "monitor", "lámpara", "sillón", "mesa", "cuchillo",
+    "cafetera", "licuadora", "niño", "algodón", "cuero", "acero", "inalámbrico",
+]
+CATEGORIES = ["Ropa", "Electrónica", "Hogar", "Cocina", "Deportes"]
+BRANDS = ["Genérica", "Acme", "Patagonia", "Pampa", "Andes"]
+SUBCATEGORIES = ["Ofertas", "Novedades", "Importados", "Nacionales", "Premium", "Básicos"]
+
+
+def insert_batched(collection, docs, batch=5000):
+    ids = []
+    for start in range(0, len(docs), batch):
+        ids += collection.insert_many(docs[start:start + batch], ordered=False).inserted_ids
+    return ids
+
+
+def seed(db, users=100, products=1000, orders=1000, cart_size=10, seed_value=42):
+    rnd = random.Random(seed_value)
+    for name in ("users", "products", "orders", facets.FACETS_COLLECTION, facets.MEMBERS_COLLECTION):
+        db[name].delete_many({})
+
+    now = datetime.utcnow()
+    product_docs = []
+    for i in range(products):
+        product = {
+            "title": " ".join(rnd.sample(WORDS, 3)),
+            "description": " ".join(rnd.choices(WORDS, k=20)),
+            "price": round(rnd.uniform(100, 100000), 2),
+            "category": rnd.choice(CATEGORIES),
+            "subcategories": rnd.sample(SUBCATEGORIES, rnd.randint(0, 2)),
+            "brand": rnd.choice(BRANDS),
+            "image_urls": [f"https://img.example/{i}.jpg"],
+            "main_image": f"https://img.example/{i}.jpg",
+            "stock": 1000000,
+            "sku": f"SKU-{i:07d}",
+            "is_active": rnd.random() > 0.02,
+            "created_at": now - timedelta(minutes=products - i),
+            "updated_at": now,
+        }
+        product["search_index"] = search.build_search_index(product)
+        product.update(facets.facet_fields(product))
+        product_docs.append(product)
+    product_ids = insert_batched(db['products'], product_docs)
+    facets.rebuild_facets(db)
+
+    # Un solo hash para todos: generarlo por usuario domina el tiempo de seed.
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    user_docs = [{
+        "username": f"bench{i}",
+        "email": f"bench{i}@example.com",
+        "password_hash": password_hash,
+        "role": "admin" if i == 0 else "user",
+        "cart": [{"product_id": str(pid), "quantity": rnd.randint(1, 3)}
+                 for pid in rnd.sample(product_ids, min(cart_size, len(product_ids)))],
+        "wishlist": [str(pid) for pid in rnd.sample(product_ids, min(cart_size, len(product_ids)))],
+        "created_at": now,
+    } for i in range(users)]
+    user_ids = insert_batched(db['users'], user_docs)
+
+    order_docs = []
+    for _ in range(orders):
+        lines = [{
+            "product_id": pid,
+            "quantity": rnd.randint(1, 3),
+            "price": 1000.0,
+            "name": "",
+        } for pid in rnd.sample(product_ids, min(3, len(product_ids)))]
+        subtotal = sum(line["price"] * line["quantity"] for line in lines)
+        order_docs.append({
+            "user_id": rnd.choice(user_ids),
+            "items": lines,
+            "subtotal": subtotal,
+            "shipping_cost": 800,
+            "discount": 0,
+            "total": subtotal + 800,
+            "status": rnd.choice(["pending", "paid", "shipped", "delivered"]),
+            "created_at": now - timedelta(hours=rnd.randint(0, 24 * 90)),
+            "updated_at": now,
+        })
+    insert_batched(db['orders'], order_docs)
+    purchases.backfill_purchases(db)
+
+    return {
+        "user_ids": [str(uid) for uid in user_ids],
+        "product_ids": [str(pid) for pid in product_ids],
+        "emails": [doc["email"] for doc in user_docs],
+    }
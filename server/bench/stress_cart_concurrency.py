@@ -0,0 +1,87 @@
+"""Prueba de estrés: incrementos concurrentes sobre el mismo carrito.
+
+Uso (desde server/, con un mongod local):
+
+    python bench/stress_cart_concurrency.py --threads 16 --ops 200
+
+Varios hilos agregan y restan unidades del mismo producto en el mismo
+carrito usando las operaciones atómicas de cart/routes.py. Al final la
+cantidad de cada producto tiene que coincidir exactamente con la suma de sus
+deltas, sin entradas repetidas ni excepciones en los hilos. Si algo no
+cierra, el script termina con código 1 y lista los fallos en "failures", así
+que puede correr sin supervisión (CI con un mongod de servicio). Es la
+verificación de la atomicidad del carrito: el repo no tiene suite de tests.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+os.environ.setdefault("DATABASE_NAME", os.getenv("MONGO_BENCH_DB", "tiendaGenerica_bench"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from cart.routes import add_cart_item, change_cart_item, db
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=200)
+    args = parser.parse_args()
+
+    user_id = db['users'].insert_one({"username": "stress", "email": "stress@bench", "cart": []}).inserted_id
+    product_ids = ["p-hot", "p-other"]
+    start = threading.Barrier(args.threads)
+    errors = []
+    # Cada par (+2, -1) deja una unidad neta en el producto que tocó.
+    expected = Counter(product_ids[(index + op) % 2] for index in range(args.threads) for op in range(args.ops))
+
+    def worker(index):
+        start.wait()
+        try:
+            for op in range(args.ops):
+                product_id = product_ids[(index + op) % 2]
+                add_cart_item(str(user_id), product_id, 2)
+                change_cart_item(str(user_id), product_id, -1)
+        except Exception as e:
+            errors.append(f"hilo {index}: {e!r}")
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    cart = db['users'].find_one({"_id": user_id})["cart"]
+    db['users'].delete_one({"_id": user_id})
+
+    quantities = {item["product_id"]: item["quantity"] for item in cart}
+    expected_total = args.threads * args.ops
+    failures = list(errors)
+    if len(cart) != len(quantities):
+        failures.append(f"entradas repetidas en el carrito: {len(cart)} para {len(quantities)} productos")
+    for product_id, count in sorted(expected.items()):
+        if quantities.get(product_id) != count:
+            failures.append(f"{product_id}: cantidad {quantities.get(product_id)}, esperada {count}")
+    result = {
+        "threads": args.threads,
+        "ops_per_thread": args.ops,
+        "mutations_per_sec": round(expected_total * 2 / elapsed, 1),
+        "cart_entries": len(cart),
+        "quantities": quantities,
+        "expected_total": expected_total,
+        "lost_updates": expected_total - sum(quantities.values()),
+        "failures": failures,
+    }
+    print(json.dumps(result, indent=2))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
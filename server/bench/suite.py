@@ -0,0 +1,176 @@
+"""Suite de benchmarks de la API contra la app Flask real.
+
+Uso (desde server/):
+
+    python bench/suite.py --backend mongomock --products 5000 --duration 10
+    python bench/suite.py --backend mongod --products 100000 --output bench_output.json
+    python bench/suite.py --backend mongod --baseline main.json --max-regression 15
+
+Siembra datos sintéticos (bench/seed.py), arma la app con create_app() y la
+ejercita en proceso con el generador de carga concurrente (bench/loadgen.py)
+sobre los endpoints calientes. El resultado es JSON (stdout y --output).
+
+Con --baseline compara p95 y requests/s contra una corrida anterior y sale
+con código 1 si algún escenario empeora más de --max-regression por ciento,
+para poder bloquear merges.
+
+Backends:
+  mongomock  en memoria, sin servidor (pip install -r requirements-dev.txt);
+             sirve para comparar cambios de código
+             Python. No emite eventos de monitoreo, así que los conteos de
+             comandos Mongo de /metrics quedan en cero.
+  mongod     MONGO_URI (por defecto localhost), base MONGO_BENCH_DB.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "app"))
+os.environ.setdefault("DATABASE_NAME", os.getenv("MONGO_BENCH_DB", "tiendaGenerica_bench"))
+
+import database
+from loadgen import run_load
+from seed import BENCH_PASSWORD, WORDS, seed
+
+SCENARIOS = ("products", "search", "cart", "wishlist", "checkout", "login")
+
+
+def connect(backend):
+    if backend == "mongomock":
+        import mongomock
+
+        database.register_client(mongomock.MongoClient())
+    return database.dbConnect()
+
+
+def build_scenarios(app, data, rnd_seed):
+    from flask_jwt_extended import create_access_token
+
+    with app.app_context():
+        tokens = [create_access_token(identity=uid) for uid in data["user_ids"]]
+
+    local = threading.local()
+
+    def client():
+        test_client = getattr(local, "client", None)
+        if test_client is None:
+            test_client = local.client = app.test_client()
+            local.rnd = random.Random(rnd_seed + threading.get_ident())
+        return test_client, local.rnd
+
+    def auth_headers(rnd):
+        return {"Authorization": f"Bearer {rnd.choice(tokens)}"}
+
+    def products():
+        c, rnd = client()
+        return c.get("/products?limit=50").status_code
+
+    def search():
+        c, rnd = client()
+        word = rnd.choice(WORDS)
+        return c.get(f"/products/search?q={word[:rnd.randint(3, len(word))]}").status_code
+
+    def cart():
+        c, rnd = client()
+        return c.get("/cart/", headers=auth_headers(rnd)).status_code
+
+    def wishlist():
+        c, rnd = client()
+        return c.get("/wishlist/", headers=auth_headers(rnd)).status_code
+
+    def checkout():
+        c, rnd = client()
+        items = [{"product_id": pid, "quantity": 1} for pid in rnd.sample(data["product_ids"], 2)]
+        status = c.post("/orders/checkout", json={"items": items}, headers=auth_headers(rnd)).status_code
+        # Un producto inactivo elegido al azar es un 409 legítimo, no un error.
+        return 200 if status == 409 else status
+
+    def login():
+        c, rnd = client()
+        return c.post("/auth/login", json={
+            "email": rnd.choice(data["emails"]), "password": BENCH_PASSWORD
+        }).status_code
+
+    return {
+        "products": products,
+        "search": search,
+        "cart": cart,
+        "wishlist": wishlist,
+        "checkout": checkout,
+        "login": login,
+    }
+
+
+def compare(results, baseline, max_regression):
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous:
+            continue
+        if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + max_regression / 100):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+        if current["requests_per_sec"] < previous["requests_per_sec"] * (1 - max_regression / 100):
+            regressions.append(
+                f"{name}: req/s {previous['requests_per_sec']} -> {current['requests_per_sec']}"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=("mongomock", "mongod"), default="mongomock")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--cart-size", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    parser.add_argument("--max-regression", type=float, default=10.0)
+    args = parser.parse_args()
+
+    db = connect(args.backend)
+    data = seed(db, args.users, args.products, args.orders, args.cart_size, args.seed)
+
+    from app import create_app
+
+    app = create_app({
+        "TESTING": True,
+        "MONGO_AUTO_INDEX": args.backend == "mongod",
+        # Los escenarios repiten logins con pocas cuentas; sin esto medirían 429.
+        "RATELIMIT_ENABLED": False,
+    })
+    scenarios = build_scenarios(app, data, args.seed)
+
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "results": {
+            name: run_load(scenarios[name], args.concurrency, args.duration)
+            for name in args.scenarios
+        },
+    }
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report["results"], json.load(f), args.max_regression)
+        report["regressions"] = regressions
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
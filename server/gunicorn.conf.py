@@ -0,0 +1,69 @@
+"""Configuración de gunicorn.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Todo se ajusta por variables de entorno:
+
+    WEB_CONCURRENCY          procesos worker (por defecto 2 * CPUs + 1)
+    GUNICORN_WORKER_CLASS    gthread (por defecto) o gevent
+    GUNICORN_THREADS         hilos por worker con gthread
+    GUNICORN_CONNECTIONS     greenlets por worker con gevent
+    GUNICORN_PRELOAD         1 para cargar la app en el master antes del fork
+    GUNICORN_MAX_REQUESTS    reciclar workers cada N requests (0 = nunca)
+    TRUSTED_PROXY_HOPS       proxies propios delante (nginx, balanceador) cuyo
+                             X-Forwarded-For se respeta; 0 = ninguno
+"""
+import multiprocessing
+import os
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+
+if worker_class == "gevent":
+    # Hay que parchear antes de que pymongo/threading se importen; con
+    # preload la app se importa en el master, antes de que el worker de
+    # gevent llegue a parchear nada.
+    from gevent import monkey
+
+    monkey.patch_all()
+
+chdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app")
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5005")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+worker_connections = int(os.getenv("GUNICORN_CONNECTIONS", 200))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+keepalive = 5
+
+
+def when_ready(server):
+    # Con preload el master pudo haber abierto un cliente (bootstrap de
+    # índices). Se cierra antes de forkear para que los workers no hereden
+    # sockets; cada uno abre el suyo la primera vez que consulta la base.
+    import database
+    import events
+    from pymongo.errors import PyMongoError
+
+    # stock_alerts y recommendations sólo los mantiene el bus de eventos,
+    # que corre como proceso aparte (python events.py).
+    try:
+        if not events.bus_running(database.dbConnect()):
+            server.log.error("El bus de eventos no está corriendo: stock_alerts y "
+                             "recommendations no se actualizan (python events.py)")
+    except PyMongoError as e:
+        server.log.warning("No se pudo verificar el bus de eventos: %s", e)
+    database.close_clients()
+
+
+def post_fork(server, worker):
+    server.log.info("Worker %s listo (pid %s)", worker.age, worker.pid)
+
+
+def worker_exit(server, worker):
+    # Cada worker tiene su propio pool de procesos para hashear contraseñas
+    # (PASSWORD_HASH_WORKERS por worker); se baja junto con él.
+    import passwords
+
+    passwords.shutdown()
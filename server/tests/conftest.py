@@ -0,0 +1,62 @@
+"""Fixtures comunes: la app real (create_app) sobre mongomock.
+
+    pip install -r requirements-dev.txt
+    python -m pytest            # desde server/
+"""
+import os
+import sys
+
+import mongomock
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+# Hash inline: sin pool de procesos en los tests.
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+
+import database
+
+
+@pytest.fixture
+def db():
+    client = database.register_client(mongomock.MongoClient())
+    yield database.dbConnect()
+    client.close()
+
+
+@pytest.fixture
+def app(db):
+    import conditional
+    import principals
+    from app import create_app
+    from catalog_cache import catalog_cache
+
+    # Caches del proceso: cada test arranca de cero.
+    conditional._cached_counters.clear()
+    catalog_cache.backend.clear()
+    principals._principals.clear()
+    return create_app({"TESTING": True, "MONGO_AUTO_INDEX": False, "RATELIMIT_ENABLED": False})
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app, db):
+    from datetime import datetime
+    from flask_jwt_extended import create_access_token
+
+    def make(role="user", username="cliente"):
+        user_id = db['users'].insert_one({
+            "username": username,
+            "email": f"{username}@tienda.test",
+            "role": role,
+            "cart": [],
+            "created_at": datetime.utcnow(),
+        }).inserted_id
+        with app.app_context():
+            token = create_access_token(identity=str(user_id))
+        return user_id, {"Authorization": f"Bearer {token}"}
+
+    return make
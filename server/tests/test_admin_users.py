@@ -0,0 +1,20 @@
+def test_demoted_admin_loses_access_on_the_next_request(client, make_user):
+    _, admin_headers = make_user(role="admin", username="jefa")
+    other_id, other_headers = make_user(role="admin", username="otra")
+
+    # Deja al otro admin en el cache de principales.
+    assert client.get("/admin/users", headers=other_headers).status_code == 200
+
+    response = client.put(f"/admin/user/{other_id}", headers=admin_headers, json={"role": "user"})
+    assert response.status_code == 200
+    assert response.get_json()["user"]["role"] == "user"
+
+    assert client.get("/admin/users", headers=other_headers).status_code == 403
+
+
+def test_invalid_role_is_rejected(client, make_user):
+    _, admin_headers = make_user(role="admin", username="jefa")
+    user_id, _ = make_user()
+
+    response = client.put(f"/admin/user/{user_id}", headers=admin_headers, json={"role": "root"})
+    assert response.status_code == 400
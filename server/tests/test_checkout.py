@@ -0,0 +1,34 @@
+from datetime import datetime
+
+import pytest
+
+
+@pytest.fixture
+def product_id(db):
+    now = datetime.utcnow()
+    return db['products'].insert_one({
+        "title": "Remera", "sku": "R-1", "price": 1000.0, "stock": 10,
+        "category": "Ropa", "is_active": True, "created_at": now, "updated_at": now,
+    }).inserted_id
+
+
+@pytest.mark.parametrize("coupon", [10, ["DESCUENTO10"], {"code": "DESCUENTO10"}, True])
+def test_non_string_coupon_is_a_validation_error(client, db, make_user, product_id, coupon):
+    _, headers = make_user()
+    response = client.post("/orders/checkout", headers=headers, json={
+        "items": [{"product_id": str(product_id), "quantity": 1}],
+        "coupon": coupon,
+    })
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Cupón no válido o expirado"
+    assert db['products'].find_one({"_id": product_id})["stock"] == 10
+
+
+def test_valid_coupon_applies_the_discount(client, make_user, product_id):
+    _, headers = make_user()
+    response = client.post("/orders/checkout", headers=headers, json={
+        "items": [{"product_id": str(product_id), "quantity": 1}],
+        "coupon": "descuento10",
+    })
+    assert response.status_code == 201
+    assert response.get_json()["discount"] > 0
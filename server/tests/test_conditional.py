@@ -0,0 +1,39 @@
+from datetime import datetime
+
+
+def seed_product(db, stock=10):
+    now = datetime.utcnow()
+    return db['products'].insert_one({
+        "title": "Remera", "sku": "R-1", "price": 1000.0, "stock": stock,
+        "category": "Ropa", "is_active": True, "created_at": now, "updated_at": now,
+    }).inserted_id
+
+
+def listed_products(response):
+    body = response.get_json()
+    # Paginado: {"products": [...]}; sin limit, el array en streaming.
+    return body["products"] if isinstance(body, dict) else body
+
+
+def test_listing_etag_changes_after_checkout(client, db, make_user):
+    product_id = seed_product(db)
+    _, headers = make_user()
+    paths = ("/products?limit=10", "/products")
+
+    etags = {}
+    for path in paths:
+        response = client.get(path)
+        assert response.status_code == 200
+        etags[path] = response.headers["ETag"]
+        assert client.get(path, headers={"If-None-Match": etags[path]}).status_code == 304
+
+    response = client.post("/orders/checkout", headers=headers, json={
+        "items": [{"product_id": str(product_id), "quantity": 3}],
+    })
+    assert response.status_code == 201
+
+    for path in paths:
+        response = client.get(path, headers={"If-None-Match": etags[path]})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etags[path]
+        assert listed_products(response)[0]["stock"] == 7
@@ -0,0 +1,34 @@
+import pytest
+from pymongo import ASCENDING, IndexModel
+
+import indexes
+
+
+def test_duplicate_keys_raise_a_migration_error_with_examples(db, monkeypatch):
+    db['users'].insert_many([{"email": "repetido@tienda.test"}, {"email": "repetido@tienda.test"}])
+    monkeypatch.setattr(indexes, "MIGRATIONS", [{
+        "version": 1,
+        "description": "email único",
+        "indexes": {"users": [IndexModel([("email", ASCENDING)], name="email_unique", unique=True)]},
+    }])
+
+    with pytest.raises(indexes.MigrationError, match="repetido@tienda.test"):
+        indexes.migrate(db)
+    assert indexes.applied_version(db) == 0
+    # El lock se libera aunque la migración falle.
+    assert db[indexes.MIGRATIONS_COLLECTION].find_one({"_id": indexes.LOCK_ID}) is None
+
+
+def test_migrate_waits_for_the_process_holding_the_lock(db, monkeypatch):
+    ran = []
+    monkeypatch.setattr(indexes, "MIGRATIONS", [{"version": 1, "description": "datos", "run": ran.append}])
+    assert indexes.claim_lock(db, "otro")
+
+    with pytest.raises(indexes.MigrationError, match="Otro proceso"):
+        indexes.migrate(db, wait=0)
+    assert ran == []
+
+    indexes.release_lock(db, "otro")
+    assert indexes.migrate(db, wait=0) == 1
+    assert indexes.migrate(db, wait=0) == 1
+    assert len(ran) == 1
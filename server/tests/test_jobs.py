@@ -0,0 +1,38 @@
+import time
+from datetime import datetime, timedelta
+
+import jobs
+
+
+def test_long_handler_keeps_its_lease(db):
+    jobs.enqueue(db, "lento", {}, key="lento:1")
+    job = jobs.claim(db, "w1", visibility=0.3)
+    others = []
+
+    def handler(db, payload):
+        # Más largo que el visibility timeout: otro worker no debería tomarlo.
+        for _ in range(5):
+            time.sleep(0.2)
+            others.append(jobs.claim(db, "w2", visibility=0.3))
+
+    assert jobs.run_job(db, job, {"lento": handler}, visibility=0.3)
+    assert others == [None] * 5
+    stored = db[jobs.JOBS_COLLECTION].find_one({"key": "lento:1"})
+    assert stored["status"] == "done"
+    assert stored["attempts"] == 1
+
+
+def test_abandoned_last_attempt_fails_instead_of_running_again(db):
+    jobs.enqueue(db, "lento", {}, key="lento:2", max_attempts=2)
+    for _ in range(2):
+        assert jobs.claim(db, "w1") is not None
+        # El worker murió: la reserva vence sin complete ni fail.
+        db[jobs.JOBS_COLLECTION].update_one(
+            {"key": "lento:2"}, {"$set": {"run_at": datetime.utcnow() - timedelta(seconds=1)}}
+        )
+
+    assert jobs.claim(db, "w2") is None
+    stored = db[jobs.JOBS_COLLECTION].find_one({"key": "lento:2"})
+    assert stored["status"] == "failed"
+    assert stored["attempts"] == 2
+    assert "lease" not in stored
@@ -0,0 +1,30 @@
+from datetime import datetime
+
+import purchases
+
+
+def test_backfill_moves_legacy_history_into_orders(db):
+    bought_at = datetime(2024, 3, 1, 12, 0)
+    user_id = db['users'].insert_one({
+        "username": "viejo",
+        "email": "viejo@tienda.test",
+        purchases.LEGACY_HISTORY_FIELD: [
+            {"items": [{"product_id": "p-1", "quantity": 2, "price": 500.0}], "total": 1000.0, "date": bought_at},
+            {"items": [{"product_id": "p-2", "quantity": 1, "price": 300.0}], "date": bought_at},
+        ],
+    }).inserted_id
+
+    # Una corrida que murió después de copiar y antes de borrar el historial:
+    # al reintentar la migración no se duplican órdenes.
+    purchases.copy_legacy_orders(db)
+    purchases.backfill_purchases(db)
+
+    orders = list(db['orders'].find({"user_id": user_id}).sort("legacy_key", 1))
+    assert [order["total"] for order in orders] == [1000.0, 300.0]
+    assert all(order["created_at"] == bought_at for order in orders)
+
+    user = db['users'].find_one({"_id": user_id})
+    assert purchases.LEGACY_HISTORY_FIELD not in user
+    assert user[purchases.PURCHASED_FIELD] == ["p-1", "p-2"]
+    assert user[purchases.ORDER_STATS_FIELD]["count"] == 2
+    assert user[purchases.ORDER_STATS_FIELD]["total_spent"] == 1300.0
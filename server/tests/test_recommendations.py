@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+import recommendations
+
+
+def add_order(db, created_at, *product_ids):
+    return db['orders'].insert_one({
+        "items": [{"product_id": product_id} for product_id in product_ids],
+        "created_at": created_at,
+    }).inserted_id
+
+
+def neighbor_count(db, product_id, other):
+    doc = db[recommendations.NEIGHBORS_COLLECTION].find_one({"_id": product_id}) or {}
+    return next((neighbor["c"] for neighbor in doc.get("neighbors", []) if neighbor["p"] == other), 0)
+
+
+def test_refresh_counts_orders_that_commit_behind_the_watermark(db):
+    now = datetime.utcnow()
+    add_order(db, now - timedelta(seconds=10), "a", "b")
+    add_order(db, now, "a", "b")
+    recommendations.refresh(db)
+    assert neighbor_count(db, "a", "b") == 2
+
+    # created_at anterior a la marca: la transacción confirmó tarde.
+    add_order(db, now - timedelta(seconds=5), "a", "b")
+    assert recommendations.refresh(db) == 1
+    assert neighbor_count(db, "a", "b") == 3
+
+    # Volver a correr no cuenta dos veces lo que ya está en la ventana.
+    assert recommendations.refresh(db) == 0
+    assert neighbor_count(db, "a", "b") == 3
+
+
+def test_refresh_after_build_skips_orders_the_build_counted(db):
+    now = datetime.utcnow()
+    add_order(db, now - timedelta(seconds=1), "a", "b")
+    add_order(db, now, "a", "c")
+    recommendations.build(db)
+    assert recommendations.refresh(db) == 0
+
+    add_order(db, now - timedelta(seconds=2), "a", "b")
+    assert recommendations.refresh(db) == 1
+    assert neighbor_count(db, "a", "b") == 2